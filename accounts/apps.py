@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Token, leaderboard and picture catalog cache invalidation receivers
+        from . import authentication, catalog, leaderboard
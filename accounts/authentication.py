@@ -0,0 +1,132 @@
+import copy
+import hashlib
+
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from django_backend.cache import DjangoCacheBackend, LocalCacheBackend
+from django_backend.metrics import stage
+
+from .models import CustomUser
+
+
+class TimedTokenAuthentication(TokenAuthentication):
+    # Token lookup shows up as the 'auth' stage in Server-Timing and /metrics
+    def authenticate(self, request):
+        with stage(request, 'auth'):
+            return super().authenticate(request)
+
+
+class TokenCache:
+    """
+    token key -> (user, token), so authenticated requests skip the
+    Token/User join. Keys are hashed so raw tokens never reach a shared cache.
+    Views that delete or rotate tokens must call invalidate(); deactivating
+    or deleting a user through the ORM invalidates their tokens by signal
+    (QuerySet.update() bypasses it).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @classmethod
+    def from_settings(cls):
+        backend = getattr(settings, 'ACCOUNTS_TOKEN_CACHE_BACKEND', 'local')
+        if not backend:
+            return None
+
+        ttl = getattr(settings, 'ACCOUNTS_TOKEN_CACHE_TTL', 60)
+        if backend == 'django':
+            alias = getattr(settings, 'ACCOUNTS_TOKEN_CACHE_ALIAS', 'default')
+            return cls(DjangoCacheBackend(alias, ttl))
+        return cls(LocalCacheBackend(getattr(settings, 'ACCOUNTS_TOKEN_CACHE_SIZE', 4096), ttl))
+
+    def key(self, token_key):
+        return 'accounts:token:' + hashlib.sha256(token_key.encode()).hexdigest()
+
+    def get(self, token_key):
+        entry = self.backend.get(self.key(token_key))
+        if entry is None:
+            return None
+        # Views mutate request.user, never hand out the cached instance
+        user, token = entry
+        return copy.copy(user), token
+
+    def set(self, token_key, user, token):
+        self.backend.set(self.key(token_key), (copy.copy(user), token))
+
+    def invalidate(self, *token_keys):
+        for token_key in token_keys:
+            self.backend.delete(self.key(token_key))
+
+
+token_cache = TokenCache.from_settings()
+
+
+def rotate_token(user):
+    """
+    Replace the user's token with a fresh key in one UPDATE and drop the old
+    key from the cache. Select the user with select_related('auth_token') to
+    avoid the extra lookup.
+    """
+    key = Token.generate_key()
+    try:
+        old_key = user.auth_token.key
+    except Token.DoesNotExist:
+        old_key = None
+
+    if old_key is not None:
+        created = timezone.now()
+        if Token.objects.filter(key=old_key).update(key=key, created=created):
+            if token_cache is not None:
+                token_cache.invalidate(old_key)
+            return Token(key=key, user=user, created=created)
+        # A concurrent login rotated it first
+        Token.objects.filter(user=user).delete()
+    return Token.objects.create(key=key, user=user)
+
+
+def revoke_token(token):
+    """Delete a token and drop it from the cache."""
+    Token.objects.filter(key=token.key).delete()
+    if token_cache is not None:
+        token_cache.invalidate(token.key)
+
+
+class CachedTokenAuthentication(TimedTokenAuthentication):
+    # A cache hit authenticates without touching the database
+    def authenticate_credentials(self, key):
+        if token_cache is None:
+            return super().authenticate_credentials(key)
+
+        cached = token_cache.get(key)
+        if cached is not None:
+            if cached[0].is_active:
+                return cached
+            # Let DRF reject it with its usual message
+            token_cache.invalidate(key)
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # A deactivated user must not keep authenticating from the cache until the TTL
+    if token_cache is None or instance.is_active:
+        return
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    token_cache.invalidate(*Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    # The tokens are deleted by cascade, their cache entries are not
+    if token_cache is not None:
+        token_cache.invalidate(*Token.objects.filter(user=instance).values_list('key', flat=True))
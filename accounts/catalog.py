@@ -0,0 +1,62 @@
+"""
+In-memory profile picture catalog for GET /api/auth/profile-pictures/.
+
+The serialized catalog and a strong ETag (a hash of its JSON) are built
+once and dropped by ProfilePicture save/delete signals. Signals only fire
+in the process that made the change (load_profile_pictures runs in its
+own), so entries are also rebuilt after CATALOG_TTL seconds; an unchanged
+catalog keeps its ETag, so clients keep getting 304s.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ProfilePicture
+from .serializers import ProfilePictureSerializer
+
+CATALOG_TTL = getattr(settings, 'ACCOUNTS_PICTURE_CATALOG_TTL', 60)
+CATALOG_MAX_AGE = getattr(settings, 'ACCOUNTS_PICTURE_CATALOG_MAX_AGE', 0)
+
+
+class PictureCatalog:
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._entry = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(serialized pictures, ETag)."""
+        entry = self._entry
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1], entry[2]
+
+        with self._lock:
+            generation = self._generation
+        data = ProfilePictureSerializer(ProfilePicture.objects.order_by('id'), many=True).data
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        etag = f'"{digest[:32]}"'
+        with self._lock:
+            # Don't keep a catalog read before a concurrent change
+            if generation == self._generation:
+                self._entry = (time.monotonic() + self.ttl, data, etag)
+        return data, etag
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entry = None
+
+
+picture_catalog = PictureCatalog()
+
+
+@receiver(post_save, sender=ProfilePicture)
+@receiver(post_delete, sender=ProfilePicture)
+def pictures_changed(sender, **kwargs):
+    picture_catalog.invalidate()
@@ -0,0 +1,249 @@
+"""
+Write-behind score event log.
+
+Submissions append a ScoreEvent to an in-process buffer instead of
+inserting it in the request. A background thread writes the buffer with
+bulk_create once it holds FLUSH_SIZE events or every FLUSH_INTERVAL
+seconds, and the remainder is written when the process exits.
+
+Every flush also folds its events into ScoreStats (attempts, total, best,
+a recent exponential average and the daily streak) with F/Case
+expressions, so the aggregates never need the log to be rescanned and
+concurrent flushes from other workers add up instead of overwriting
+each other. A flush is the same handful of queries whatever its size,
+plus the extra INSERT batches the database's parameter limit requires.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, Value, When, fields
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import CustomUser, ScoreEvent, ScoreStats
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest attempt in ScoreStats.recent_average
+RECENT_WEIGHT = getattr(settings, 'ACCOUNTS_SCORE_RECENT_WEIGHT', 0.2)
+
+AGGREGATE_FIELDS = [
+    'attempts', 'total', 'best', 'recent_average',
+    'last_score', 'last_played_at', 'streak', 'streak_day',
+]
+
+
+def group_aggregates(events):
+    """
+    Fold a batch of one user's events on one board, oldest first, into
+    the expressions ScoreStats is updated with.
+    """
+    events = sorted(events, key=lambda event: event.played_at)
+    scores = [event.score for event in events]
+    last = events[-1]
+
+    # recent_average after n more attempts is decay * previous + carry;
+    # the first attempt ever starts the average at its own score instead
+    keep = 1 - RECENT_WEIGHT
+    decay = keep ** len(scores)
+    carry = sum(RECENT_WEIGHT * keep ** (len(scores) - i) * score for i, score in enumerate(scores, 1))
+    fresh = scores[0] * keep ** (len(scores) - 1) + sum(
+        RECENT_WEIGHT * keep ** (len(scores) - i) * score for i, score in enumerate(scores[1:], 2))
+
+    # Consecutive days at the end of the batch, joined to the stored streak
+    # when that ended inside or right before them
+    days = sorted({timezone.localdate(event.played_at) for event in events})
+    run = 1
+    while run < len(days) and days[-run - 1] == days[-run] - timedelta(days=1):
+        run += 1
+    last_day = days[-1]
+    joins = [
+        When(streak_day=last_day - timedelta(days=offset), then=F('streak') + offset)
+        for offset in range(run + 1)
+    ]
+
+    return {
+        'attempts': F('attempts') + len(scores),
+        'total': F('total') + sum(scores),
+        'best': Greatest('best', Value(max(scores))),
+        'recent_average': Case(
+            When(attempts=0, then=Value(float(fresh))),
+            default=F('recent_average') * decay + carry,
+            output_field=fields.FloatField(),
+        ),
+        # Events older than the stored ones (an offline sync) don't move these back
+        'last_score': Case(
+            When(last_played_at__gt=last.played_at, then=F('last_score')),
+            default=Value(last.score),
+            output_field=fields.IntegerField(),
+        ),
+        'last_played_at': Case(
+            When(last_played_at__gt=last.played_at, then=F('last_played_at')),
+            default=Value(last.played_at),
+            output_field=fields.DateTimeField(),
+        ),
+        'streak': Case(
+            When(streak_day__gt=last_day, then=F('streak')),
+            *joins,
+            default=Value(run),
+            output_field=fields.PositiveIntegerField(),
+        ),
+        'streak_day': Case(
+            When(streak_day__gt=last_day, then=F('streak_day')),
+            default=Value(last_day),
+            output_field=fields.DateField(),
+        ),
+    }
+
+
+def write_events(events):
+    """Insert a batch of events and fold it into ScoreStats, in one transaction."""
+    groups = defaultdict(list)
+    for event in events:
+        groups[event.user_id, event.board].append(event)
+
+    with transaction.atomic():
+        # Users deleted since they submitted would fail the whole batch
+        users = set(CustomUser.objects.filter(id__in={user_id for user_id, _ in groups}).values_list('id', flat=True))
+        groups = {key: group for key, group in groups.items() if key[0] in users}
+        if not groups:
+            return 0
+
+        written = ScoreEvent.objects.bulk_create([event for group in groups.values() for event in group])
+        ScoreStats.objects.bulk_create(
+            [ScoreStats(user_id=user_id, board=board) for user_id, board in groups],
+            ignore_conflicts=True,
+        )
+
+        stats = []
+        for row in ScoreStats.objects.filter(user_id__in=users, board__in={board for _, board in groups}):
+            group = groups.get((row.user_id, row.board))
+            if group is not None:
+                for name, value in group_aggregates(group).items():
+                    setattr(row, name, value)
+                stats.append(row)
+        ScoreStats.objects.bulk_update(stats, AGGREGATE_FIELDS)
+    return len(written)
+
+
+class ScoreEventBuffer:
+    """
+    Events waiting to be written. add() never touches the database; the
+    writer thread flushes once flush_size events are pending or every
+    flush_interval seconds. With flush_interval None there is no thread and
+    add() itself flushes once flush_size events are pending.
+    """
+
+    def __init__(self, flush_size=200, flush_interval=2.0, max_pending=10000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+
+        self._written = 0
+        self._dropped = 0
+        self._failures = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            flush_size=getattr(settings, 'ACCOUNTS_SCORE_EVENT_FLUSH_SIZE', 200),
+            flush_interval=getattr(settings, 'ACCOUNTS_SCORE_EVENT_FLUSH_INTERVAL', 2.0),
+            max_pending=getattr(settings, 'ACCOUNTS_SCORE_EVENT_MAX_PENDING', 10000),
+        )
+
+    def add(self, user_id, board, score, session='', played_at=None):
+        event = ScoreEvent(
+            user_id=user_id, board=board, score=score, session=session,
+            played_at=played_at or timezone.now(),
+        )
+        self._ensure_started()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                # The database has been failing for a while, shed load
+                self._dropped += 1
+                return
+            self._pending.append(event)
+            full = len(self._pending) >= self.flush_size
+            if full:
+                self._wakeup.notify()
+        if full and not self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write everything pending now, returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                written = write_events(batch)
+            except Exception:
+                logger.exception("Writing %d score events failed, retrying later", len(batch))
+                for event in batch:
+                    # bulk_create may have assigned ids the rollback discarded
+                    event.pk = None
+                with self._lock:
+                    self._failures += 1
+                    self._pending[:0] = batch[:max(self.max_pending - len(self._pending), 0)]
+                return 0
+
+            with self._lock:
+                self._written += written
+            return written
+
+    def close(self):
+        """Stop the writer thread and write what is left."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed_flushes': self._failures,
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='accounts-score-events', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed and len(self._pending) < self.flush_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    return
+            # Drop a connection the database closed while the thread slept
+            close_old_connections()
+            self.flush()
+
+
+buffer = ScoreEventBuffer.from_settings()
+
+
+def record(user_id, board, score, session='', played_at=None):
+    buffer.add(user_id, board, score, session, played_at)
@@ -0,0 +1,202 @@
+"""
+Leaderboards over Score.signing and Score.recognition.
+
+Boards are ordered by (score desc, score id) and served through the partial
+indexes on Score, so pages use keyset pagination (a cursor of the last
+score/id seen) instead of OFFSET, and a rank is one indexed range count of
+the scores above it. Ties share a rank.
+
+The first TOP_N entries of each board are cached. A score change only
+drops that cache when it can move the top-N boundary: the user is in it,
+the board has fewer than TOP_N users, or the new score reaches the last entry.
+"""
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django_backend.cache import DjangoCacheBackend, LocalCacheBackend
+
+from .models import CustomUser, Score
+
+BOARDS = ('signing', 'recognition')
+TOP_N = getattr(settings, 'ACCOUNTS_LEADERBOARD_TOP_N', 100)
+PAGE_SIZE = getattr(settings, 'ACCOUNTS_LEADERBOARD_PAGE_SIZE', 50)
+MAX_PAGE_SIZE = getattr(settings, 'ACCOUNTS_LEADERBOARD_MAX_PAGE_SIZE', 100)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(entry):
+    return f'{entry["score"]}:{entry["id"]}'
+
+
+def decode_cursor(cursor):
+    try:
+        score, score_id = cursor.split(':')
+        return int(score), int(score_id)
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+
+
+def ranked_scores(board):
+    return Score.objects.filter(user__isnull=False).order_by(f'-{board}', 'id')
+
+
+def after(board, score, score_id):
+    # Everything ranked below (score, score_id) in (score desc, id) order
+    return Q(**{f'{board}__lt': score}) | Q(**{board: score, 'id__gt': score_id})
+
+
+def fetch_entries(board, limit, cursor=None):
+    """Up to limit entries after the cursor, with their ranks."""
+    queryset = ranked_scores(board)
+    if cursor is not None:
+        queryset = queryset.filter(after(board, *cursor))
+    rows = list(queryset.values_list('id', board, 'user_id', 'user__username', 'user__profile_picture_id')[:limit])
+    if not rows:
+        return []
+
+    # One indexed count places the page: rows ranked before the first entry,
+    # and rows with a strictly higher score (the rank of the first entry)
+    first_id, first_score = rows[0][0], rows[0][1]
+    counts = ranked_scores(board).filter(**{f'{board}__gte': first_score}).aggregate(
+        before=Count('id', filter=Q(**{f'{board}__gt': first_score}) | Q(**{board: first_score, 'id__lt': first_id})),
+        higher=Count('id', filter=Q(**{f'{board}__gt': first_score})),
+    )
+
+    entries = []
+    rank = counts['higher'] + 1
+    for position, (score_id, score, user_id, username, picture_id) in enumerate(rows):
+        if entries and score != entries[-1]['score']:
+            rank = counts['before'] + position + 1
+        entries.append({
+            'id': score_id,
+            'rank': rank,
+            'user_id': user_id,
+            'username': username,
+            'profile_picture_id': picture_id,
+            'score': score,
+        })
+    return entries
+
+
+def rank_of(board, score):
+    """1 + the users with a strictly higher score, counted on the index."""
+    return ranked_scores(board).filter(**{f'{board}__gt': score}).count() + 1
+
+
+class TopCache:
+    """Top TOP_N entries per board, cached until a change can affect them."""
+
+    def __init__(self, backend, size=TOP_N):
+        self.backend = backend
+        self.size = size
+        self._generations = dict.fromkeys(BOARDS, 0)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        backend = getattr(settings, 'ACCOUNTS_LEADERBOARD_CACHE_BACKEND', 'local')
+        if not backend:
+            return None
+
+        ttl = getattr(settings, 'ACCOUNTS_LEADERBOARD_CACHE_TTL', 300)
+        if backend == 'django':
+            alias = getattr(settings, 'ACCOUNTS_LEADERBOARD_CACHE_ALIAS', 'default')
+            return cls(DjangoCacheBackend(alias, ttl))
+        return cls(LocalCacheBackend(len(BOARDS), ttl))
+
+    def key(self, board):
+        return f'accounts:leaderboard:{board}:{self.size}'
+
+    def get(self, board):
+        entries = self.backend.get(self.key(board))
+        if entries is not None:
+            return entries
+
+        with self._lock:
+            generation = self._generations[board]
+        entries = fetch_entries(board, self.size)
+        with self._lock:
+            # Don't store a list an invalidation raced with
+            if generation == self._generations[board]:
+                self.backend.set(self.key(board), entries)
+        return entries
+
+    def invalidate(self, board):
+        with self._lock:
+            self._generations[board] += 1
+            self.backend.delete(self.key(board))
+
+    def score_changed(self, board, user_id, score):
+        """Drop the board's cached top-N if (user_id, score) can change it."""
+        entries = self.backend.get(self.key(board))
+        if entries is None:
+            return
+
+        for entry in entries:
+            if entry['user_id'] == user_id:
+                if entry['score'] != score:
+                    self.invalidate(board)
+                return
+
+        # Room for a new entry, or the score reaches the last one (a tie
+        # with an older score row ranks ahead of it)
+        if len(entries) < self.size or score >= entries[-1]['score']:
+            self.invalidate(board)
+
+    def user_changed(self, user_id):
+        # Username or picture of an entry changed
+        for board in BOARDS:
+            entries = self.backend.get(self.key(board))
+            if entries and any(entry['user_id'] == user_id for entry in entries):
+                self.invalidate(board)
+
+
+top_cache = TopCache.from_settings()
+
+
+def page(board, limit, cursor=None):
+    """(entries, next cursor) for a page, from the top-N cache when it covers it."""
+    entries = None
+    if top_cache is not None:
+        cached = top_cache.get(board)
+        start = 0
+        if cursor is not None:
+            start = next(
+                (i + 1 for i, entry in enumerate(cached) if (entry['score'], entry['id']) == cursor),
+                None,
+            )
+        # The cache covers the page if it holds it whole, or holds the whole board
+        if start is not None and (start + limit <= len(cached) or len(cached) < top_cache.size):
+            entries = cached[start:start + limit]
+
+    if entries is None:
+        entries = fetch_entries(board, limit, cursor)
+    next_cursor = encode_cursor(entries[-1]) if len(entries) == limit else None
+    return entries, next_cursor
+
+
+@receiver(post_save, sender=Score)
+def score_saved(sender, instance, **kwargs):
+    if top_cache is None or instance.user_id is None:
+        return
+    for board in BOARDS:
+        top_cache.score_changed(board, instance.user_id, getattr(instance, board))
+
+
+@receiver(post_delete, sender=Score)
+def score_deleted(sender, instance, **kwargs):
+    if top_cache is not None and instance.user_id is not None:
+        top_cache.user_changed(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, **kwargs):
+    if top_cache is not None and not created:
+        top_cache.user_changed(instance.id)
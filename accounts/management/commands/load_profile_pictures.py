@@ -1,21 +1,94 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+
 from accounts.models import ProfilePicture
+from accounts.thumbnails import (
+    render_derivatives,
+    source_digest,
+    stem_of,
+    store_derivatives,
+)
 
 class Command(BaseCommand):
-    help = 'Load initial profile pictures'
+    help = 'Load initial profile pictures and render their thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Render thumbnails in N processes, 1 or less renders in-process',
+        )
+        parser.add_argument('--force', action='store_true', help='Re-render thumbnails that are up to date')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
         pictures = [
             {'name': 'Default Avatar 1', 'image': 'profile1.jpg'},
             {'name': 'Default Avatar 2', 'image': 'profile2.jpg'},
             {'name': 'Default Avatar 3', 'image': 'profile3.jpg'},
         ]
 
+        existing = {picture.name: picture for picture in ProfilePicture.objects.all()}
         for picture in pictures:
-            ProfilePicture.objects.get_or_create(
-                name=picture['name'],
-                defaults={'image': picture['image']}
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f'Processed {picture["name"]}')
-            )
\ No newline at end of file
+            if picture['name'] not in existing:
+                existing[picture['name']] = ProfilePicture(name=picture['name'], image=picture['image'])
+
+        # Sources are read and thumbnails stored here, only rendering runs in the pool
+        jobs = []
+        for picture in existing.values():
+            try:
+                with default_storage.open(picture.image.name, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                self.stderr.write(self.style.WARNING(f'{picture.name}: cannot read {picture.image.name} ({e})'))
+                self.save(picture, 'no thumbnails')
+                continue
+
+            digest = source_digest(data)
+            if options['force'] or (picture.thumbnails or {}).get('source') != digest:
+                jobs.append((picture, digest, data))
+            else:
+                self.save(picture, 'thumbnails up to date')
+
+        for (picture, digest, _), derivatives in zip(jobs, self.render(jobs, options['workers'])):
+            if derivatives is None:
+                self.save(picture, 'no thumbnails')
+                continue
+            # Recording the source digest keeps save() from rendering them again
+            picture.thumbnails = store_derivatives(default_storage, digest, derivatives, picture.thumbnails)
+            self.save(picture, f'thumbnails {", ".join(derivatives)}', force=True)
+
+    def save(self, picture, detail, force=False):
+        if picture.pk is None or force:
+            picture.save()
+        self.stdout.write(self.style.SUCCESS(f'Processed {picture.name}, {detail}'))
+
+    def render(self, jobs, workers):
+        """Derivatives per job, in order; None where the image can't be decoded."""
+        arguments = [(data, stem_of(picture.image.name)) for picture, _, data in jobs]
+        if workers <= 1 or len(jobs) <= 1:
+            return [self.render_one(*args) for args in arguments]
+
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        with executor:
+            futures = [executor.submit(render_derivatives, *args) for args in arguments]
+            results = []
+            for (picture, _, _), future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except (OSError, ValueError) as e:
+                    self.stderr.write(self.style.WARNING(f'{picture.name}: {e}'))
+                    results.append(None)
+            return results
+
+    def render_one(self, data, stem):
+        try:
+            return render_derivatives(data, stem)
+        except (OSError, ValueError) as e:
+            self.stderr.write(self.style.WARNING(f'{stem}: {e}'))
+            return None
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_alter_score_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['-signing', 'id'], name='score_signing_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['-recognition', 'id'], name='score_recognition_rank'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_score_rank_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('signing', 'Signing'), ('recognition', 'Recognition')], max_length=16)),
+                ('score', models.IntegerField()),
+                ('session', models.CharField(blank=True, max_length=64)),
+                ('played_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'board', '-id'], name='score_event_history')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScoreStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('signing', 'Signing'), ('recognition', 'Recognition')], max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('best', models.IntegerField(default=0)),
+                ('recent_average', models.FloatField(default=0.0)),
+                ('last_score', models.IntegerField(null=True)),
+                ('last_played_at', models.DateTimeField(null=True)),
+                ('streak', models.PositiveIntegerField(default=0)),
+                ('streak_day', models.DateField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'board'), name='unique_score_stats')],
+            },
+        ),
+    ]
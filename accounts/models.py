@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.contrib.auth.hashers import make_password
 
@@ -11,8 +12,7 @@ class CustomUserManager(BaseUserManager):
             user.profile_picture = profile_picture
         user.save(using=self._db)
         
-        score = Score.objects.create(recognition=0, signing=0,user=user)  # Initialize signing score
-        user.save(using=self._db) 
+        Score.objects.using(self._db).create(recognition=0, signing=0, user=user)  # Initialize signing score
         return user
     
     def create_superuser(self, username, password=None):
@@ -27,6 +27,17 @@ class CustomUserManager(BaseUserManager):
 class ProfilePicture(models.Model):
     name = models.CharField(max_length=100)
     image = models.ImageField(upload_to='profile_pictures/') 
+    # Source hash and content-hashed thumbnail names, see accounts.thumbnails
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        from .thumbnails import refresh_thumbnails
+
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'image' in update_fields) and refresh_thumbnails(self):
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'thumbnails'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -40,6 +51,22 @@ class Score(models.Model):
     )
     recognition = models.IntegerField(default=0)
     signing = models.IntegerField(default=0)
+
+    class Meta:
+        # Leaderboard order (score desc, id) for keyset pages and rank counts.
+        # Partial, so queries filtering user__isnull=False stay index-only.
+        indexes = [
+            models.Index(
+                fields=['-signing', 'id'],
+                name='score_signing_rank',
+                condition=Q(user__isnull=False),
+            ),
+            models.Index(
+                fields=['-recognition', 'id'],
+                name='score_recognition_rank',
+                condition=Q(user__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         return f"User: {self.user.username if self.user else 'No User'}, Recognition: {self.recognition}, Signing: {self.signing}"
@@ -58,4 +85,50 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = []
-    
\ No newline at end of file
+    
+
+
+BOARD_CHOICES = [('signing', 'Signing'), ('recognition', 'Recognition')]
+
+
+class ScoreEvent(models.Model):
+    # Append-only, one row per submitted result; written in batches by accounts.events
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='score_events')
+    board = models.CharField(max_length=16, choices=BOARD_CHOICES)
+    score = models.IntegerField()
+    session = models.CharField(max_length=64, blank=True)
+    played_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'board', '-id'], name='score_event_history'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.board}: {self.score}"
+
+
+class ScoreStats(models.Model):
+    # Running aggregates per user and board, updated with every event batch
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='score_stats')
+    board = models.CharField(max_length=16, choices=BOARD_CHOICES)
+    attempts = models.PositiveIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    best = models.IntegerField(default=0)
+    recent_average = models.FloatField(default=0.0)
+    last_score = models.IntegerField(null=True)
+    last_played_at = models.DateTimeField(null=True)
+    streak = models.PositiveIntegerField(default=0)  # consecutive days played
+    streak_day = models.DateField(null=True)  # last day of the streak
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'board'], name='unique_score_stats'),
+        ]
+
+    @property
+    def average(self):
+        return self.total / self.attempts if self.attempts else 0.0
+
+    def __str__(self):
+        return f"{self.user_id} {self.board}: {self.attempts} attempts"
@@ -0,0 +1,120 @@
+"""
+High score updates.
+
+A submission only ever raises a board's high score, so it is applied as a
+conditional UPDATE (WHERE score < submitted) that the database serializes:
+concurrent submissions can't overwrite a higher score with a lower one, and
+the row count says whether the score improved. queryset.update() sends no
+signals, so improvements notify the leaderboard cache here.
+
+Every submitted result, improving or not, is also recorded in the score
+event log (see accounts.events).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import events, leaderboard
+from .models import Score
+
+MAX_SYNC_RESULTS = getattr(settings, 'ACCOUNTS_SCORE_SYNC_MAX_RESULTS', 500)
+
+
+def parse_score(value, name='score'):
+    # bool is an int subclass, don't take True as 1
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"{name} must be a non-negative integer")
+    return value
+
+
+def parse_results(results):
+    """Validate buffered results, [{'board', 'score', ...}, ...]."""
+    if not isinstance(results, list) or not results:
+        raise ValueError("results must be a non-empty list")
+    if len(results) > MAX_SYNC_RESULTS:
+        raise ValueError(f"At most {MAX_SYNC_RESULTS} results per sync")
+
+    parsed = []
+    for index, result in enumerate(results):
+        if not isinstance(result, dict):
+            raise ValueError(f"results[{index}] must be an object")
+        board = result.get('board')
+        if board not in leaderboard.BOARDS:
+            raise ValueError(f"results[{index}].board must be one of {', '.join(leaderboard.BOARDS)}")
+        score = parse_score(result.get('score'), f'results[{index}].score')
+
+        session = result.get('session') or ''
+        if not isinstance(session, str) or len(session) > 64:
+            raise ValueError(f"results[{index}].session must be a string of at most 64 characters")
+
+        played_at = result.get('played_at')
+        if played_at is not None:
+            played_at = parse_datetime(played_at) if isinstance(played_at, str) else None
+            if played_at is None:
+                raise ValueError(f"results[{index}].played_at must be an ISO 8601 date and time")
+            if timezone.is_naive(played_at):
+                played_at = timezone.make_aware(played_at)
+            # A client clock ahead of ours can't put results in the future
+            played_at = min(played_at, timezone.now())
+
+        parsed.append({'board': board, 'score': score, 'session': session, 'played_at': played_at})
+    return parsed
+
+
+def notify_leaderboard(user_id, board, high_score):
+    if leaderboard.top_cache is not None:
+        leaderboard.top_cache.score_changed(board, user_id, high_score)
+
+
+def submit_high_score(user, board, score, session=''):
+    """
+    Raise the user's high score on board to score if it is higher.
+    Returns (improved, high_score); a single UPDATE when it improves.
+    """
+    events.record(user.id, board, score, session)
+    if Score.objects.filter(user=user, **{f'{board}__lt': score}).update(**{board: score}):
+        notify_leaderboard(user.id, board, score)
+        return True, score
+
+    high_score = Score.objects.filter(user=user).values_list(board, flat=True).first()
+    if high_score is not None:
+        return False, high_score
+
+    # Users created before scores were initialized on signup
+    Score.objects.create(user=user, **{board: score})
+    notify_leaderboard(user.id, board, score)
+    return True, score
+
+
+def sync_high_scores(user, results):
+    """
+    Apply many buffered results in one transaction: the best score per
+    board is applied with one read and at most one UPDATE, whatever the
+    number of results. Returns ({board: improved}, {board: high_score}).
+    """
+    best = {}
+    for result in results:
+        best[result['board']] = max(best.get(result['board'], 0), result['score'])
+        events.record(user.id, result['board'], result['score'], result['session'], result['played_at'])
+
+    with transaction.atomic():
+        current = Score.objects.filter(user=user).values(*leaderboard.BOARDS).first()
+        if current is None:
+            Score.objects.create(user=user, **best)
+            current = dict.fromkeys(leaderboard.BOARDS, 0)
+        elif any(score > current[board] for board, score in best.items()):
+            # Greatest keeps a higher score a concurrent request wrote since the read
+            Score.objects.filter(
+                Q(*[Q(**{f'{board}__lt': score}) for board, score in best.items()], _connector=Q.OR),
+                user=user,
+            ).update(**{board: Greatest(board, score) for board, score in best.items()})
+
+    improved = {board: best.get(board, 0) > current[board] for board in leaderboard.BOARDS}
+    high_scores = {board: max(best.get(board, 0), current[board]) for board in leaderboard.BOARDS}
+    for board in leaderboard.BOARDS:
+        if improved[board]:
+            notify_leaderboard(user.id, board, high_scores[board])
+    return improved, high_scores
@@ -1,10 +1,17 @@
 from rest_framework import serializers
 from .models import CustomUser, ProfilePicture
+from .thumbnails import thumbnail_urls
 
 class ProfilePictureSerializer(serializers.ModelSerializer):
+    # {size: {'jpeg': url, 'webp': url}}, fetch the size actually displayed
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = ProfilePicture
-        fields = ('id', 'name', 'image')
+        fields = ('id', 'name', 'image', 'thumbnails')
+
+    def get_thumbnails(self, picture):
+        return thumbnail_urls(picture)
 
 class UserSerializer(serializers.ModelSerializer):
     profile_picture = ProfilePictureSerializer(read_only=True)
@@ -1,3 +1,623 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import catalog, events, leaderboard, thumbnails
+from .authentication import token_cache
+from .models import CustomUser, ProfilePicture, Score, ScoreEvent, ScoreStats
+from .serializers import ProfilePictureSerializer
+
+
+def use_event_buffer(test, **options):
+    # A buffer without the writer thread, flushed by the test itself
+    buffer = events.ScoreEventBuffer(flush_interval=None, **options)
+    patcher = mock.patch.object(events, 'buffer', buffer)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return buffer
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        CustomUser.objects.create_user(username='alice')
+        self.token = self.login('alice')
+
+    def login(self, username):
+        response = self.client.post(reverse('login'), {'username': username}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def check(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return self.client.get(reverse('check-authentication'))
+
+    def test_cached_token_skips_the_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.check(self.token).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.check(self.token)
+        self.assertEqual(response.data['username'], 'alice')
+
+    def test_logout_revokes_immediately(self):
+        self.assertEqual(self.check(self.token).status_code, 200)
+        response = self.client.post(reverse('logout-user'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.check(self.token).status_code, 401)
+
+    def test_login_rotates_cached_token(self):
+        self.assertEqual(self.check(self.token).status_code, 200)
+        self.client.credentials()
+        new_token = self.login('alice')
+        self.assertEqual(self.check(self.token).status_code, 401)
+        self.assertEqual(self.check(new_token).status_code, 200)
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        self.assertEqual(self.check(self.token).status_code, 200)
+        user = CustomUser.objects.get(username='alice')
+
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+
+        self.assertEqual(self.check(self.token).status_code, 401)
+
+    def test_deleted_user_is_rejected_immediately(self):
+        self.assertEqual(self.check(self.token).status_code, 200)
+
+        CustomUser.objects.get(username='alice').delete()
+
+        self.assertEqual(self.check(self.token).status_code, 401)
+
+    def test_inactive_cached_user_is_not_trusted(self):
+        self.assertEqual(self.check(self.token).status_code, 200)
+        # Deactivated behind the signal's back, e.g. with QuerySet.update()
+        CustomUser.objects.filter(username='alice').update(is_active=False)
+        user, token = token_cache.get(self.token)
+        user.is_active = False
+        token_cache.set(self.token, user, token)
+
+        self.assertEqual(self.check(self.token).status_code, 401)
+        self.assertIsNone(token_cache.get(self.token))
+
+    def test_cached_user_is_not_shared(self):
+        self.check(self.token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.client.get(reverse('user_scores'))
+        # The score looked up by the previous request must not leak into the cache
+        with self.assertNumQueries(1):
+            self.client.get(reverse('user_scores'))
+
+
+class QueryBudgetTests(TestCase):
+    """Upper bounds on the queries of every accounts endpoint, cold token cache included."""
+
+    def setUp(self):
+        use_event_buffer(self)
+        self.client = APIClient()
+        self.picture = ProfilePicture.objects.create(name='cat', image='profile_pictures/cat.png')
+        self.other_picture = ProfilePicture.objects.create(name='dog', image='profile_pictures/dog.png')
+        CustomUser.objects.create_user(username='bob', profile_picture=self.picture)
+        response = self.client.post(reverse('login'), {'username': 'bob'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {response.data["token"]}')
+
+    def test_register(self):
+        self.client.credentials()
+        # picture, savepoint, user insert, score insert, token insert, release
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                reverse('register'),
+                {'username': 'carol', 'profile_picture_id': self.picture.id},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user']['profile_picture']['name'], 'cat')
+        user = CustomUser.objects.get(username='carol')
+        self.assertEqual(user.profile_picture, self.picture)
+        self.assertEqual(user.user_score_profile.signing, 0)
+        self.assertEqual(user.auth_token.key, response.data['token'])
+
+    def test_register_duplicate_username(self):
+        self.client.credentials()
+        # savepoint, failed user insert, rollback, release
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('register'), {'username': 'bob'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Username already exists')
+        self.assertEqual(CustomUser.objects.filter(username='bob').count(), 1)
+
+    def test_login(self):
+        # savepoint, user with picture and token, token rotation, release
+        self.client.credentials()
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('login'), {'username': 'bob'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['profile_picture']['name'], 'cat')
+        self.assertEqual(Token.objects.get(user__username='bob').key, response.data['token'])
+
+    def test_login_unknown_user(self):
+        self.client.credentials()
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('login'), {'username': 'nobody'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_pictures(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('profile-pictures'))
+        self.assertEqual(len(response.data), 2)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('profile-pictures'))
+
+    def test_update_profile_picture(self):
+        # token, picture, user update
+        with self.assertNumQueries(3):
+            response = self.client.put(
+                reverse('update-profile-picture'), {'profile_picture_id': self.other_picture.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['profile_picture']['name'], 'dog')
+
+    def test_check_authentication(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('check-authentication'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('check-authentication'))
+
+    def test_logout(self):
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('logout-user'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Token.objects.filter(user__username='bob').exists())
+
+    def test_save_score(self):
+        # token, conditional update
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('save_score'), {'signing_score': 10}, format='json')
+        self.assertEqual(response.data['data']['high_score'], 10)
+
+    def test_save_recognition_score(self):
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                reverse('save_recognition_score'), {'recognition_score': 7}, format='json')
+        self.assertEqual(response.data['data']['high_score'], 7)
+
+    def test_sync_scores(self):
+        results = [{'board': ('signing', 'recognition')[i % 2], 'score': i} for i in range(100)]
+        # token, savepoint, read, update, release
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('scores-sync'), {'results': results}, format='json')
+        self.assertEqual(response.data['high_scores'], {'signing': 98, 'recognition': 99})
+
+    def test_score_history(self):
+        # token, history (nothing buffered to flush)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('score-history'))
+
+    def test_score_stats(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('score-stats'))
+
+    def test_user_scores(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user_scores'))
+        self.assertEqual(response.data, {'recognition': 0, 'signing': 0})
+
+    def test_leaderboard(self):
+        self.client.credentials()
+        leaderboard.top_cache.invalidate('signing')
+        # top-N rows, rank counts
+        with self.assertNumQueries(2):
+            self.client.get(reverse('leaderboard'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('leaderboard'))
+
+    def test_my_rank(self):
+        # token, score, rank count
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('leaderboard-me'))
+        self.assertEqual(response.data, {'board': 'signing', 'score': 0, 'rank': 1})
+
+
+class HighScoreTests(TestCase):
+    def setUp(self):
+        use_event_buffer(self)
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='dora')
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def submit(self, score):
+        return self.client.post(reverse('save_score'), {'signing_score': score}, format='json')
+
+    def sync(self, results):
+        return self.client.post(reverse('scores-sync'), {'results': results}, format='json')
+
+    def test_only_raises_the_high_score(self):
+        self.assertEqual(self.submit(40).data['message'], 'New high score saved successfully!')
+        response = self.submit(30)
+        self.assertEqual(response.data['message'], 'Score not saved - existing score is higher')
+        self.assertEqual(response.data['data'], {'username': 'dora', 'score': 30, 'high_score': 40})
+        self.assertEqual(Score.objects.get(user=self.user).signing, 40)
+
+    def test_rejects_invalid_scores(self):
+        for score in (None, 'ten', True, -1):
+            self.assertEqual(self.submit(score).status_code, 400)
+        response = self.client.post(reverse('save_recognition_score'), {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_without_score(self):
+        Score.objects.filter(user=self.user).delete()
+        response = self.client.post(reverse('save_recognition_score'), {'recognition_score': 5}, format='json')
+        self.assertEqual(response.data['data']['high_score'], 5)
+        self.assertEqual(Score.objects.get(user=self.user).recognition, 5)
+
+    def test_sync(self):
+        self.submit(50)
+        response = self.sync([
+            {'board': 'signing', 'score': 20, 'session': 'a'},
+            {'board': 'recognition', 'score': 7, 'session': 'a'},
+            {'board': 'recognition', 'score': 12, 'session': 'b'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 3)
+        self.assertEqual(response.data['improved'], {'signing': False, 'recognition': True})
+        self.assertEqual(response.data['high_scores'], {'signing': 50, 'recognition': 12})
+        score = Score.objects.get(user=self.user)
+        self.assertEqual((score.signing, score.recognition), (50, 12))
+
+    def test_sync_without_improvement_only_reads(self):
+        self.submit(50)
+        self.sync([{'board': 'signing', 'score': 10}])
+        with self.assertNumQueries(3):
+            response = self.sync([{'board': 'signing', 'score': 10}] * 20)
+        self.assertEqual(response.data['improved'], {'signing': False, 'recognition': False})
+
+    def test_sync_rejects_invalid_results(self):
+        for results in (None, [], [{'board': 'speed', 'score': 1}], [{'board': 'signing'}], ['x']):
+            self.assertEqual(self.sync(results).status_code, 400)
+        self.assertEqual(self.sync([{'board': 'signing', 'score': 1}] * 501).status_code, 400)
+
+    def test_improvement_refreshes_the_leaderboard(self):
+        leaderboard.top_cache.invalidate('signing')
+        self.assertEqual(self.client.get(reverse('leaderboard')).data['results'][0]['score'], 0)
+        self.submit(25)
+        self.assertEqual(self.client.get(reverse('leaderboard')).data['results'][0]['score'], 25)
+        self.sync([{'board': 'signing', 'score': 60}])
+        self.assertEqual(self.client.get(reverse('leaderboard')).data['results'][0]['score'], 60)
+
+
+class ScoreEventLogTests(TestCase):
+    def setUp(self):
+        self.buffer = use_event_buffer(self, flush_size=1000)
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(username='eli')
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def sync(self, *results):
+        response = self.client.post(reverse('scores-sync'), {'results': list(results)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def stats(self, board='signing'):
+        return self.client.get(reverse('score-stats')).data[board]
+
+    def test_submissions_are_written_behind(self):
+        self.client.post(reverse('save_score'), {'signing_score': 12}, format='json')
+        self.assertEqual(ScoreEvent.objects.count(), 0)
+        self.assertEqual(self.buffer.stats()['pending'], 1)
+        self.assertEqual(self.buffer.flush(), 1)
+        event = ScoreEvent.objects.get()
+        self.assertEqual((event.user, event.board, event.score), (self.user, 'signing', 12))
+
+    def test_flushes_on_size(self):
+        self.buffer.flush_size = 3
+        self.sync(*[{'board': 'recognition', 'score': i} for i in range(3)])
+        self.assertEqual(ScoreEvent.objects.count(), 3)
+        self.assertEqual(self.buffer.stats()['pending'], 0)
+
+    def test_flush_is_a_constant_number_of_queries(self):
+        users = [self.user] + [CustomUser.objects.create_user(username=f'user{i}') for i in range(3)]
+        # 150 events still fit one INSERT under SQLite's parameter limit
+        for count in (2, 150):
+            for i in range(count):
+                user = users[i % len(users)]
+                self.buffer.add(user.id, ('signing', 'recognition')[i % 2], i)
+            # savepoint, users, events, stats rows, stats read, stats update, release
+            with self.assertNumQueries(7):
+                self.buffer.flush()
+        self.assertEqual(ScoreEvent.objects.count(), 152)
+
+    def test_close_writes_what_is_left(self):
+        self.buffer.add(self.user.id, 'signing', 5)
+        self.buffer.close()
+        self.assertEqual(ScoreEvent.objects.count(), 1)
+
+    def test_failed_flush_keeps_the_events(self):
+        self.buffer.add(self.user.id, 'signing', 5)
+        with mock.patch.object(events, 'write_events', side_effect=RuntimeError('database is locked')):
+            with self.assertLogs('accounts.events', 'ERROR'):
+                self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.stats()['pending'], 1)
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_deleted_users_do_not_fail_the_batch(self):
+        other = CustomUser.objects.create_user(username='gone')
+        self.buffer.add(other.id, 'signing', 1)
+        self.buffer.add(self.user.id, 'signing', 2)
+        other.delete()
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_aggregates_match_the_log(self):
+        scores = [10, 30, 20, 50, 0, 40]
+        self.sync(*[{'board': 'signing', 'score': score} for score in scores[:2]])
+        self.buffer.flush()
+        self.sync(*[{'board': 'signing', 'score': score} for score in scores[2:]])
+        self.buffer.flush()
+
+        recent = scores[0]
+        for score in scores[1:]:
+            recent = events.RECENT_WEIGHT * score + (1 - events.RECENT_WEIGHT) * recent
+        stats = self.stats()
+        self.assertEqual(stats['attempts'], 6)
+        self.assertEqual(stats['average'], 25.0)
+        self.assertEqual(stats['best'], 50)
+        self.assertEqual(stats['last_score'], 40)
+        self.assertAlmostEqual(stats['recent_average'], round(recent, 2))
+        self.assertEqual(self.stats('recognition')['attempts'], 0)
+
+    def test_streak_across_flushes(self):
+        now = timezone.now()
+        day = lambda days: (now - timedelta(days=days)).isoformat()
+        self.sync({'board': 'signing', 'score': 1, 'played_at': day(5)})
+        self.buffer.flush()
+        self.sync(
+            {'board': 'signing', 'score': 1, 'played_at': day(3)},
+            {'board': 'signing', 'score': 1, 'played_at': day(2)},
+        )
+        self.buffer.flush()
+        self.assertEqual(ScoreStats.objects.get().streak, 2)
+        self.sync(
+            {'board': 'signing', 'score': 2, 'played_at': day(1)},
+            {'board': 'signing', 'score': 3, 'played_at': day(0)},
+            {'board': 'signing', 'score': 3, 'played_at': day(0)},
+        )
+        self.buffer.flush()
+        self.assertEqual(self.stats()['streak'], 4)
+        # An older result synced late doesn't break or extend it
+        self.sync({'board': 'signing', 'score': 9, 'played_at': day(4)})
+        self.buffer.flush()
+        stats = self.stats()
+        self.assertEqual((stats['streak'], stats['last_score'], stats['attempts']), (4, 3, 7))
+
+    def test_history_pages(self):
+        self.sync(*[{'board': 'signing', 'score': i, 'session': 's1'} for i in range(5)])
+        self.sync({'board': 'recognition', 'score': 99})
+        self.buffer.flush()
+        response = self.client.get(reverse('score-history'), {'limit': 3})
+        self.assertEqual([row['score'] for row in response.data['results']], [4, 3, 2])
+        response = self.client.get(reverse('score-history'), {'limit': 3, 'before': response.data['next']})
+        self.assertEqual([row['score'] for row in response.data['results']], [1, 0])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(response.data['results'][0]['session'], 's1')
+
+    def test_reads_leave_the_buffer_to_the_writer(self):
+        self.sync({'board': 'signing', 'score': 7})
+
+        self.assertEqual(self.client.get(reverse('score-history')).data['results'], [])
+        self.assertEqual(self.stats()['attempts'], 0)
+        self.assertEqual(self.buffer.stats()['pending'], 1)
+
+    def test_rejects_invalid_sync_metadata(self):
+        for result in ({'played_at': 'yesterday'}, {'played_at': 5}, {'session': 'x' * 65}):
+            response = self.client.post(
+                reverse('scores-sync'), {'results': [dict(result, board='signing', score=1)]}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+class PictureCatalogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.picture = ProfilePicture.objects.create(name='owl', image='profile_pictures/owl.png')
+        catalog.picture_catalog.invalidate()
+
+    def get(self, **headers):
+        return self.client.get(reverse('profile-pictures'), headers=headers)
+
+    def test_etag_and_cache_control(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(response.data[0]['name'], 'owl')
+
+    def test_not_modified_without_queries(self):
+        etag = self.get()['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.assertNumQueries(0):
+                response = self.get(if_none_match=header)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_changes_invalidate(self):
+        etag = self.get()['ETag']
+        self.picture.name = 'eagle'
+        self.picture.save()
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'eagle')
+        self.picture.delete()
+        response = self.get(if_none_match=response['ETag'])
+        self.assertEqual(response.data, [])
+
+    def test_same_catalog_keeps_its_etag(self):
+        etag = self.get()['ETag']
+        catalog.picture_catalog.invalidate()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+
+    def test_tokens_are_not_looked_up(self):
+        self.get()
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().status_code, 200)
+
+
+def jpeg_upload(name, size=(300, 200), color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def files(self):
+        directory = os.path.join(self.media_root, thumbnails.THUMBNAIL_DIR)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_rendered_on_save(self):
+        picture = ProfilePicture.objects.create(name='red', image=jpeg_upload('red.jpg'))
+        sizes = picture.thumbnails['sizes']
+        # 256 is larger than the 200 px source
+        self.assertEqual(sorted(sizes, key=int), ['64', '128'])
+        for size, formats in sizes.items():
+            for format, name in formats.items():
+                self.assertRegex(name, rf'^thumbnails/red-{size}\.[0-9a-f]{{16}}\.(jpg|webp)$')
+                with Image.open(os.path.join(self.media_root, name)) as image:
+                    self.assertEqual(image.format, format.upper())
+                    self.assertEqual(image.size, (int(size), int(size)))
+
+        data = ProfilePictureSerializer(picture).data
+        self.assertEqual(data['thumbnails']['64']['webp'], settings.MEDIA_URL + sizes['64']['webp'])
+
+    def test_unchanged_image_is_not_rendered_again(self):
+        picture = ProfilePicture.objects.create(name='red', image=jpeg_upload('red.jpg'))
+        with mock.patch.object(thumbnails, 'render_derivatives') as render:
+            picture.name = 'crimson'
+            picture.save()
+            ProfilePicture.objects.get().save()
+        render.assert_not_called()
+
+    def test_changed_image_replaces_the_thumbnails(self):
+        picture = ProfilePicture.objects.create(name='red', image=jpeg_upload('red.jpg'))
+        old = self.files()
+        picture.image = jpeg_upload('blue.jpg', color=(20, 20, 220))
+        picture.save()
+        new = self.files()
+        self.assertEqual(len(new), len(old))
+        self.assertFalse(set(old) & set(new))
+        self.assertEqual(ProfilePicture.objects.get().thumbnails, picture.thumbnails)
+
+    def test_load_profile_pictures(self):
+        for index in (1, 2, 3):
+            shutil.copy(os.path.join(settings.BASE_DIR, 'media', f'profile{index}.jpg'), self.media_root)
+        out = io.StringIO()
+        call_command('load_profile_pictures', workers=2, stdout=out)
+        self.assertEqual(ProfilePicture.objects.count(), 3)
+        self.assertEqual(len(self.files()), 3 * len(thumbnails.THUMBNAIL_SIZES) * 2)
+        for picture in ProfilePicture.objects.all():
+            self.assertEqual(
+                picture.thumbnails['source'],
+                thumbnails.source_digest(open(os.path.join(self.media_root, picture.image.name), 'rb').read()),
+            )
+
+        out = io.StringIO()
+        call_command('load_profile_pictures', workers=2, stdout=out)
+        self.assertEqual(out.getvalue().count('thumbnails up to date'), 3)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.signing = {'ann': 50, 'ben': 80, 'cat': 50, 'dan': 10, 'eve': 80, 'fay': 30}
+        for username, score in self.signing.items():
+            user = CustomUser.objects.create_user(username=username)
+            Score.objects.filter(user=user).update(signing=score, recognition=len(username))
+        self.cache = leaderboard.top_cache
+        self.size = self.cache.size
+        self.cache.size = 3
+        for board in leaderboard.BOARDS:
+            self.cache.invalidate(board)
+
+    def tearDown(self):
+        self.cache.size = self.size
+
+    def board(self, **params):
+        response = self.client.get(reverse('leaderboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranks_and_keyset_pages(self):
+        seen = []
+        data = self.board(limit=2)
+        while True:
+            seen.extend((entry['username'], entry['rank'], entry['score']) for entry in data['results'])
+            if data['next'] is None:
+                break
+            data = self.board(limit=2, cursor=data['next'])
+        self.assertEqual(seen, [
+            ('ben', 1, 80), ('eve', 1, 80), ('ann', 3, 50), ('cat', 3, 50), ('fay', 5, 30), ('dan', 6, 10),
+        ])
+
+    def test_pages_below_the_cache_match(self):
+        cached = self.board(limit=3)
+        self.cache.invalidate('signing')
+        self.cache.size = 100
+        uncached = self.board(limit=3)
+        self.assertEqual(cached, uncached)
+        self.assertEqual(self.board(limit=3, cursor=cached['next'])['results'][0]['rank'], 3)
+
+    def test_invalid_parameters(self):
+        for params in ({'board': 'speed'}, {'limit': 0}, {'limit': 'x'}, {'cursor': 'abc'}):
+            response = self.client.get(reverse('leaderboard'), params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_change_below_the_boundary_keeps_the_cache(self):
+        self.board()
+        score = Score.objects.get(user__username='dan')
+        score.signing = 20
+        score.save()
+        with self.assertNumQueries(0):
+            self.board(limit=3)
+
+    def test_change_reaching_the_top_invalidates(self):
+        self.board()
+        score = Score.objects.get(user__username='dan')
+        score.signing = 90
+        score.save()
+        data = self.board(limit=3)
+        self.assertEqual(data['results'][0], {'rank': 1, 'username': 'dan', 'profile_picture_id': None, 'score': 90})
+
+    def test_change_of_an_entry_invalidates(self):
+        self.board()
+        score = Score.objects.get(user__username='ben')
+        score.signing = 0
+        score.save()
+        self.assertEqual([entry['username'] for entry in self.board(limit=3)['results']], ['eve', 'ann', 'cat'])
+
+    def test_my_rank(self):
+        user = CustomUser.objects.get(username='cat')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get(reverse('leaderboard-me'))
+        self.assertEqual(response.data, {'board': 'signing', 'score': 50, 'rank': 3})
+        response = self.client.get(reverse('leaderboard-me'), {'board': 'recognition'})
+        self.assertEqual(response.data, {'board': 'recognition', 'score': 3, 'rank': 1})
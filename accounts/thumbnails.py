@@ -0,0 +1,143 @@
+"""
+Profile picture derivatives.
+
+Every picture gets square thumbnails in THUMBNAIL_SIZES, as JPEG and WebP,
+stored as thumbnails/<stem>-<size>.<hash>.<ext> where hash is taken from
+the thumbnail bytes: a name never changes content, so the files can be
+cached forever, and a changed picture gets new names.
+
+ProfilePicture.thumbnails records the sha256 of the source it was made
+from and the derivative names, {'source': ..., 'sizes': {'128': {'jpeg':
+..., 'webp': ...}}}. ProfilePicture.save() refreshes them when the source
+changed; load_profile_pictures renders many pictures in a process pool
+with render_derivatives, which only needs Pillow.
+"""
+import hashlib
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = tuple(getattr(settings, 'ACCOUNTS_THUMBNAIL_SIZES', (64, 128, 256)))
+THUMBNAIL_QUALITY = dict(getattr(settings, 'ACCOUNTS_THUMBNAIL_QUALITY', {'jpeg': 85, 'webp': 80}))
+THUMBNAIL_DIR = 'thumbnails'
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+
+def source_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def render_derivatives(data, stem, sizes=THUMBNAIL_SIZES, quality=THUMBNAIL_QUALITY):
+    """
+    Thumbnails of one source image, {size: {format: (name, bytes)}}.
+    Sizes larger than the source are skipped, except the smallest one.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        derivatives = {}
+        for size in sorted(sizes):
+            if derivatives and size > min(image.size):
+                break
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            derivatives[str(size)] = {}
+            for format, extension in EXTENSIONS.items():
+                buffer = io.BytesIO()
+                if format == 'jpeg':
+                    thumbnail.save(buffer, 'JPEG', quality=quality['jpeg'], optimize=True, progressive=True)
+                else:
+                    thumbnail.save(buffer, 'WEBP', quality=quality['webp'], method=6)
+                content = buffer.getvalue()
+                digest = hashlib.sha256(content).hexdigest()[:16]
+                name = f'{THUMBNAIL_DIR}/{stem}-{size}.{digest}.{extension}'
+                derivatives[str(size)][format] = (name, content)
+    return derivatives
+
+
+def read_source(field_file):
+    """Bytes of an ImageField value, committed to storage or still an upload."""
+    if not field_file._committed:
+        file = field_file.file
+        position = file.tell()
+        file.seek(0)
+        try:
+            return file.read()
+        finally:
+            file.seek(position)
+
+    with field_file.storage.open(field_file.name, 'rb') as f:
+        return f.read()
+
+
+def store_derivatives(storage, digest, derivatives, previous=None):
+    """Save rendered derivatives and return the ProfilePicture.thumbnails value."""
+    sizes = {}
+    for size, formats in derivatives.items():
+        sizes[size] = {}
+        for format, (name, content) in formats.items():
+            # Same bytes, same name: an existing file is already right
+            if not storage.exists(name):
+                storage.save(name, ContentFile(content))
+            sizes[size][format] = name
+
+    # Drop files of the previous source nothing refers to anymore
+    current = {name for formats in sizes.values() for name in formats.values()}
+    for formats in (previous or {}).get('sizes', {}).values():
+        for name in formats.values():
+            if name not in current and storage.exists(name):
+                storage.delete(name)
+
+    return {'source': digest, 'sizes': sizes}
+
+
+def stem_of(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def refresh_thumbnails(picture):
+    """
+    Re-render picture.thumbnails if its image changed since they were made.
+    Returns whether the field changed.
+    """
+    if not picture.image:
+        changed = bool(picture.thumbnails)
+        picture.thumbnails = {}
+        return changed
+
+    try:
+        data = read_source(picture.image)
+    except OSError as e:
+        # Also the case for rows created before their file is uploaded
+        logger.info("Profile picture %s unreadable, no thumbnails: %s", picture.image.name, e)
+        return False
+
+    digest = source_digest(data)
+    if (picture.thumbnails or {}).get('source') == digest:
+        return False
+
+    try:
+        derivatives = render_derivatives(data, stem_of(picture.image.name))
+    except (OSError, ValueError) as e:
+        logger.warning("Profile picture %s could not be decoded: %s", picture.image.name, e)
+        return False
+
+    picture.thumbnails = store_derivatives(picture.image.storage, digest, derivatives, picture.thumbnails)
+    return True
+
+
+def thumbnail_urls(picture):
+    """{size: {format: url}} for the serializer."""
+    storage = picture.image.storage
+    return {
+        size: {format: storage.url(name) for format, name in formats.items()}
+        for size, formats in (picture.thumbnails or {}).get('sizes', {}).items()
+    }
@@ -11,4 +11,9 @@ urlpatterns = [
     path('save_score/', views.save_score_view, name='save_score'),  # Ensure this matches your Flutter app
     path('save_recognition_score/', views.save_recognition_score_view, name='save_recognition_score'),
     path('user-scores/', views.get_user_scores, name='user_scores'),
+    path('scores/sync/', views.sync_scores_view, name='scores-sync'),
+    path('scores/history/', views.score_history_view, name='score-history'),
+    path('scores/stats/', views.score_stats_view, name='score-stats'),
+    path('leaderboard/', views.leaderboard_view, name='leaderboard'),
+    path('leaderboard/me/', views.my_rank_view, name='leaderboard-me'),
 ]
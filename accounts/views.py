@@ -1,17 +1,45 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from rest_framework import status 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import CustomUser, ProfilePicture, Score
-from .serializers import UserSerializer, ProfilePictureSerializer
+from .models import CustomUser, ProfilePicture, Score, ScoreEvent, ScoreStats
+from .serializers import UserSerializer
 from rest_framework.authtoken.models import Token
+from django_backend.metrics import stage
+from . import catalog, leaderboard, scores
+from .authentication import revoke_token, rotate_token, token_cache
+
+logger = logging.getLogger(__name__)
+
+# Fraction of score submissions logged at DEBUG level
+LOG_SAMPLE_RATE = getattr(settings, 'ACCOUNTS_DEBUG_LOG_SAMPLE_RATE', 0.01)
 
 @api_view(['GET'])
+@authentication_classes([])
 @permission_classes([AllowAny])
 def get_profile_pictures(request):
-    pictures = ProfilePicture.objects.all()
-    serializer = ProfilePictureSerializer(pictures, many=True)
-    return Response(serializer.data)
+    # Public catalog, served from memory; no token lookup either
+    pictures, etag = catalog.picture_catalog.get()
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [
+            tag.removeprefix('W/') for tag in parse_etags(if_none_match)]):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(pictures)
+
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=catalog.CATALOG_MAX_AGE, must_revalidate=True)
+    return response
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -25,27 +53,27 @@ def register_user(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    if CustomUser.objects.filter(username=username).exists():
-        return Response(
-            {'error': 'Username already exists'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    user = CustomUser.objects.create_user(username=username)
+    with stage(request, 'db'):
+        profile_picture = None
+        if profile_picture_id:
+            profile_picture = ProfilePicture.objects.filter(id=profile_picture_id).first()
 
-    if profile_picture_id:
+        # The unique username constraint replaces an exists() pre-check
         try:
-            profile_picture = ProfilePicture.objects.get(id=profile_picture_id)
-            user.profile_picture = profile_picture
-            user.save()
-        except ProfilePicture.DoesNotExist:
-            pass
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(username=username, profile_picture=profile_picture)
+                token = Token.objects.create(user=user)
+        except IntegrityError:
+            return Response(
+                {'error': 'Username already exists'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    Token.objects.filter(user=user).delete()
-    token, _ = Token.objects.get_or_create(user=user)
+    with stage(request, 'serialize'):
+        user_data = UserSerializer(user).data
 
     return Response({
-        'user': UserSerializer(user).data,
+        'user': user_data,
         'token': token.key
     }, status=status.HTTP_201_CREATED)
 
@@ -55,11 +83,13 @@ def login_user(request):
     username = request.data.get('username')
 
     try:
-        user = CustomUser.objects.get(username=username)
-        Token.objects.filter(user=user).delete()
-        token, _ = Token.objects.get_or_create(user=user)
+        with stage(request, 'db'), transaction.atomic():
+            user = CustomUser.objects.select_related('profile_picture', 'auth_token').get(username=username)
+            token = rotate_token(user)
+        with stage(request, 'serialize'):
+            user_data = UserSerializer(user).data
         return Response({
-            'user': UserSerializer(user).data,
+            'user': user_data,
             'token': token.key
         })
     except CustomUser.DoesNotExist:
@@ -82,7 +112,10 @@ def update_profile_picture(request):
     try:
         profile_picture = ProfilePicture.objects.get(id=profile_picture_id)
         request.user.profile_picture = profile_picture
-        request.user.save()
+        request.user.save(update_fields=['profile_picture'])
+        if token_cache is not None:
+            # The cached user still has the old picture
+            token_cache.invalidate(request.auth.key)
         return Response(UserSerializer(request.user).data)
     except ProfilePicture.DoesNotExist:
         return Response(
@@ -98,50 +131,47 @@ def check_authentication(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
-    Token.objects.filter(user=request.user).delete()
+    revoke_token(request.auth)
     return Response(
         {'message': 'Successfully logged out'},
         status=status.HTTP_200_OK
     )
 
+def save_high_score(request, board, field):
+    try:
+        score = scores.parse_score(request.data.get(field), field)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage(request, 'db'):
+        improved, high_score = scores.submit_high_score(request.user, board, score)
+
+    if improved:
+        message = 'New high score saved successfully!'
+    else:
+        message = 'Score not saved - existing score is higher'
+
+    return Response({
+        'status': 'success',
+        'message': message,
+        'data': {
+            'username': request.user.username,
+            'score': score,
+            'high_score': high_score
+        }
+    })
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_score_view(request):
     try:
-        print("Request Data:", request.data)
-        print("User:", request.user)
-        
-        signing_score = request.data.get('signing_score')
-        user = request.user
+        if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+            logger.debug("Request data: %s, user: %s", request.data, request.user)
 
-        # Get or create score object
-        score_obj, created = Score.objects.get_or_create(
-            user=user,
-            defaults={'signing': signing_score}
-        )
-        
-        # Only update if the new score is higher or if this is a new score
-        if created or signing_score > score_obj.signing:
-            score_obj.signing = signing_score
-            score_obj.save()
-            message = 'New high score saved successfully!'
-        else:
-            message = 'Score not saved - existing score is higher'
-
-        return Response({
-            'status': 'success',
-            'message': message,
-            'data': {
-                'username': user.username,
-                'score': signing_score,
-                'high_score': score_obj.signing
-            }
-        })
+        return save_high_score(request, 'signing', 'signing_score')
 
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error saving signing score: %s", e)
         
         return Response({
             'error': 'Internal server error',
@@ -152,32 +182,7 @@ def save_score_view(request):
 @permission_classes([IsAuthenticated])
 def save_recognition_score_view(request):
     try:
-        recognition_score = request.data.get('recognition_score')
-        user = request.user
-        
-        # Get or create score object
-        score_obj, created = Score.objects.get_or_create(
-            user=user,
-            defaults={'recognition': recognition_score}
-        )
-        
-        # Only update if the new score is higher or if this is a new score
-        if created or recognition_score > score_obj.recognition:
-            score_obj.recognition = recognition_score
-            score_obj.save()
-            message = 'New high score saved successfully!'
-        else:
-            message = 'Score not saved - existing score is higher'
-
-        return Response({
-            'status': 'success',
-            'message': message,
-            'data': {
-                'username': user.username,
-                'score': recognition_score,
-                'high_score': score_obj.recognition
-            }
-        })
+        return save_high_score(request, 'recognition', 'recognition_score')
 
     except Exception as e:
         return Response({
@@ -185,15 +190,145 @@ def save_recognition_score_view(request):
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_scores_view(request):
+    """Apply results buffered by an offline client, {"results": [{"board", "score"}, ...]}."""
+    try:
+        results = scores.parse_results(request.data.get('results'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage(request, 'db'):
+        improved, high_scores = scores.sync_high_scores(request.user, results)
+
+    return Response({
+        'status': 'success',
+        'applied': len(results),
+        'improved': improved,
+        'high_scores': high_scores,
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_scores(request):
     try:
-        score = request.user.user_score_profile
+        with stage(request, 'db'):
+            score = request.user.user_score_profile
         return Response({
             'recognition': score.recognition,
             'signing': score.signing,
         })
     except Score.DoesNotExist:
         return Response({'error': 'Score not found'}, status=status.HTTP_404_NOT_FOUND)
-    
\ No newline at end of file
+    
+
+def requested_board(request):
+    board = request.query_params.get('board', 'signing')
+    if board not in leaderboard.BOARDS:
+        raise ValueError(f"board must be one of {', '.join(leaderboard.BOARDS)}")
+    return board
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def leaderboard_view(request):
+    try:
+        board = requested_board(request)
+        raw_limit = request.query_params.get('limit')
+        limit = leaderboard.PAGE_SIZE
+        if raw_limit is not None:
+            if not raw_limit.isdigit() or not 1 <= int(raw_limit) <= leaderboard.MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {leaderboard.MAX_PAGE_SIZE}")
+            limit = int(raw_limit)
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            cursor = leaderboard.decode_cursor(cursor)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage(request, 'db'):
+        entries, next_cursor = leaderboard.page(board, limit, cursor)
+
+    return Response({
+        'board': board,
+        'results': [
+            {key: entry[key] for key in ('rank', 'username', 'profile_picture_id', 'score')}
+            for entry in entries
+        ],
+        'next': next_cursor,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_rank_view(request):
+    try:
+        board = requested_board(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with stage(request, 'db'):
+            score = getattr(request.user.user_score_profile, board)
+            rank = leaderboard.rank_of(board, score)
+    except Score.DoesNotExist:
+        return Response({'error': 'Score not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({'board': board, 'score': score, 'rank': rank})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def score_history_view(request):
+    """
+    Submitted results of one board, newest first, ?before=<id> for the next
+    page. Results reach the log through the write-behind buffer, so the
+    newest ones show up within ACCOUNTS_SCORE_EVENT_FLUSH_INTERVAL seconds.
+    """
+    try:
+        board = requested_board(request)
+        limit = request.query_params.get('limit', str(leaderboard.PAGE_SIZE))
+        before = request.query_params.get('before')
+        if not limit.isdigit() or not 1 <= int(limit) <= leaderboard.MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {leaderboard.MAX_PAGE_SIZE}")
+        if before is not None and not before.isdigit():
+            raise ValueError("before must be an event id")
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage(request, 'db'):
+        history = ScoreEvent.objects.filter(user=request.user, board=board).order_by('-id')
+        if before is not None:
+            history = history.filter(id__lt=int(before))
+        rows = list(history.values('id', 'score', 'session', 'played_at')[:int(limit)])
+
+    return Response({
+        'board': board,
+        'results': rows,
+        'next': str(rows[-1]['id']) if len(rows) == int(limit) else None,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def score_stats_view(request):
+    """
+    Per-board aggregates, maintained incrementally by the event log. Like the
+    history they trail submissions by up to the buffer's flush interval.
+    """
+    with stage(request, 'db'):
+        rows = {stats.board: stats for stats in ScoreStats.objects.filter(user=request.user)}
+
+    today = timezone.localdate()
+    data = {}
+    for board in leaderboard.BOARDS:
+        stats = rows.get(board) or ScoreStats(board=board)
+        # A streak is still alive until a full day passes without playing
+        alive = stats.streak_day is not None and stats.streak_day >= today - timedelta(days=1)
+        data[board] = {
+            'attempts': stats.attempts,
+            'average': round(stats.average, 2),
+            'recent_average': round(stats.recent_average, 2),
+            'best': stats.best,
+            'last_score': stats.last_score,
+            'last_played_at': stats.last_played_at,
+            'streak': stats.streak if alive else 0,
+        }
+    return Response(data)
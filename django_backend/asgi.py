@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from handsign_recognition.runtime import boot
+from handsign_recognition.streaming import websocket_application
+
+boot()
+
+
+async def application(scope, receive, send):
+    # WebSocket streaming recognition, everything else goes to Django
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,70 @@
+"""
+Key/value cache backends shared by the apps.
+
+Both take get/set/delete on string keys and expire entries after ttl
+seconds: LocalCacheBackend per process, DjangoCacheBackend through a
+Django cache alias so every worker sees the same entries.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class LocalCacheBackend:
+    # In-process LRU with a per-entry TTL
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    # Django's cache framework, so hits are shared across workers
+    evictions = 0
+
+    def __init__(self, alias='default', ttl=30):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(key)
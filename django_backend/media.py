@@ -0,0 +1,154 @@
+"""
+Media file serving for production.
+
+Replaces django.conf.urls.static.static(), which only works with DEBUG and
+reads files in Python. Files are returned as FileResponse objects, which
+WSGI servers with wsgi.file_wrapper (gunicorn, uWSGI) send with
+os.sendfile. With MEDIA_SENDFILE_BACKEND set, the front proxy sends the
+file instead and the worker only writes headers:
+
+- 'x-accel-redirect' (nginx): X-Accel-Redirect: MEDIA_ACCEL_REDIRECT_PREFIX + path,
+  with an internal location aliased to MEDIA_ROOT
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd): X-Sendfile: absolute path
+
+Single byte ranges (Range/If-Range) and If-Modified-Since are handled
+here, the proxy handles them when it sends the file. Content-hashed names
+such as the profile picture thumbnails get an immutable Cache-Control.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# <name>.<hex digest>.<ext>, as written by accounts.thumbnails
+HASHED_NAME = re.compile(getattr(settings, 'MEDIA_HASHED_NAME_PATTERN', r'\.[0-9a-f]{12,}\.[A-Za-z0-9]+$'))
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    # Reads at most length bytes of an already positioned file. No fileno(),
+    # so servers don't sendfile past the end of the range.
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single byte range, None to serve the
+    whole file (no header, several ranges or a malformed one), or
+    ValueError when unsatisfiable.
+    """
+    match = RANGE.match(header.replace(' ', '')) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range, the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("Range starts past the end of the file")
+    return start, end
+
+
+def cache_headers(response, path, mtime):
+    response['Last-Modified'] = http_date(mtime)
+    if HASHED_NAME.search(path):
+        # The name changes with the content, never revalidate
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        raise Http404("File not found")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found")
+
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return cache_headers(HttpResponseNotModified(), path, stat.st_mtime)
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+
+    if SENDFILE_BACKEND == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(path)
+        return cache_headers(response, path, stat.st_mtime)
+    if SENDFILE_BACKEND == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return cache_headers(response, path, stat.st_mtime)
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    # A stale If-Range (the file changed since) means the whole file
+    if not if_range or parse_http_date_safe(if_range) == int(stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    elif byte_range is None:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        file = open(fullpath, 'rb')
+        file.seek(start)
+        if end == size - 1:
+            # Open-ended ranges (resumed downloads) keep the file for sendfile
+            response = FileResponse(file, content_type=content_type, status=206)
+        else:
+            response = FileResponse(RangeFile(file, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    return cache_headers(response, path, stat.st_mtime)
@@ -0,0 +1,293 @@
+"""
+In-process request metrics.
+
+Views time their stages with ``with stage(request, 'decode'):``. The
+middleware turns those timings into a Server-Timing response header and
+everything is aggregated into histograms and counters that /metrics
+renders in the Prometheus text format.
+
+With METRICS_MULTIPROCESS_DIR set, every worker process periodically dumps
+its samples to <dir>/<pid>.json and /metrics sums the files of all workers.
+Samples are keyed by their tuple of label values; the dump files store them
+as [label values, sample] pairs, since JSON objects only take string keys.
+Files of workers that have exited are removed when /metrics is collected,
+their counters then reset like those of any restarted process.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+MULTIPROCESS_DIR = getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+
+registry = []
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total, sample):
+        for key, value in sample.items():
+            total[key] = total.get(key, 0) + value
+        return total
+
+    def render(self, samples):
+        lines = []
+        for key, value in sorted(samples.items()):
+            lines.append(f'{self.name}{format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(counts) for key, counts in self._values.items()}
+
+    @staticmethod
+    def merge(total, sample):
+        for key, counts in sample.items():
+            if key in total:
+                total[key] = [a + b for a, b in zip(total[key], counts)]
+            else:
+                total[key] = list(counts)
+        return total
+
+    def render(self, samples):
+        lines = []
+        for key, counts in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames + ('le',), key + (str(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {counts[-1]}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def format_labels(labelnames, key):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{escape(value)}"' for name, value in zip(labelnames, key))
+    return '{' + pairs + '}'
+
+
+def escape(value):
+    # Label values may hold anything, the text format only escapes these three
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_latency = Histogram(
+    'http_request_duration_seconds', 'Request latency by view and status', ('view', 'status'))
+requests_total = Counter(
+    'http_requests_total', 'Requests by view and status', ('view', 'status'))
+stage_latency = Histogram(
+    'view_stage_duration_seconds', 'Latency of the timed stages inside a view', ('view', 'stage'))
+
+
+@contextmanager
+def stage(request, name):
+    """Time a block of a view; shows up in Server-Timing and view_stage_duration_seconds."""
+    request = getattr(request, '_request', request)  # DRF wraps the HttpRequest
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = getattr(request, 'stage_timings', None)
+        if timings is not None:
+            timings.append((name, elapsed))
+        stage_latency.observe(elapsed, view=view_name(request), stage=name)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match and match.url_name else 'unknown'
+
+
+class MetricsMiddleware:
+    # Runs natively in both modes: a sync-only middleware in front of the
+    # async views would push every ASGI request through one thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.stage_timings = []
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.finish(request, response, start)
+
+    async def __acall__(self, request):
+        request.stage_timings = []
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, start)
+
+    def finish(self, request, response, start):
+        elapsed = time.perf_counter() - start
+
+        view = view_name(request)
+        if view != 'metrics':
+            request_latency.observe(elapsed, view=view, status=response.status_code)
+            requests_total.inc(view=view, status=response.status_code)
+
+        entries = [f'{name};dur={duration * 1000:.2f}' for name, duration in request.stage_timings]
+        entries.append(f'total;dur={elapsed * 1000:.2f}')
+        response['Server-Timing'] = ', '.join(entries)
+
+        maybe_flush()
+        return response
+
+
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def snapshot():
+    return {metric.name: metric.snapshot() for metric in registry}
+
+
+def maybe_flush(force=False):
+    global _last_flush
+    if not MULTIPROCESS_DIR:
+        return
+
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+        path = os.path.join(MULTIPROCESS_DIR, f'{os.getpid()}.json')
+        samples = {name: [[list(key), value] for key, value in sample.items()]
+                   for name, sample in snapshot().items()}
+        with open(path + '.tmp', 'w') as f:
+            json.dump(samples, f)
+        os.replace(path + '.tmp', path)
+    finally:
+        _flush_lock.release()
+
+
+def process_alive(pid):
+    if os.name != 'posix':
+        # Signal 0 only probes on POSIX, keep every file elsewhere
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but owned by another user
+        return True
+    return True
+
+
+def collect():
+    """Samples of this process, or of every worker in multiprocess mode."""
+    if not MULTIPROCESS_DIR:
+        return snapshot()
+
+    maybe_flush(force=True)
+    merged = {metric.name: {} for metric in registry}
+    metrics = {metric.name: metric for metric in registry}
+    for filename in os.listdir(MULTIPROCESS_DIR):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(MULTIPROCESS_DIR, filename)
+        try:
+            pid = int(filename[:-len('.json')])
+        except ValueError:
+            continue
+        if not process_alive(pid):
+            # A worker that exited or was killed, its pid may be reused later
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                samples = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, sample in samples.items():
+            if name in metrics:
+                metrics[name].merge(merged[name], {tuple(key): value for key, value in sample})
+    return merged
+
+
+def render():
+    samples = collect()
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.render(samples.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -135,7 +136,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-      'rest_framework.authentication.TokenAuthentication',  
+      'accounts.authentication.CachedTokenAuthentication',  
     ],
 }
 
@@ -146,4 +147,137 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_METHODS = [
     'GET',
     'POST',
-]
\ No newline at end of file
+]
+
+# Hand sign recognition
+
+# Largest upload accepted by the prediction endpoints (bytes)
+HANDSIGN_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+# Most images or landmark sets accepted by one /api/predict/batch/ request
+HANDSIGN_MAX_BATCH_SIZE = 32
+
+# Largest absolute pixel coordinate accepted in client supplied landmarks
+HANDSIGN_MAX_LANDMARK_COORDINATE = 1 << 16
+
+# Most hands /api/predict/?hands=N detects and classifies in one frame
+HANDSIGN_MAX_NUM_HANDS = 4
+
+# Micro-batch concurrent single predictions into one classifier invoke
+HANDSIGN_MICRO_BATCHING = False
+HANDSIGN_MICRO_BATCH_SIZE = 16
+HANDSIGN_MICRO_BATCH_WAIT = 0.002  # seconds
+HANDSIGN_MICRO_BATCH_QUEUE_SIZE = 256
+HANDSIGN_MICRO_BATCH_TIMEOUT = 5.0  # seconds a request waits for its batch before a 503
+
+# Classifier bundles: <name>.tflite (float32), <name>.<variant>.tflite and
+# <name>_label.csv in HANDSIGN_MODEL_DIR (None: handsign_recognition/models).
+# Requests pick a variant with ?variant=; changed files are picked up within
+# the reload interval without a restart (0 disables the check).
+HANDSIGN_MODEL_DIR = None
+HANDSIGN_MODEL_NAME = 'keypoint_classifier'
+HANDSIGN_MODEL_VARIANT = 'float32'
+HANDSIGN_MODEL_RELOAD_INTERVAL = 2.0  # seconds
+
+# Per-process pool of MediaPipe Hands + interpreter instances.
+# None sizes the pool to the CPU count.
+HANDSIGN_POOL_SIZE = None
+HANDSIGN_POOL_TIMEOUT = 5.0  # seconds to wait for a free instance
+
+# WebSocket streaming recognition (ws://<host>/ws/predict/, ASGI only)
+HANDSIGN_STREAM_MAX_SESSIONS = 16
+HANDSIGN_STREAM_QUEUE_SIZE = 2  # frames buffered per session
+
+# Process pool behind predict/async/. Each worker process holds its own
+# MediaPipe Hands and interpreter; None sizes the pool to the CPU count and
+# the in-flight limit to four frames per worker. Past the limit the view
+# answers 503 with Retry-After.
+HANDSIGN_OFFLOAD_WORKERS = None
+HANDSIGN_OFFLOAD_MAX_IN_FLIGHT = None
+HANDSIGN_OFFLOAD_RETRY_AFTER = 1  # seconds
+
+# Classifier engine: 'tflite' (the interpreter) or 'numpy' (the MLP evaluated
+# with NumPy from the weights in the .tflite file, no TensorFlow import).
+# None uses the tuning profile's choice, the interpreter without one.
+HANDSIGN_CLASSIFIER_ENGINE = None
+
+# Host tuning profile (interpreter threads, XNNPACK, model variant, MediaPipe
+# model_complexity), written by `manage.py tune_inference`. With
+# HANDSIGN_AUTO_TUNE the first worker to start on a host without a matching
+# profile benchmarks the candidates and writes it.
+HANDSIGN_TUNING_PROFILE = BASE_DIR / 'handsign_tuning.json'
+HANDSIGN_AUTO_TUNE = False
+HANDSIGN_TUNING_MIN_AGREEMENT = 0.99  # share of reference predictions to reproduce
+
+# Build the inference stack when the WSGI/ASGI application loads rather than
+# on the first request. TensorFlow (or tflite_runtime when installed),
+# MediaPipe and OpenCV are otherwise imported lazily.
+HANDSIGN_WARM_UP = False
+
+# Prediction cache for repeated frames: 'local' (per-process LRU),
+# 'django' (the CACHES alias below, shared across workers) or None to disable
+HANDSIGN_CACHE_BACKEND = 'local'
+HANDSIGN_CACHE_ALIAS = 'default'
+HANDSIGN_CACHE_SIZE = 1024  # entries per level, local backend only
+HANDSIGN_CACHE_TTL = 30  # seconds
+HANDSIGN_CACHE_QUANTIZATION = 0.01  # landmark vector quantization step
+
+# Fraction of predictions / score submissions logged at DEBUG level
+HANDSIGN_DEBUG_LOG_SAMPLE_RATE = 0.01
+ACCOUNTS_DEBUG_LOG_SAMPLE_RATE = 0.01
+
+# Request metrics served at /metrics. With several worker processes, point
+# this at a directory shared by the workers so /metrics aggregates them all.
+METRICS_MULTIPROCESS_DIR = None
+METRICS_FLUSH_INTERVAL = 5.0  # seconds between per-worker dumps
+
+# token -> user cache used by CachedTokenAuthentication: 'local' (per-process
+# LRU), 'django' (the CACHES alias, shared across workers) or None to disable.
+# Logout/login invalidate it immediately in the process that handles them;
+# with several workers use 'django' so the other workers see it too.
+ACCOUNTS_TOKEN_CACHE_BACKEND = 'local'
+ACCOUNTS_TOKEN_CACHE_ALIAS = 'default'
+ACCOUNTS_TOKEN_CACHE_SIZE = 4096  # tokens, local backend only
+ACCOUNTS_TOKEN_CACHE_TTL = 60  # seconds
+
+# /api/auth/leaderboard/: the first TOP_N entries of each board are cached
+# ('local' per process, 'django' for the CACHES alias, None to disable) until
+# a score change can affect them
+ACCOUNTS_LEADERBOARD_TOP_N = 100
+ACCOUNTS_LEADERBOARD_PAGE_SIZE = 50
+ACCOUNTS_LEADERBOARD_MAX_PAGE_SIZE = 100
+ACCOUNTS_LEADERBOARD_CACHE_BACKEND = 'local'
+ACCOUNTS_LEADERBOARD_CACHE_ALIAS = 'default'
+ACCOUNTS_LEADERBOARD_CACHE_TTL = 300  # seconds
+
+# Most buffered results accepted by one /api/auth/scores/sync/ request
+ACCOUNTS_SCORE_SYNC_MAX_RESULTS = 500
+
+# Score event log (history and per-user aggregates). Submissions are buffered
+# in-process and written in batches of FLUSH_SIZE or every FLUSH_INTERVAL
+# seconds, and on shutdown. Past MAX_PENDING unwritten events new ones are
+# dropped. Score history and stats trail submissions by up to FLUSH_INTERVAL.
+ACCOUNTS_SCORE_EVENT_FLUSH_SIZE = 200
+ACCOUNTS_SCORE_EVENT_FLUSH_INTERVAL = 2.0  # seconds
+ACCOUNTS_SCORE_EVENT_MAX_PENDING = 10000
+ACCOUNTS_SCORE_RECENT_WEIGHT = 0.2  # weight of the newest attempt in recent_average
+
+# GET /api/auth/profile-pictures/ is served from memory with a strong ETag.
+# ProfilePicture signals refresh it in the process that changed it; other
+# processes (e.g. after load_profile_pictures) pick changes up within TTL.
+ACCOUNTS_PICTURE_CATALOG_TTL = 60  # seconds
+ACCOUNTS_PICTURE_CATALOG_MAX_AGE = 0  # Cache-Control max-age, clients revalidate with If-None-Match
+
+# Square profile picture thumbnails, JPEG and WebP, under MEDIA_ROOT/thumbnails
+# with content-hashed names. Rendered on save and by load_profile_pictures.
+ACCOUNTS_THUMBNAIL_SIZES = (64, 128, 256)
+ACCOUNTS_THUMBNAIL_QUALITY = {'jpeg': 85, 'webp': 80}
+
+# MEDIA_URL is served by django_backend.media in production too. Files are
+# sent with os.sendfile where the WSGI server supports it; set the backend
+# to 'x-accel-redirect' (nginx, internal location at ACCEL_REDIRECT_PREFIX
+# aliased to MEDIA_ROOT) or 'x-sendfile' (Apache, lighttpd) to have the
+# front proxy send them instead. Content-hashed names are cached as immutable.
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600  # seconds, for names without a content hash
@@ -0,0 +1,284 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from . import media, metrics
+from .cache import LocalCacheBackend
+
+
+class ServeMediaTests(SimpleTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        with open(os.path.join(base, 'secret.txt'), 'w') as f:
+            f.write('outside MEDIA_ROOT')
+        self.media_root = os.path.join(base, 'media')
+        os.makedirs(os.path.join(self.media_root, 'thumbnails'))
+        for name in ('profile.jpg', 'thumbnails/profile-64.0123456789abcdef.webp'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(self.content)
+        self.mtime = os.stat(os.path.join(self.media_root, 'profile.jpg')).st_mtime
+
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, path='profile.jpg', **headers):
+        return self.client.get(reverse('media', kwargs={'path': path}), headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Last-Modified'], http_date(self.mtime))
+        self.assertEqual(response['Cache-Control'], f'public, max-age={media.CACHE_MAX_AGE}')
+
+    def test_hashed_names_are_immutable(self):
+        response = self.get('thumbnails/profile-64.0123456789abcdef.webp')
+
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_single_range(self):
+        response = self.get(range='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_range_past_the_end_is_truncated(self):
+        response = self.get(range='bytes=1000-5000')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[1000:])
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1023/{len(self.content)}')
+
+    def test_suffix_range(self):
+        response = self.get(range='bytes=-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[-5:])
+        self.assertEqual(response['Content-Range'], f'bytes 1019-1023/{len(self.content)}')
+
+    def test_open_ended_range(self):
+        response = self.get(range='bytes=100-')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.content[100:])
+        self.assertEqual(response['Content-Length'], str(len(self.content) - 100))
+
+    def test_unsatisfiable_ranges(self):
+        for header in (f'bytes={len(self.content)}-', 'bytes=20-10', 'bytes=-0'):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_multiple_or_malformed_ranges_get_the_whole_file(self):
+        for header in ('bytes=0-1,5-6', 'bytes=-', 'items=0-1'):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(self.body(response), self.content)
+
+    def test_if_range(self):
+        fresh = self.get(range='bytes=0-1', if_range=http_date(self.mtime))
+        stale = self.get(range='bytes=0-1', if_range=http_date(self.mtime - 60))
+
+        self.assertEqual(fresh.status_code, 206)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.body(stale), self.content)
+
+    def test_if_modified_since(self):
+        response = self.get(if_modified_since=http_date(self.mtime))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Last-Modified'], http_date(self.mtime))
+        self.assertEqual(self.get(if_modified_since=http_date(self.mtime - 60)).status_code, 200)
+
+    def test_head_and_post(self):
+        response = self.client.head(reverse('media', kwargs={'path': 'profile.jpg'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response.content, b'')
+
+        self.assertEqual(self.client.post(reverse('media', kwargs={'path': 'profile.jpg'})).status_code, 405)
+
+    def test_missing_files_and_traversal(self):
+        for path in ('missing.jpg', 'thumbnails', '../secret.txt', 'thumbnails/../../secret.txt'):
+            self.assertEqual(self.get(path).status_code, 404, path)
+        self.assertEqual(self.client.get('/media/%2e%2e/secret.txt').status_code, 404)
+
+    def test_accel_redirect(self):
+        with mock.patch.object(media, 'SENDFILE_BACKEND', 'x-accel-redirect'):
+            response = self.get('thumbnails/profile-64.0123456789abcdef.webp')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/thumbnails/profile-64.0123456789abcdef.webp')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.content, b'')
+
+    def test_sendfile(self):
+        with mock.patch.object(media, 'SENDFILE_BACKEND', 'x-sendfile'):
+            response = self.get(range='bytes=0-1')
+
+        # The front server handles the range
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'profile.jpg'))
+        self.assertEqual(response['Last-Modified'], http_date(self.mtime))
+        self.assertEqual(response.content, b'')
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        # Metrics register themselves, keep the test ones out of /metrics
+        patcher = mock.patch.object(metrics, 'registry', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.requests = metrics.Counter('test_requests_total', 'Requests', ('view', 'status'))
+        self.latency = metrics.Histogram('test_latency_seconds', 'Latency', ('view',), buckets=(0.1, 1.0))
+
+    def test_counter_rendering(self):
+        self.requests.inc(view='predict', status=200)
+        self.requests.inc(2, view='predict', status=200)
+        self.requests.inc(view='batch', status=400)
+
+        self.assertEqual(self.requests.render(self.requests.snapshot()), [
+            'test_requests_total{view="batch",status="400"} 1',
+            'test_requests_total{view="predict",status="200"} 3',
+        ])
+
+    def test_histogram_rendering(self):
+        for value in (0.05, 0.5, 0.5, 3.0):
+            self.latency.observe(value, view='predict')
+
+        self.assertEqual(self.latency.render(self.latency.snapshot()), [
+            'test_latency_seconds_bucket{view="predict",le="0.1"} 1',
+            'test_latency_seconds_bucket{view="predict",le="1.0"} 3',
+            'test_latency_seconds_bucket{view="predict",le="+Inf"} 4',
+            'test_latency_seconds_sum{view="predict"} 4.05',
+            'test_latency_seconds_count{view="predict"} 4',
+        ])
+
+    def test_label_values_are_escaped(self):
+        self.requests.inc(view='a"b\\c\nd', status=200)
+
+        self.assertEqual(
+            self.requests.render(self.requests.snapshot()),
+            ['test_requests_total{view="a\\"b\\\\c\\nd",status="200"} 1'],
+        )
+
+    def test_server_timing_header(self):
+        def view(request):
+            with metrics.stage(request, 'decode'):
+                pass
+            with metrics.stage(request, 'classify'):
+                pass
+            return HttpResponse()
+
+        response = metrics.MetricsMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertRegex(
+            response['Server-Timing'], r'^decode;dur=\d+\.\d\d, classify;dur=\d+\.\d\d, total;dur=\d+\.\d\d$')
+
+    def test_middleware_times_real_requests(self):
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^total;dur=')
+
+    def write_dump(self, directory, pid, samples):
+        with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+            json.dump(samples, f)
+
+    def multiprocess_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        patcher = mock.patch.object(metrics, 'MULTIPROCESS_DIR', directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return directory
+
+    def test_collect_merges_the_dump_files_of_every_worker(self):
+        directory = self.multiprocess_dir()
+        # Another live worker, keyed by label value lists like maybe_flush writes them
+        self.write_dump(directory, os.getppid(), {
+            'test_requests_total': [[['predict', '200'], 2], [['batch', '400'], 1]],
+            'test_latency_seconds': [[['predict'], [1, 0, 0, 0.05]]],
+        })
+        self.requests.inc(view='predict', status=200)
+        self.latency.observe(0.5, view='predict')
+
+        samples = metrics.collect()
+
+        self.assertEqual(samples['test_requests_total'], {('predict', '200'): 3, ('batch', '400'): 1})
+        self.assertEqual(samples['test_latency_seconds'], {('predict',): [1, 1, 0, 0.55]})
+        self.assertEqual(sorted(os.listdir(directory)), sorted([f'{os.getpid()}.json', f'{os.getppid()}.json']))
+        # The merged label tuples render as labels, not as one stringified key
+        self.assertIn('test_requests_total{view="predict",status="200"} 3\n', metrics.render())
+
+    def test_collect_prunes_the_files_of_dead_workers(self):
+        directory = self.multiprocess_dir()
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        self.write_dump(directory, worker.pid, {'test_requests_total': [[['predict', '200'], 5]]})
+        self.write_dump(directory, os.getppid(), {'test_requests_total': [[['predict', '200'], 2]]})
+
+        samples = metrics.collect()
+
+        self.assertEqual(samples['test_requests_total'], {('predict', '200'): 2})
+        self.assertFalse(os.path.exists(os.path.join(directory, f'{worker.pid}.json')))
+
+
+class LocalCacheBackendTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LocalCacheBackend(max_size=2, ttl=30)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+
+        cache.set('c', 3)
+
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = LocalCacheBackend(max_size=2, ttl=30)
+        with mock.patch('django_backend.cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with mock.patch('django_backend.cache.time.monotonic', return_value=129.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('django_backend.cache.time.monotonic', return_value=131.0):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_delete(self):
+        cache = LocalCacheBackend()
+        cache.set('a', 1)
+
+        cache.delete('a')
+        cache.delete('missing')
+
+        self.assertIsNone(cache.get('a'))
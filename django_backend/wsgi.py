@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_backend.settings')
 
 application = get_wsgi_application()
+
+# Imported after Django is set up
+from handsign_recognition.runtime import boot
+
+boot()
@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError
+
+import numpy as np
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Request:
+    __slots__ = ('landmarks', 'future', 'enqueued')
+
+    def __init__(self, landmarks):
+        self.landmarks = landmarks
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects single-row classification requests from many threads and runs
+    them through classify_batch together. A batch is flushed once it holds
+    max_batch_size rows or max_wait seconds after its first row arrived,
+    whichever comes first.
+
+    Batches are padded to max_batch_size rows, so the interpreter keeps one
+    input shape instead of reallocating its tensors for every batch size.
+    """
+
+    # Seconds an idle thread waits before checking whether it was closed
+    idle_timeout = 1.0
+
+    def __init__(self, classify_batch, max_batch_size=16, max_wait=0.002, max_queue_size=256,
+                 timeout=5.0, bundle=None):
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        # The model bundle classify_batch belongs to, for callers that swap batchers
+        self.bundle = bundle
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        # Held while checking _closed and queueing, so nothing is queued
+        # after the worker decided to exit
+        self._submit_lock = threading.Lock()
+        self._input = np.zeros((max_batch_size, 42), dtype=np.float32)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def submit(self, landmark_list):
+        """Queue one preprocessed 42-float vector, returns a Future of (id, confidence)."""
+        request = _Request(landmark_list)
+        with self._submit_lock:
+            if self._closed:
+                raise QueueFull("Classifier is being replaced")
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(request)
+            except queue.Full:
+                raise QueueFull("Classifier queue is full")
+        return request.future
+
+    def close(self):
+        """Refuse new requests; the thread exits once the queue has drained."""
+        with self._submit_lock:
+            self._closed = True
+
+    def __call__(self, landmark_list, timeout=None):
+        # Same calling convention as KeyPointClassifier
+        try:
+            return self.submit(landmark_list).result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            raise QueueFull("Timed out waiting for the classifier")
+
+    def stats(self):
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'requests': self._requests,
+                'batches': batches,
+                'mean_batch_size': self._requests / batches if batches else 0.0,
+                'batch_sizes': dict(sorted(self._batch_sizes.items())),
+                'mean_queue_wait_ms': self._queue_wait_total / self._requests * 1000 if self._requests else 0.0,
+                'max_queue_wait_ms': self._queue_wait_max * 1000,
+                'queue_depth': self._queue.qsize(),
+            }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='handsign-micro-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._submit_lock:
+                    # Closed and drained: nothing can be queued anymore
+                    if self._closed and self._queue.empty():
+                        return
+                continue
+            batch = [first]
+            deadline = first.enqueued + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Window closed, still take whatever is already queued
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        waits = [started - request.enqueued for request in batch]
+
+        try:
+            for row, request in zip(self._input, batch):
+                row[:] = request.landmarks
+            # Rows past the batch hold stale features, their results are ignored
+            result_ids, confidences = self.classify_batch(self._input)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+        else:
+            for request, result_id, confidence in zip(batch, result_ids, confidences):
+                request.future.set_result((result_id, confidence))
+
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._requests += len(batch)
+            self._queue_wait_total += sum(waits)
+            self._queue_wait_max = max(self._queue_wait_max, max(waits))
@@ -0,0 +1,85 @@
+import hashlib
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from django_backend.cache import DjangoCacheBackend, LocalCacheBackend
+
+
+class PredictionCache:
+    """
+    Two cache levels for repeated frames:
+    - responses, keyed by a hash of the raw upload bytes
+    - classifications, keyed by the quantized normalized landmark vector
+    Both keys include the model version, so a model swap never serves
+    results of the previous model.
+    """
+
+    def __init__(self, response_backend, classification_backend, quantization_step=0.01):
+        self.response_backend = response_backend
+        self.classification_backend = classification_backend
+        self.quantization_step = quantization_step
+
+        self._lock = threading.Lock()
+        self._counts = {
+            'response_hits': 0,
+            'response_misses': 0,
+            'classification_hits': 0,
+            'classification_misses': 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        backend = getattr(settings, 'HANDSIGN_CACHE_BACKEND', 'local')
+        if not backend:
+            return None
+
+        ttl = getattr(settings, 'HANDSIGN_CACHE_TTL', 30)
+        if backend == 'django':
+            alias = getattr(settings, 'HANDSIGN_CACHE_ALIAS', 'default')
+            backends = (DjangoCacheBackend(alias, ttl), DjangoCacheBackend(alias, ttl))
+        else:
+            max_size = getattr(settings, 'HANDSIGN_CACHE_SIZE', 1024)
+            backends = (LocalCacheBackend(max_size, ttl), LocalCacheBackend(max_size, ttl))
+
+        return cls(
+            *backends,
+            quantization_step=getattr(settings, 'HANDSIGN_CACHE_QUANTIZATION', 0.01),
+        )
+
+    def response_key(self, data, version):
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return f'handsign:response:{version}:{digest}'
+
+    def classification_key(self, features, version):
+        quantized = np.rint(np.asarray(features) / self.quantization_step).astype(np.int32)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16).hexdigest()
+        return f'handsign:landmarks:{version}:{digest}'
+
+    def get_response(self, key):
+        return self._lookup(self.response_backend, key, 'response')
+
+    def set_response(self, key, status, data):
+        self.response_backend.set(key, (status, data))
+
+    def get_classification(self, key):
+        return self._lookup(self.classification_backend, key, 'classification')
+
+    def set_classification(self, key, hand_sign_id, confidence):
+        if hand_sign_id is None:
+            return
+        self.classification_backend.set(key, (int(hand_sign_id), float(confidence)))
+
+    def _lookup(self, backend, key, level):
+        value = backend.get(key)
+        with self._lock:
+            self._counts[f'{level}_hits' if value is not None else f'{level}_misses'] += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts['response_evictions'] = self.response_backend.evictions
+        counts['classification_evictions'] = self.classification_backend.evictions
+        return counts
@@ -0,0 +1,57 @@
+import numpy as np
+import cv2 as cv
+
+NUM_LANDMARKS = 21
+FEATURE_SIZE = NUM_LANDMARKS * 2
+
+
+def landmark_array(hand_landmarks, image_width, image_height):
+    """
+    Pixel coordinates of MediaPipe hand landmarks as a (21, 2) integer array,
+    clamped to the image the same way the original per-landmark loop was.
+    """
+    coords = np.fromiter(
+        (value for landmark in hand_landmarks.landmark for value in (landmark.x, landmark.y)),
+        dtype=np.float64,
+        count=FEATURE_SIZE,
+    ).reshape(NUM_LANDMARKS, 2)
+    return pixel_points(coords, image_width, image_height)
+
+
+def pixel_points(coords, image_width, image_height):
+    """
+    Normalized (..., 21, 2) float coordinates to clamped integer pixel
+    coordinates. coords is overwritten.
+    """
+    coords *= (image_width, image_height)
+
+    # int() truncates toward zero
+    points = np.trunc(coords, out=coords).astype(np.int32)
+    np.minimum(points, (image_width - 1, image_height - 1), out=points)
+    return points
+
+
+def bounding_rect(points):
+    x, y, w, h = cv.boundingRect(np.asarray(points, dtype=np.int32))
+    return [x, y, x + w, y + h]
+
+
+def normalize_landmarks(points, out=None):
+    """
+    Feature vector for the keypoint classifier: landmarks relative to the
+    wrist, flattened and divided by the largest absolute value.
+    Takes (21, 2) or (N, 21, 2) points and returns (42,) or (N, 42) float32,
+    written into out when given.
+    """
+    points = np.asarray(points)
+    relative = points - points[..., :1, :]
+    flat = relative.reshape(points.shape[:-2] + (FEATURE_SIZE,))
+
+    max_value = np.abs(flat).max(axis=-1, keepdims=True)
+    # An all-zero hand stays all zero
+    max_value[max_value == 0] = 1
+
+    if out is None:
+        out = np.empty(flat.shape, dtype=np.float32)
+    np.divide(flat, max_value, out=out, casting='same_kind')
+    return out
@@ -0,0 +1,219 @@
+import logging
+import os
+import threading
+import numpy as np
+import cv2 as cv
+
+from django.conf import settings
+
+from .batching import MicroBatcher
+from .features import FEATURE_SIZE, bounding_rect, landmark_array
+from .numpy_engine import NumpyKeyPointClassifier, UnsupportedModel
+from .pool import ResourcePool
+from .registry import model_registry
+from .runtime import create_interpreter, hands_solution
+from .tuning import get_profile, interpreter_options as tuned_interpreter_options
+
+logger = logging.getLogger(__name__)
+
+class KeyPointClassifier:
+    def __init__(self, bundle=None, interpreter_options=None):
+        # Defaults to the current bundle of the default variant and the
+        # interpreter options of the host's tuning profile
+        self.bundle = bundle or model_registry.get()
+        if interpreter_options is None:
+            interpreter_options = tuned_interpreter_options()
+
+        try:
+            self.interpreter = create_interpreter(
+                model_content=self.bundle.model_content, **interpreter_options)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()
+            self.output_details = self.interpreter.get_output_details()
+        except Exception:
+            logger.exception("Error loading model %s", self.bundle.version)
+            raise
+
+    def __call__(self, landmark_list):
+        try:
+            # Ensure the input is a numpy array with correct shape and type
+            input_data = np.array([landmark_list], dtype=np.float32)
+            result_ids, confidences = self.classify_batch(input_data)
+            return result_ids[0], confidences[0]
+        
+        except Exception:
+            logger.exception("Error during prediction")
+            return None, 0.0
+
+    def classify_batch(self, input_data):
+        """
+        Classify an [N, 42] float32 array with a single interpreter invoke.
+        Returns (result_ids, confidences), one entry per row.
+        """
+        input_details_tensor_index = self.input_details[0]['index']
+
+        # Only reallocate when the batch size actually changes
+        if tuple(self.input_details[0]['shape']) != input_data.shape:
+            self.interpreter.resize_tensor_input(input_details_tensor_index, input_data.shape)
+            self.interpreter.allocate_tensors()
+            self.input_details = self.interpreter.get_input_details()
+            self.output_details = self.interpreter.get_output_details()
+
+        # Set the tensor to the input data
+        self.interpreter.set_tensor(input_details_tensor_index, input_data)
+
+        # Run inference
+        self.interpreter.invoke()
+
+        # Get the output tensor
+        output_details_tensor_index = self.output_details[0]['index']
+        result = self.interpreter.get_tensor(output_details_tensor_index)
+
+        # Index and value of the highest probability per row
+        return np.argmax(result, axis=1), np.max(result, axis=1)
+
+def create_classifier(bundle=None, config=None):
+    """
+    A classifier for bundle on the configured engine: HANDSIGN_CLASSIFIER_ENGINE,
+    else the tuning profile's choice. config overrides both (used by tuning).
+    """
+    if config is None:
+        config = dict(get_profile())
+        config['engine'] = getattr(settings, 'HANDSIGN_CLASSIFIER_ENGINE', None) or config['engine']
+
+    if config['engine'] == 'numpy':
+        try:
+            return NumpyKeyPointClassifier(bundle)
+        except UnsupportedModel as e:
+            logger.warning("Falling back to the interpreter: %s", e)
+    return KeyPointClassifier(bundle, interpreter_options=tuned_interpreter_options(config))
+
+# Most hands a multi-hand request may ask for
+MAX_NUM_HANDS = getattr(settings, 'HANDSIGN_MAX_NUM_HANDS', 4)
+
+# MediaPipe Hands setup
+def create_hands(static_image_mode=True, max_num_hands=1, model_complexity=None):
+    if model_complexity is None:
+        model_complexity = get_profile()['model_complexity']
+    mp_hands = hands_solution()
+    return mp_hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=max_num_hands,
+        model_complexity=model_complexity,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5
+    )
+
+class ClassifierSet:
+    # One interpreter per model variant, rebuilt when its bundle is swapped
+    def __init__(self):
+        self._classifiers = {}
+
+    def get(self, bundle):
+        classifier = self._classifiers.get(bundle.variant)
+        if classifier is None or classifier.bundle is not bundle:
+            classifier = self._classifiers[bundle.variant] = create_classifier(bundle)
+        return classifier
+
+class InferenceContext:
+    # A Hands graph and its interpreters, used by one request at a time
+    def __init__(self):
+        self.hands = create_hands()
+        self.classifiers = ClassifierSet()
+        self._multi_hands = None
+        self._features = None
+
+    def features(self, count):
+        # Reused [count, 42] float32 buffer for normalize_landmarks(out=...)
+        if self._features is None or len(self._features) < count:
+            self._features = np.empty((count, FEATURE_SIZE), dtype=np.float32)
+        return self._features[:count]
+
+    @property
+    def multi_hands(self):
+        # Separate graph for multi-hand requests, built on first use
+        if self._multi_hands is None:
+            self._multi_hands = create_hands(max_num_hands=MAX_NUM_HANDS)
+        return self._multi_hands
+
+POOL_SIZE = getattr(settings, 'HANDSIGN_POOL_SIZE', None) or os.cpu_count() or 1
+POOL_TIMEOUT = getattr(settings, 'HANDSIGN_POOL_TIMEOUT', 5.0)
+
+# Neither MediaPipe nor the TFLite interpreter is thread-safe, so every
+# in-flight request leases its own instances from the pool
+inference_pool = ResourcePool(InferenceContext, size=POOL_SIZE, timeout=POOL_TIMEOUT)
+
+# Landmark-only requests just need an interpreter
+classifier_pool = ResourcePool(ClassifierSet, size=POOL_SIZE, timeout=POOL_TIMEOUT)
+
+# Optional micro-batching of single predictions, one batcher (and
+# interpreter) per model variant
+_micro_batchers = {}
+_micro_batcher_lock = threading.Lock()
+
+def get_micro_batcher(bundle=None):
+    if not getattr(settings, 'HANDSIGN_MICRO_BATCHING', False):
+        return None
+    bundle = bundle or model_registry.get()
+    with _micro_batcher_lock:
+        micro_batcher = _micro_batchers.get(bundle.variant)
+        if micro_batcher is None or micro_batcher.bundle is not bundle:
+            if micro_batcher is not None:
+                # Requests already queued finish on the old model
+                micro_batcher.close()
+            micro_batcher = MicroBatcher(
+                create_classifier(bundle).classify_batch,
+                max_batch_size=getattr(settings, 'HANDSIGN_MICRO_BATCH_SIZE', 16),
+                max_wait=getattr(settings, 'HANDSIGN_MICRO_BATCH_WAIT', 0.002),
+                max_queue_size=getattr(settings, 'HANDSIGN_MICRO_BATCH_QUEUE_SIZE', 256),
+                timeout=getattr(settings, 'HANDSIGN_MICRO_BATCH_TIMEOUT', 5.0),
+                bundle=bundle,
+            )
+            _micro_batchers[bundle.variant] = micro_batcher
+    return micro_batcher
+
+def micro_batcher_stats():
+    with _micro_batcher_lock:
+        return {variant: batcher.stats() for variant, batcher in _micro_batchers.items()}
+
+def detect_hands(image, hands, max_hands=None):
+    """
+    Run MediaPipe once on a decoded BGR image.
+    Returns a list of ((21, 2) points, handedness, bounding_box), one per hand
+    found and at most max_hands of them.
+    """
+    image = cv.flip(image, 1)  # Mirror display
+    image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+
+    # Process with MediaPipe
+    image.flags.writeable = False
+    results = hands.process(image)
+    image.flags.writeable = True
+
+    if not results.multi_hand_landmarks:
+        return []
+
+    detections = []
+    for hand_landmarks, handedness in zip(
+            results.multi_hand_landmarks[:max_hands], results.multi_handedness):
+        points = landmark_array(hand_landmarks, image.shape[1], image.shape[0])
+        detections.append((points, handedness.classification[0].label, bounding_rect(points)))
+    return detections
+
+def detect_hand(image, hands):
+    """
+    Run MediaPipe on a decoded BGR image.
+    Returns ((21, 2) points, handedness, bounding_box) or None when no hand is found.
+    """
+    detections = detect_hands(image, hands, max_hands=1)
+    return detections[0] if detections else None
+
+def format_prediction(hand_sign_id, confidence, handedness, brect, bundle):
+    return {
+        'prediction': int(hand_sign_id) if hand_sign_id is not None else -1,
+        'label': bundle.label(hand_sign_id),
+        'handedness': handedness,
+        'bounding_box': brect,
+        'confidence': float(confidence),
+        'model_version': bundle.version,
+    }
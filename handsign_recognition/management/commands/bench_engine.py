@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from handsign_recognition.inference import KeyPointClassifier
+from handsign_recognition.numpy_engine import NumpyKeyPointClassifier
+from handsign_recognition.registry import model_registry
+from handsign_recognition.tuning import synthetic_features
+
+
+class Command(BaseCommand):
+    help = 'Compare the TFLite interpreter and the NumPy engine per row and per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variant', help='Model variant, the default one otherwise')
+        parser.add_argument('--iterations', type=int, default=1000, help='Timed calls per measurement')
+        parser.add_argument('--batch-sizes', default='1,8,32,256,1024', help='Comma separated batch sizes')
+
+    def handle(self, *args, **options):
+        bundle = model_registry.get(options['variant'])
+        engines = {
+            'tflite': KeyPointClassifier(bundle, interpreter_options={}),
+            'numpy': NumpyKeyPointClassifier(bundle),
+        }
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',')]
+        features = synthetic_features(max(batch_sizes))
+        iterations = options['iterations']
+
+        self.stdout.write(f'Model {bundle.version}, {iterations} iterations')
+
+        # Single rows through __call__, the per-request path
+        row_results = {}
+        for name, engine in engines.items():
+            row_results[name] = self.median(lambda i: engine(features[i % len(features)]), iterations)
+            self.stdout.write(f'{name:>7} row        {row_results[name] * 1e6:10.2f} us')
+        self.stdout.write(f'{"":>7} speedup    {row_results["tflite"] / row_results["numpy"]:10.1f}x')
+
+        for size in batch_sizes:
+            batch = features[:size]
+            batch_results = {}
+            for name, engine in engines.items():
+                engine.classify_batch(batch)  # resize the interpreter before timing
+                batch_results[name] = self.median(lambda i: engine.classify_batch(batch), max(iterations // 10, 1))
+                self.stdout.write(
+                    f'{name:>7} batch {size:<5}{batch_results[name] * 1e6:10.2f} us  '
+                    f'{batch_results[name] / size * 1e6:8.3f} us/row'
+                )
+            self.stdout.write(
+                f'{"":>7} speedup    {batch_results["tflite"] / batch_results["numpy"]:10.1f}x')
+
+    def median(self, run, iterations):
+        run(0)
+        latencies = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            run(i)
+            latencies.append(time.perf_counter() - start)
+        return float(np.median(latencies))
@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from handsign_recognition.features import bounding_rect, landmark_array, normalize_landmarks
+from handsign_recognition.testing import (
+    legacy_calc_bounding_rect,
+    legacy_calc_landmark_list,
+    legacy_pre_process_landmark,
+    random_hand_landmarks,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the per-landmark and vectorized landmark feature extraction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        iterations = options['iterations']
+        image = np.zeros((options['height'], options['width'], 3), dtype=np.uint8)
+        samples = [random_hand_landmarks(rng) for _ in range(100)]
+
+        def legacy(hand_landmarks):
+            landmark_list = legacy_calc_landmark_list(image, hand_landmarks)
+            return (legacy_pre_process_landmark(landmark_list),
+                    legacy_calc_bounding_rect(image, hand_landmarks))
+
+        def vectorized(hand_landmarks):
+            points = landmark_array(hand_landmarks, image.shape[1], image.shape[0])
+            return normalize_landmarks(points), bounding_rect(points)
+
+        timings = {}
+        for name, extract in (('legacy', legacy), ('vectorized', vectorized)):
+            start = time.perf_counter()
+            for i in range(iterations):
+                extract(samples[i % len(samples)])
+            timings[name] = (time.perf_counter() - start) / iterations
+            self.stdout.write(f'{name:>10}: {timings[name] * 1e6:.1f} us/hand')
+
+        self.stdout.write(f'   speedup: {timings["legacy"] / timings["vectorized"]:.1f}x')
@@ -0,0 +1,57 @@
+import os
+import time
+
+import cv2 as cv
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+
+from handsign_recognition.uploads import decode_image
+
+
+def ingest_via_storage(upload):
+    # Previous ingest path: save to storage, read back from disk, delete
+    image_path = default_storage.save('temp_hand.jpg', upload)
+    try:
+        return cv.imread(default_storage.path(image_path))
+    finally:
+        default_storage.delete(image_path)
+
+
+def ingest_in_memory(upload):
+    return decode_image(upload)
+
+
+class Command(BaseCommand):
+    help = 'Compare the storage round-trip and in-memory image ingest paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--image',
+            default=os.path.join(settings.MEDIA_ROOT, 'profile1.jpg'),
+            help='Image file to ingest',
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with open(options['image'], 'rb') as f:
+            data = f.read()
+
+        iterations = options['iterations']
+        for name, ingest in (
+            ('storage', ingest_via_storage),
+            ('in-memory', ingest_in_memory),
+        ):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                upload = SimpleUploadedFile('hand.jpg', data, content_type='image/jpeg')
+                image = ingest(upload)
+                if image is None:
+                    raise ValueError("Failed to read image")
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f'{name:>10}: {elapsed / iterations * 1000:.3f} ms/image '
+                f'({iterations} iterations, {len(data)} bytes)'
+            )
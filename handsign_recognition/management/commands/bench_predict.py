@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+
+import cv2 as cv
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from handsign_recognition import inference
+from handsign_recognition.features import bounding_rect, landmark_array, normalize_landmarks
+from handsign_recognition.testing import random_hand_landmarks
+from handsign_recognition.uploads import decode_image_bytes
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class StageResources(threading.local):
+    # MediaPipe and the interpreter aren't thread-safe, one set per bench thread
+    @property
+    def hands(self):
+        if not hasattr(self, '_hands'):
+            self._hands = inference.create_hands()
+        return self._hands
+
+    @property
+    def classifier(self):
+        if not hasattr(self, '_classifier'):
+            self._classifier = inference.KeyPointClassifier()
+        return self._classifier
+
+
+def percentile_summary(latencies, wall_time):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'samples': int(latencies.size),
+        'mean_ms': round(float(latencies.mean()), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'throughput_per_s': round(latencies.size / wall_time, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark each stage of the predict pipeline and the pipeline end to end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', help='Directory of hand images to use as the corpus')
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Use N synthetic landmark sets instead of images (classifier stages only)',
+        )
+        parser.add_argument('--iterations', type=int, default=200, help='Calls per stage and concurrency level')
+        parser.add_argument('--concurrency', default='1', help='Comma separated thread counts, e.g. 1,4,8')
+        parser.add_argument('--stages', help='Comma separated subset of stages to run')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare p50/p95 against')
+
+    def handle(self, *args, **options):
+        resources = StageResources()
+        if options['images']:
+            corpus, stages = self.image_stages(options['images'], resources)
+        elif options['synthetic'] > 0:
+            corpus, stages = self.synthetic_stages(options['synthetic'], resources)
+        else:
+            raise CommandError('Pass --images DIR or --synthetic N')
+
+        if options['stages']:
+            selected = options['stages'].split(',')
+            unknown = set(selected) - set(stages)
+            if unknown:
+                raise CommandError(f'Unknown stages: {", ".join(sorted(unknown))}')
+            stages = {name: stages[name] for name in selected}
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['stages']
+
+        concurrency_levels = [int(level) for level in options['concurrency'].split(',')]
+        report = {'corpus': corpus, 'iterations': options['iterations'], 'stages': {}}
+
+        for name, (inputs, run) in stages.items():
+            report['stages'][name] = {}
+            for concurrency in concurrency_levels:
+                summary = self.run_stage(inputs, run, options['iterations'], concurrency)
+                report['stages'][name][str(concurrency)] = summary
+                self.stdout.write(
+                    f'{name:>14} x{concurrency:<3} '
+                    f'p50 {summary["p50_ms"]:9.3f} ms  p95 {summary["p95_ms"]:9.3f} ms  '
+                    f'p99 {summary["p99_ms"]:9.3f} ms  {summary["throughput_per_s"]:10.1f}/s'
+                    + self.compare(summary, baseline.get(name, {}).get(str(concurrency)))
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def compare(self, summary, previous):
+        if not previous:
+            return ''
+        changes = [
+            f'{key[:3]} {(summary[key] - previous[key]) / previous[key] * 100:+.1f}%'
+            for key in ('p50_ms', 'p95_ms') if previous.get(key)
+        ]
+        return '  (' + ', '.join(changes) + ')' if changes else ''
+
+    def run_stage(self, inputs, run, iterations, concurrency):
+        latencies = [[] for _ in range(concurrency)]
+        ready = threading.Barrier(concurrency + 1)
+
+        def worker(index):
+            # Warm up this thread's resources before the clock starts
+            run(inputs[index % len(inputs)])
+            ready.wait()
+            for i in range(index, iterations, concurrency):
+                item = inputs[i % len(inputs)]
+                start = time.perf_counter()
+                run(item)
+                latencies[index].append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        ready.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+
+        return percentile_summary([value for values in latencies for value in values], wall_time)
+
+    def image_stages(self, directory, resources):
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            raise CommandError(f'No images found in {directory}')
+
+        encoded = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                encoded.append(f.read())
+
+        decoded = [decode_image_bytes(data) for data in encoded]
+        rgb = [cv.cvtColor(cv.flip(image, 1), cv.COLOR_BGR2RGB) for image in decoded]
+
+        # Landmark stages need at least one image with a detectable hand
+        hands = inference.create_hands()
+        detections = []
+        for image in rgb:
+            results = hands.process(image)
+            if results.multi_hand_landmarks:
+                detections.append((results.multi_hand_landmarks[0], image.shape[1], image.shape[0]))
+        hands.close()
+
+        corpus = {'type': 'images', 'images': len(paths), 'with_hand': len(detections)}
+        stages = {
+            'decode': (encoded, decode_image_bytes),
+            'flip_color': (decoded, lambda image: cv.cvtColor(cv.flip(image, 1), cv.COLOR_BGR2RGB)),
+            'hands_process': (rgb, lambda image: resources.hands.process(image)),
+            'end_to_end': (encoded, lambda data: self.end_to_end(data, resources)),
+        }
+        if detections:
+            stages.update(self.landmark_stages(detections, resources))
+        return corpus, stages
+
+    def synthetic_stages(self, count, resources):
+        rng = np.random.default_rng(0)
+        detections = [(random_hand_landmarks(rng), 640, 480) for _ in range(count)]
+        return {'type': 'synthetic', 'landmark_sets': count}, self.landmark_stages(detections, resources)
+
+    def landmark_stages(self, detections, resources):
+        points = [landmark_array(*detection) for detection in detections]
+        features = [normalize_landmarks(item) for item in points]
+        return {
+            'landmarks': (detections, lambda detection: landmark_array(*detection)),
+            'normalize': (points, normalize_landmarks),
+            'classify': (features, lambda item: resources.classifier(item)),
+            'bounding_box': (points, bounding_rect),
+        }
+
+    def end_to_end(self, data, resources):
+        hand = inference.detect_hand(decode_image_bytes(data), resources.hands)
+        if hand is None:
+            return None
+        points, handedness, brect = hand
+        hand_sign_id, confidence = resources.classifier(normalize_landmarks(points))
+        return inference.format_prediction(
+            hand_sign_id, confidence, handedness, brect, resources.classifier.bundle)
@@ -0,0 +1,133 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from handsign_recognition.features import FEATURE_SIZE
+from handsign_recognition.scoring import (
+    ChunkScorer,
+    ConfusionMatrix,
+    _init_worker,
+    _score_chunk,
+    read_chunks,
+    split_chunk,
+)
+
+
+class Command(BaseCommand):
+    help = 'Score a landmark dataset (CSV or .npy) in chunks and report accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .npy file, rows of [label,] 42 values')
+        parser.add_argument('--chunk-size', type=int, default=65536, help='Rows per chunk')
+        parser.add_argument('--workers', type=int, default=0, help='Score chunks in N processes, 0 scores in-process')
+        parser.add_argument('--normalized', action='store_true', help='Values are already normalized features')
+        parser.add_argument('--skip-header', action='store_true', help='Ignore the first CSV line')
+        parser.add_argument('--variant', help='Model variant, the default one otherwise')
+        parser.add_argument('--output', help='Write index,label,prediction,confidence rows to this CSV')
+        parser.add_argument('--report', help='Write the accuracy and confusion report to this JSON file')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            raise CommandError(f'{options["path"]} does not exist')
+
+        scorer = ChunkScorer(options['variant'], options['normalized'])
+        bundle = scorer.bundle
+        confusion = ConfusionMatrix(len(bundle.labels))
+        output = open(options['output'], 'w') if options['output'] else None
+
+        started = time.perf_counter()
+        rows = 0
+        labelled = None
+        try:
+            for labels, (result_ids, confidences) in self.score(scorer, options):
+                if labels is not None:
+                    labelled = True
+                    confusion.update(labels, result_ids)
+                if output:
+                    self.write_predictions(output, rows, labels, result_ids, confidences)
+                rows += len(result_ids)
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if output:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Scored {rows} rows with {bundle.version} in {elapsed:.1f} s '
+            f'({rows / elapsed if elapsed else 0:,.0f} rows/s)')
+
+        if not labelled:
+            return
+
+        report = confusion.report(bundle.labels)
+        report.update(model_version=bundle.version, seconds=round(elapsed, 3))
+        self.print_report(report, bundle.labels)
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["report"]}'))
+
+    def score(self, scorer, options):
+        """Yield (labels, (result_ids, confidences)) per chunk, in file order."""
+        chunks = read_chunks(options['path'], options['chunk_size'], options['skip_header'])
+        labelled = None
+
+        def split(chunk):
+            nonlocal labelled
+            if labelled is None:
+                # A label column is an extra leading column
+                labelled = chunk.shape[1] == FEATURE_SIZE + 1
+            return split_chunk(chunk, labelled)
+
+        if options['workers'] <= 0:
+            for chunk in chunks:
+                values, labels = split(chunk)
+                yield labels, scorer(values)
+            return
+
+        executor = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(
+                os.environ.get('DJANGO_SETTINGS_MODULE', 'django_backend.settings'),
+                options['variant'],
+                options['normalized'],
+            ),
+        )
+        # Bounded look-ahead keeps memory flat while every worker stays busy
+        pending = deque()
+        with executor:
+            for chunk in chunks:
+                values, labels = split(chunk)
+                pending.append((labels, executor.submit(_score_chunk, values)))
+                if len(pending) >= options['workers'] * 2:
+                    labels, future = pending.popleft()
+                    yield labels, future.result()
+            while pending:
+                labels, future = pending.popleft()
+                yield labels, future.result()
+
+    def write_predictions(self, output, offset, labels, result_ids, confidences):
+        index = np.arange(offset, offset + len(result_ids))
+        columns = [index, labels if labels is not None else np.full(len(index), -1), result_ids]
+        block = np.column_stack(columns + [confidences])
+        np.savetxt(output, block, delimiter=',', fmt=['%d', '%d', '%d', '%.6f'])
+
+    def print_report(self, report, class_names):
+        self.stdout.write(f'Accuracy: {report["accuracy"]:.4f}')
+        width = max(len(name) for name in class_names) + 2
+        self.stdout.write(' ' * width + ''.join(f'{i:>8}' for i in range(len(class_names))))
+        for name, row in zip(class_names, report['confusion_matrix']):
+            self.stdout.write(f'{name:<{width}}' + ''.join(f'{count:>8}' for count in row))
+        for name, stats in report['classes'].items():
+            self.stdout.write(
+                f'{name:<{width}} precision {stats["precision"]:.4f}  '
+                f'recall {stats["recall"]:.4f}  support {stats["support"]}')
@@ -0,0 +1,74 @@
+import json
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from handsign_recognition import tuning
+from handsign_recognition.management.commands.bench_predict import IMAGE_EXTENSIONS
+from handsign_recognition.uploads import decode_image_bytes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark interpreter and MediaPipe settings on this host and save the fastest accurate profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reference',
+            help='CSV of labelled, normalized landmarks (label followed by 42 values per row); '
+                 'candidates are then checked against the labels instead of the float32 model',
+        )
+        parser.add_argument('--synthetic', type=int, default=500, help='Synthetic hands when no --reference is given')
+        parser.add_argument('--images', help='Directory of hand images, enables model_complexity tuning')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed calls per candidate')
+        parser.add_argument('--min-agreement', type=float, default=tuning.MIN_AGREEMENT)
+        parser.add_argument('--output', help=f'Profile path, defaults to {tuning.PROFILE_PATH}')
+        parser.add_argument('--dry-run', action='store_true', help='Print the results without saving')
+
+    def handle(self, *args, **options):
+        labels = None
+        if options['reference']:
+            data = np.loadtxt(options['reference'], delimiter=',', dtype=np.float32, ndmin=2)
+            if data.shape[1] != 43:
+                raise CommandError('Expected a label and 42 values per row')
+            features, labels = data[:, 1:], data[:, 0].astype(np.int64)
+        else:
+            features = tuning.synthetic_features(options['synthetic'])
+
+        images = []
+        if options['images']:
+            for name in sorted(os.listdir(options['images'])):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    with open(os.path.join(options['images'], name), 'rb') as f:
+                        images.append(decode_image_bytes(f.read()))
+            if not images:
+                raise CommandError(f'No images found in {options["images"]}')
+
+        profile = tuning.tune(
+            features, labels, images,
+            iterations=options['iterations'], min_agreement=options['min_agreement'])
+
+        for result in profile['candidates']['classifier']:
+            if result['engine'] == 'tflite':
+                detail = f'threads {result["num_threads"]:<3} xnnpack {"on " if result["xnnpack"] else "off"}'
+            else:
+                detail = ''
+            self.stdout.write(
+                f'{result["variant"]:>10} {result["engine"]:<6} {detail:<23} '
+                f'{result["latency_ms"]:8.4f} ms  agreement {result["agreement"]:.4f}'
+            )
+        for result in profile['candidates']['hands']:
+            self.stdout.write(
+                f'{"hands":>10} model_complexity {result["model_complexity"]}  '
+                f'{result["latency_ms"]:8.4f} ms  agreement {result["agreement"]:.4f}'
+            )
+        self.stdout.write(f'Selected: {json.dumps(profile["config"], sort_keys=True)}')
+
+        if options['dry_run']:
+            return
+
+        path = options['output'] or tuning.PROFILE_PATH
+        if not path:
+            raise CommandError('Set HANDSIGN_TUNING_PROFILE or pass --output')
+        tuning.save_profile(profile, path)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
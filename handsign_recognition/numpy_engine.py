@@ -0,0 +1,200 @@
+"""
+Pure NumPy evaluation of the keypoint classifier.
+
+The classifier is a small MLP, so instead of going through the TFLite
+interpreter (and importing TensorFlow) the dense weights and biases are read
+straight out of the .tflite flatbuffer once and the network runs as plain
+matmuls. Supports FULLY_CONNECTED (with fused RELU/RELU6) and SOFTMAX graphs
+with float32 or int8 weights; anything else raises UnsupportedModel.
+"""
+import logging
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# tflite schema enums
+FULLY_CONNECTED = 9
+SOFTMAX = 25
+TENSOR_TYPES = {0: np.float32, 2: np.int32, 3: np.uint8, 9: np.int8}
+ACTIVATIONS = {
+    0: None,
+    1: lambda x: np.maximum(x, 0, out=x),
+    3: lambda x: np.clip(x, 0, 6, out=x),
+}
+
+
+class UnsupportedModel(Exception):
+    pass
+
+
+class _Table:
+    # Read-only view of a flatbuffer table
+    __slots__ = ('buf', 'pos')
+
+    def __init__(self, buf, pos):
+        self.buf = buf
+        self.pos = pos
+
+    def _offset(self, field):
+        vtable = self.pos - struct.unpack_from('<i', self.buf, self.pos)[0]
+        vtable_size = struct.unpack_from('<H', self.buf, vtable)[0]
+        entry = 4 + 2 * field
+        return struct.unpack_from('<H', self.buf, vtable + entry)[0] if entry < vtable_size else 0
+
+    def _indirect(self, position):
+        return position + struct.unpack_from('<I', self.buf, position)[0]
+
+    def scalar(self, field, fmt, default=0):
+        offset = self._offset(field)
+        return struct.unpack_from(fmt, self.buf, self.pos + offset)[0] if offset else default
+
+    def table(self, field):
+        offset = self._offset(field)
+        return _Table(self.buf, self._indirect(self.pos + offset)) if offset else None
+
+    def _vector(self, field):
+        offset = self._offset(field)
+        if not offset:
+            return None, 0
+        start = self._indirect(self.pos + offset)
+        return start + 4, struct.unpack_from('<I', self.buf, start)[0]
+
+    def array(self, field, dtype):
+        start, length = self._vector(field)
+        if start is None:
+            return np.empty(0, dtype=dtype)
+        return np.frombuffer(self.buf, dtype=dtype, count=length, offset=start)
+
+    def tables(self, field):
+        start, length = self._vector(field)
+        if start is None:
+            return []
+        return [_Table(self.buf, self._indirect(start + 4 * i)) for i in range(length)]
+
+
+def _tensor_data(buffers, tensor):
+    dtype = TENSOR_TYPES.get(tensor.scalar(1, '<b'))
+    buffer = buffers[tensor.scalar(2, '<I')]
+    raw = buffer.array(0, np.uint8)
+    if dtype is None or not raw.size:
+        return None
+
+    data = raw.view(dtype).reshape(tuple(tensor.array(0, '<i4')))
+    if dtype is np.float32:
+        return data.astype(np.float32)
+
+    # Quantized weights: dequantize once, per tensor or per output channel
+    quantization = tensor.table(4)
+    scale = quantization.array(2, '<f4') if quantization else np.empty(0)
+    if not scale.size:
+        raise UnsupportedModel("Quantized tensor without a scale")
+    zero_point = quantization.array(3, '<i8').astype(np.float32)
+    if scale.size > 1:
+        shape = [1] * data.ndim
+        shape[quantization.scalar(6, '<i')] = -1
+        scale = scale.reshape(shape)
+        zero_point = zero_point.reshape(shape) if zero_point.size else 0
+    else:
+        zero_point = zero_point[0] if zero_point.size else 0
+    return ((data.astype(np.float32) - zero_point) * scale).astype(np.float32)
+
+
+def load_layers(model_content):
+    """
+    Parse a .tflite model into [(weights [in, out], bias [out], activation), ...]
+    and whether the graph ends in a softmax.
+    """
+    buf = bytes(model_content)
+    model = _Table(buf, struct.unpack_from('<I', buf, 0)[0])
+
+    opcodes = []
+    for opcode in model.tables(1):
+        # builtin_code replaced the deprecated int8 field in newer schemas
+        opcodes.append(max(opcode.scalar(0, '<b'), opcode.scalar(3, '<i')))
+
+    subgraphs = model.tables(2)
+    if len(subgraphs) != 1:
+        raise UnsupportedModel("Expected a single subgraph")
+    subgraph = subgraphs[0]
+    tensors = subgraph.tables(0)
+    buffers = model.tables(4)
+
+    current = int(subgraph.array(1, '<i4')[0])
+    layers = []
+    softmax = False
+    for operator in subgraph.tables(3):
+        code = opcodes[operator.scalar(0, '<I')]
+        inputs = operator.array(1, '<i4')
+        outputs = operator.array(2, '<i4')
+        if inputs[0] != current or softmax:
+            raise UnsupportedModel("Only a single chain of layers is supported")
+
+        if code == FULLY_CONNECTED:
+            weights = _tensor_data(buffers, tensors[inputs[1]])
+            bias = _tensor_data(buffers, tensors[inputs[2]]) if len(inputs) > 2 and inputs[2] >= 0 else None
+            if weights is None:
+                raise UnsupportedModel("Fully connected layer without constant weights")
+            if bias is None:
+                bias = np.zeros(weights.shape[0], dtype=np.float32)
+
+            options = operator.table(4)
+            activation = options.scalar(0, '<b') if options else 0
+            if activation not in ACTIVATIONS:
+                raise UnsupportedModel(f"Unsupported fused activation {activation}")
+            layers.append((np.ascontiguousarray(weights.T), bias, ACTIVATIONS[activation]))
+        elif code == SOFTMAX:
+            options = operator.table(4)
+            if options and options.scalar(0, '<f', 1.0) != 1.0:
+                raise UnsupportedModel("Softmax with beta != 1")
+            softmax = True
+        else:
+            raise UnsupportedModel(f"Unsupported operator {code}")
+        current = int(outputs[0])
+
+    if not layers:
+        raise UnsupportedModel("No fully connected layers found")
+    return layers, softmax
+
+
+class NumpyKeyPointClassifier:
+    """Drop-in for inference.KeyPointClassifier that evaluates the MLP with NumPy."""
+
+    def __init__(self, bundle=None):
+        if bundle is None:
+            from .registry import model_registry
+            bundle = model_registry.get()
+        self.bundle = bundle
+        self.layers, self.softmax = load_layers(bundle.model_content)
+
+    def __call__(self, landmark_list):
+        try:
+            input_data = np.asarray(landmark_list, dtype=np.float32).reshape(1, -1)
+            result_ids, confidences = self.classify_batch(input_data)
+            return result_ids[0], confidences[0]
+        except Exception:
+            logger.exception("Error during prediction")
+            return None, 0.0
+
+    def logits(self, input_data):
+        x = np.asarray(input_data, dtype=np.float32)
+        for weights, bias, activation in self.layers:
+            x = np.dot(x, weights)
+            x += bias
+            if activation is not None:
+                activation(x)
+        return x
+
+    def classify_batch(self, input_data):
+        """Same contract as KeyPointClassifier.classify_batch, any batch size."""
+        logits = self.logits(input_data)
+        result_ids = logits.argmax(axis=1)
+        best = logits[np.arange(len(logits)), result_ids]
+        if not self.softmax:
+            return result_ids, best
+
+        # Only the top probability is needed: 1 / sum(exp(logits - max))
+        logits -= best[:, None]
+        np.exp(logits, out=logits)
+        return result_ids, 1.0 / logits.sum(axis=1)
@@ -0,0 +1,135 @@
+"""
+Process-pool offload for the async predict view.
+
+The CPU-bound OpenCV/MediaPipe/TFLite work runs in worker processes that
+each hold their own Hands graph and KeyPointClassifier, so it neither blocks
+the event loop nor holds the GIL of the serving process. The number of
+frames in flight is capped; past the cap callers get Overloaded right away
+instead of queueing without limit.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    pass
+
+
+# Per worker process inference instances, built by _init_worker
+_worker_context = None
+
+
+def _init_worker(settings_module):
+    global _worker_context
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+    from . import inference
+    _worker_context = inference.InferenceContext()
+
+
+def _predict_frame(data, variant):
+    """Runs in a worker process. Returns (status, response data)."""
+    from . import inference
+    from .features import normalize_landmarks
+    from .registry import model_registry
+    from .uploads import decode_image_bytes
+
+    # Workers pick up model swaps from their own registry
+    bundle = model_registry.get(variant)
+
+    image = decode_image_bytes(data)
+    hand = inference.detect_hand(image, _worker_context.hands)
+    if hand is None:
+        return 400, {'error': 'No hand detected'}
+
+    points, handedness, brect = hand
+    classifier = _worker_context.classifiers.get(bundle)
+    hand_sign_id, confidence = classifier(normalize_landmarks(points))
+    return 200, inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle)
+
+
+class OffloadPool:
+    def __init__(self, workers, max_in_flight):
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def _get_executor(self):
+        # Called with the lock held
+        if self._executor is None:
+            # Spawned rather than forked, forking a process that already runs
+            # TensorFlow or MediaPipe threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'django_backend.settings'),),
+            )
+        return self._executor
+
+    async def predict(self, data, variant=None):
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._rejected += 1
+                raise Overloaded("Prediction queue is full")
+            self._in_flight += 1
+            executor = self._get_executor()
+
+        future = None
+        try:
+            future = executor.submit(_predict_frame, data, variant)
+            # Released once the worker is done with the frame: cancelling the
+            # request (a client disconnect) does not stop a running worker
+            future.add_done_callback(self._release)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died, start a fresh pool for the next request
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise Overloaded("Prediction workers restarting")
+        finally:
+            if future is None:
+                self._release()
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'rejected': self._rejected,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_offload_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'HANDSIGN_OFFLOAD_WORKERS', None) or os.cpu_count() or 1
+            _pool = OffloadPool(
+                workers,
+                getattr(settings, 'HANDSIGN_OFFLOAD_MAX_IN_FLIGHT', None) or workers * 4,
+            )
+    return _pool
@@ -0,0 +1,92 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ResourcePool:
+    """
+    Bounded pool of non thread-safe objects. Each checkout hands the caller
+    an instance nobody else is using; instances are created on demand up to
+    size and reused after checkin.
+    """
+
+    def __init__(self, factory, size, timeout=None):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def checkout(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = None if timeout is None else timeout - (time.perf_counter() - started)
+                if remaining is not None and remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout("No inference instance available")
+                self._cond.wait(remaining)
+
+            resource = self._idle.pop() if self._idle else None
+            if resource is None:
+                self._created += 1
+            self._in_use += 1
+
+            waited = time.perf_counter() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        if resource is None:
+            # Build outside the lock, model loading can take a while
+            try:
+                resource = self.factory()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        return resource
+
+    def checkin(self, resource):
+        with self._cond:
+            self._idle.append(resource)
+            self._in_use -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        resource = self.checkout(timeout)
+        try:
+            yield resource
+        finally:
+            self.checkin(resource)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'utilisation': self._in_use / self.size if self.size else 0.0,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'mean_wait_ms': self._wait_total / self._checkouts * 1000 if self._checkouts else 0.0,
+                'max_wait_ms': self._wait_max * 1000,
+            }
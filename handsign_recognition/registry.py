@@ -0,0 +1,188 @@
+"""
+Versioned model bundles.
+
+A bundle is a TFLite model plus its labels, read from the models directory:
+
+    keypoint_classifier.tflite          variant 'float32'
+    keypoint_classifier.int8.tflite     variant 'int8' (any <name>.<variant>.tflite)
+    keypoint_classifier_label.csv       labels, shared by every variant
+
+Each bundle is versioned by a checksum of its model and label bytes. The
+registry re-stats the files every HANDSIGN_MODEL_RELOAD_INTERVAL seconds
+and swaps changed bundles in as a whole; requests keep the bundle they
+started with, so in-flight work is never mixed across versions. Replace
+model files atomically (write elsewhere, then rename) when deploying.
+"""
+import csv
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .tuning import get_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LABELS = ['Zero', 'One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine']
+
+
+class UnknownVariant(Exception):
+    pass
+
+
+class ModelBundle:
+    def __init__(self, name, variant, model_path, label_path):
+        self.name = name
+        self.variant = variant
+        self.model_path = model_path
+        self.label_path = label_path
+        self.signature = file_signature(model_path, label_path)
+
+        with open(model_path, 'rb') as f:
+            self.model_content = f.read()
+        try:
+            with open(label_path, 'rb') as f:
+                label_content = f.read()
+        except FileNotFoundError:
+            label_content = b''
+
+        if label_content:
+            reader = csv.reader(io.StringIO(label_content.decode('utf-8-sig')))
+            self.labels = [row[0] for row in reader if row]
+        else:
+            self.labels = list(DEFAULT_LABELS)
+
+        digest = hashlib.sha256(self.model_content)
+        digest.update(label_content)
+        self.checksum = digest.hexdigest()
+        self.version = f'{name}.{variant}.{self.checksum[:12]}'
+
+    def label(self, hand_sign_id):
+        if hand_sign_id is not None and 0 <= hand_sign_id < len(self.labels):
+            return self.labels[hand_sign_id]
+        return 'Unknown'
+
+    def describe(self):
+        # Served publicly by /api/predict/stats/, so no filesystem paths
+        return {
+            'version': self.version,
+            'checksum': self.checksum,
+            'labels': len(self.labels),
+        }
+
+
+def file_signature(*paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class ModelRegistry:
+    def __init__(self, directory, name, default_variant='float32', reload_interval=2.0):
+        self.directory = directory
+        self.name = name
+        self.default_variant = default_variant
+        self.reload_interval = reload_interval
+
+        self._bundles = None  # variant -> ModelBundle, replaced as a whole
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(settings, 'HANDSIGN_MODEL_DIR', None)
+            or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'),
+            getattr(settings, 'HANDSIGN_MODEL_NAME', 'keypoint_classifier'),
+            default_variant=getattr(settings, 'HANDSIGN_MODEL_VARIANT', 'float32'),
+            reload_interval=getattr(settings, 'HANDSIGN_MODEL_RELOAD_INTERVAL', 2.0),
+        )
+
+    def get(self, variant=None):
+        """The current bundle for variant, the default variant when None."""
+        bundles = self._current()
+        if variant is None:
+            # The host's tuning profile may prefer a faster variant
+            preferred = get_profile()['variant']
+            variant = preferred if preferred in bundles else self.default_variant
+        try:
+            return bundles[variant]
+        except KeyError:
+            raise UnknownVariant(f"Unknown model variant '{variant}'")
+
+    def variants(self):
+        return sorted(self._current())
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'default_variant': self.default_variant,
+            'reloads': self.reloads,
+            'variants': {variant: bundle.describe() for variant, bundle in sorted(self._current().items())},
+        }
+
+    def reload(self):
+        """Rescan the directory now. Unchanged bundles are kept as they are."""
+        with self._lock:
+            self._reload()
+        return self._bundles
+
+    def _current(self):
+        bundles = self._bundles
+        if bundles is None:
+            return self.reload()
+
+        if self.reload_interval and time.monotonic() - self._checked >= self.reload_interval:
+            # One thread re-stats the files, the others carry on with the current set
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._reload()
+                except OSError as e:
+                    # Mid-deploy, keep serving the bundles already loaded
+                    logger.warning("Model reload failed: %s", e)
+                finally:
+                    self._lock.release()
+        return self._bundles
+
+    def _reload(self):
+        # Called with the lock held
+        self._checked = time.monotonic()
+        previous = self._bundles or {}
+        label_path = os.path.join(self.directory, f'{self.name}_label.csv')
+
+        bundles = {}
+        for variant, model_path in self._scan():
+            bundle = previous.get(variant)
+            if bundle is None or bundle.model_path != model_path \
+                    or bundle.signature != file_signature(model_path, label_path):
+                bundle = ModelBundle(self.name, variant, model_path, label_path)
+            bundles[variant] = bundle
+
+        if not bundles:
+            raise FileNotFoundError(f"No {self.name} models found in {self.directory}")
+
+        if self._bundles is not None and any(
+                previous.get(variant) is not bundle for variant, bundle in bundles.items()):
+            self.reloads += 1
+        self._bundles = bundles
+
+    def _scan(self):
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.startswith(self.name + '.') or not filename.endswith('.tflite'):
+                continue
+            # The unsuffixed model is the float32 one
+            variant = filename[len(self.name) + 1:-len('.tflite')] or 'float32'
+            yield variant, os.path.join(self.directory, filename)
+
+
+model_registry = ModelRegistry.from_settings()
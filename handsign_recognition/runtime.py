@@ -0,0 +1,83 @@
+"""
+Lazy access to the inference stack.
+
+TensorFlow, MediaPipe and OpenCV are only imported the first time a request
+needs them (or by warm_up), so migrate, management commands, the admin and
+worker boot don't pay for them.
+"""
+import sys
+import threading
+
+_lock = threading.Lock()
+_interpreter_class = None
+
+
+def interpreter_class():
+    """
+    The TFLite Interpreter class, preferring a slim runtime over full
+    TensorFlow when one is installed.
+    """
+    global _interpreter_class
+    if _interpreter_class is None:
+        with _lock:
+            if _interpreter_class is None:
+                _interpreter_class = _import_interpreter_class()
+    return _interpreter_class
+
+
+def _import_interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+def create_interpreter(model_path=None, **kwargs):
+    return interpreter_class()(model_path=model_path, **kwargs)
+
+
+def op_resolver_type():
+    """OpResolverType of the Interpreter in use, e.g. to run without XNNPACK."""
+    return sys.modules[interpreter_class().__module__].OpResolverType
+
+
+def hands_solution():
+    import mediapipe as mp
+    return mp.solutions.hands
+
+
+def boot():
+    """Start-up work shared by the WSGI and ASGI applications."""
+    from django.conf import settings
+
+    # Benchmark this host once and save the tuning profile the workers load
+    if getattr(settings, 'HANDSIGN_AUTO_TUNE', False):
+        from .tuning import ensure_profile
+        ensure_profile()
+
+    # Load the inference stack before the first request instead of on it
+    if getattr(settings, 'HANDSIGN_WARM_UP', False):
+        warm_up()
+
+
+def warm_up():
+    """Import the stack and build one set of inference instances up front."""
+    from . import inference
+    from .registry import model_registry
+
+    bundle = model_registry.get()
+    with inference.inference_pool.lease() as context:
+        context.classifiers.get(bundle)
+    with inference.classifier_pool.lease() as classifiers:
+        classifiers.get(bundle)
+    inference.get_micro_batcher(bundle)
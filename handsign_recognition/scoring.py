@@ -0,0 +1,122 @@
+"""
+Bulk scoring of archived landmark datasets.
+
+Rows are [label,] followed by 42 values: raw landmark pixel coordinates
+(x0, y0, ... x20, y20), or already normalized features. Files are read in
+fixed-size chunks (CSV streamed, .npy memory-mapped), so memory stays flat
+whatever the file size; every chunk is normalized and classified in one
+vectorized call.
+"""
+import itertools
+import os
+
+import numpy as np
+
+from .features import FEATURE_SIZE, NUM_LANDMARKS, normalize_landmarks
+
+
+def read_chunks(path, chunk_size, skip_header=False):
+    """Yield float32 [n, columns] blocks of at most chunk_size rows."""
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        data = data.reshape(len(data), -1)
+        for start in range(0, len(data), chunk_size):
+            yield np.asarray(data[start:start + chunk_size], dtype=np.float32)
+        return
+
+    with open(path) as f:
+        if skip_header:
+            next(f, None)
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter=',', dtype=np.float32, ndmin=2)
+
+
+def split_chunk(chunk, labelled):
+    """(features [n, 42], labels or None) from a block of rows."""
+    if chunk.shape[1] != FEATURE_SIZE + labelled:
+        raise ValueError(f"Expected {FEATURE_SIZE + labelled} columns, got {chunk.shape[1]}")
+    if labelled:
+        return chunk[:, 1:], chunk[:, 0].astype(np.int64)
+    return chunk, None
+
+
+class ChunkScorer:
+    """Normalizes and classifies chunks with one classifier; one per process."""
+
+    def __init__(self, variant=None, normalized=False):
+        from .inference import create_classifier
+        from .registry import model_registry
+
+        self.bundle = model_registry.get(variant)
+        self.classifier = create_classifier(self.bundle)
+        self.normalized = normalized
+        self._out = None
+
+    def __call__(self, values):
+        if self.normalized:
+            features = np.ascontiguousarray(values, dtype=np.float32)
+        else:
+            if self._out is None or len(self._out) != len(values):
+                self._out = np.empty((len(values), FEATURE_SIZE), dtype=np.float32)
+            points = values.reshape(len(values), NUM_LANDMARKS, 2)
+            features = normalize_landmarks(points, out=self._out)
+        return self.classifier.classify_batch(features)
+
+
+# Per worker process scorer, built by _init_worker
+_scorer = None
+
+
+def _init_worker(settings_module, variant, normalized):
+    global _scorer
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+    _scorer = ChunkScorer(variant, normalized)
+
+
+def _score_chunk(values):
+    result_ids, confidences = _scorer(values)
+    return result_ids.copy(), confidences.copy()
+
+
+class ConfusionMatrix:
+    def __init__(self, num_classes):
+        self.num_classes = num_classes
+        self.counts = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    def update(self, labels, predictions):
+        if labels.min() < 0 or labels.max() >= self.num_classes:
+            raise ValueError(f"Labels must be between 0 and {self.num_classes - 1}")
+        if predictions.max() >= self.num_classes:
+            raise ValueError("The model predicts more classes than it has labels")
+        index = labels * self.num_classes + predictions
+        self.counts += np.bincount(index, minlength=self.num_classes ** 2).reshape(self.counts.shape)
+
+    def report(self, class_names):
+        total = int(self.counts.sum())
+        correct = np.diag(self.counts)
+        support = self.counts.sum(axis=1)
+        predicted = self.counts.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recall = np.where(support > 0, correct / support, 0.0)
+            precision = np.where(predicted > 0, correct / predicted, 0.0)
+
+        return {
+            'rows': total,
+            'accuracy': float(correct.sum() / total) if total else 0.0,
+            'classes': {
+                name: {
+                    'support': int(support[i]),
+                    'precision': round(float(precision[i]), 4),
+                    'recall': round(float(recall[i]), 4),
+                }
+                for i, name in enumerate(class_names)
+            },
+            'confusion_matrix': self.counts.tolist(),
+        }
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .registry import UnknownVariant, model_registry
+from .uploads import decode_image_bytes
+
+STREAM_PATH = '/ws/predict/'
+
+# Concurrent WebSocket sessions per process
+MAX_SESSIONS = getattr(settings, 'HANDSIGN_STREAM_MAX_SESSIONS', 16)
+
+# Frames waiting per session; older frames are dropped when a client outpaces us
+FRAME_QUEUE_SIZE = getattr(settings, 'HANDSIGN_STREAM_QUEUE_SIZE', 2)
+
+active_sessions = 0
+
+
+class StreamSession:
+    """
+    One WebSocket connection. Owns a Hands graph in tracking mode, so palm
+    detection only reruns when the hand is lost, and its own classifier.
+    Frames are processed one at a time, in order, off the event loop.
+    """
+
+    def __init__(self, send, variant=None):
+        self.send = send
+        self.variant = variant
+        self.frames = asyncio.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self.received = 0
+        self.dropped = 0
+        self.hands = None
+        self.classifiers = None
+        # A cancelled frame can still be running in the executor
+        self.lock = threading.Lock()
+
+    def load(self):
+        from . import inference
+
+        self.hands = inference.create_hands(static_image_mode=False)
+        self.classifiers = inference.ClassifierSet()
+        self.classifiers.get(model_registry.get(self.variant))
+
+    def close(self):
+        with self.lock:
+            if self.hands is not None:
+                self.hands.close()
+                self.hands = None
+
+    def enqueue(self, data):
+        self.received += 1
+        if self.frames.full():
+            # Keep the newest frames, a stale prediction is of no use
+            self.frames.get_nowait()
+            self.dropped += 1
+        self.frames.put_nowait((self.received, data))
+
+    def process(self, data):
+        from . import inference
+        from .features import normalize_landmarks
+
+        image = decode_image_bytes(data)
+        # Looked up per frame, so long sessions move to a swapped model too
+        bundle = model_registry.get(self.variant)
+        with self.lock:
+            if self.hands is None:
+                return {'error': 'Session closed'}
+            hand = inference.detect_hand(image, self.hands)
+            if hand is None:
+                return {'error': 'No hand detected'}
+
+            points, handedness, brect = hand
+            hand_sign_id, confidence = self.classifiers.get(bundle)(normalize_landmarks(points))
+        return inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frame, data = await self.frames.get()
+            try:
+                result = await loop.run_in_executor(None, self.process, data)
+            except Exception as e:
+                result = {'error': str(e)}
+
+            result['frame'] = frame
+            result['dropped_frames'] = self.dropped
+            await self.send({'type': 'websocket.send', 'text': json.dumps(result)})
+
+
+async def websocket_application(scope, receive, send):
+    global active_sessions
+
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    if scope['path'] != STREAM_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    # ?variant=int8 picks a model variant for the whole session
+    variant = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('variant', [None])[0]
+    try:
+        model_registry.get(variant)
+    except UnknownVariant:
+        await send({'type': 'websocket.close', 'code': 4400})
+        return
+
+    if active_sessions >= MAX_SESSIONS:
+        # 1013: try again later
+        await send({'type': 'websocket.close', 'code': 1013})
+        return
+
+    active_sessions += 1
+    session = StreamSession(send, variant)
+    worker = None
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, session.load)
+        await send({'type': 'websocket.accept'})
+        worker = asyncio.create_task(session.run())
+
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message.get('bytes'):
+                session.enqueue(message['bytes'])
+    finally:
+        active_sessions -= 1
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        await asyncio.get_running_loop().run_in_executor(None, session.close)
@@ -0,0 +1,81 @@
+"""
+Reference implementations and sample data for the golden tests, the
+benchmark commands and the tuner's synthetic reference set. Nothing on the
+request path imports this module, and it only needs MediaPipe for
+random_hand_landmarks.
+"""
+import copy
+import itertools
+
+import cv2 as cv
+import numpy as np
+
+from .features import pixel_points
+
+
+# Per-landmark implementations the vectorized features replaced
+
+def legacy_calc_bounding_rect(image, landmarks):
+    image_width, image_height = image.shape[1], image.shape[0]
+    landmark_array = np.empty((0, 2), int)
+
+    for _, landmark in enumerate(landmarks.landmark):
+        landmark_x = min(int(landmark.x * image_width), image_width - 1)
+        landmark_y = min(int(landmark.y * image_height), image_height - 1)
+        landmark_point = [np.array((landmark_x, landmark_y))]
+        landmark_array = np.append(landmark_array, landmark_point, axis=0)
+
+    x, y, w, h = cv.boundingRect(landmark_array)
+    return [x, y, x + w, y + h]
+
+def legacy_calc_landmark_list(image, landmarks):
+    image_width, image_height = image.shape[1], image.shape[0]
+    landmark_point = []
+
+    for _, landmark in enumerate(landmarks.landmark):
+        landmark_x = min(int(landmark.x * image_width), image_width - 1)
+        landmark_y = min(int(landmark.y * image_height), image_height - 1)
+        landmark_point.append([landmark_x, landmark_y])
+
+    return landmark_point
+
+def legacy_pre_process_landmark(landmark_list):
+    temp_landmark_list = copy.deepcopy(landmark_list)
+
+    # Convert to relative coordinates
+    base_x, base_y = temp_landmark_list[0][0], temp_landmark_list[0][1]
+    for index, point in enumerate(temp_landmark_list):
+        temp_landmark_list[index][0] = temp_landmark_list[index][0] - base_x
+        temp_landmark_list[index][1] = temp_landmark_list[index][1] - base_y
+
+    # Convert to a one-dimensional list
+    temp_landmark_list = list(itertools.chain.from_iterable(temp_landmark_list))
+
+    # Normalization
+    max_value = max(list(map(abs, temp_landmark_list)))
+    def normalize_(n):
+        return n / max_value if max_value != 0 else 0
+
+    temp_landmark_list = list(map(normalize_, temp_landmark_list))
+    return temp_landmark_list
+
+
+def random_hand_coords(rng, count=None):
+    """Normalized landmark coordinates spread over (and slightly past) the image."""
+    shape = (21, 2) if count is None else (count, 21, 2)
+    return rng.uniform(-0.05, 1.05, size=shape)
+
+
+def random_hand_landmarks(rng):
+    """random_hand_coords as MediaPipe hand landmarks."""
+    from mediapipe.framework.formats import landmark_pb2
+
+    hand_landmarks = landmark_pb2.NormalizedLandmarkList()
+    for x, y in random_hand_coords(rng):
+        hand_landmarks.landmark.add(x=x, y=y, z=0.0)
+    return hand_landmarks
+
+
+def random_hand_points(rng, count, image_width=640, image_height=480):
+    """(count, 21, 2) pixel coordinates, without going through MediaPipe."""
+    return pixel_points(random_hand_coords(rng, count), image_width, image_height)
@@ -1,3 +1,1192 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from mediapipe.framework.formats import landmark_pb2
+
+from django_backend.cache import LocalCacheBackend
+
+from .batching import MicroBatcher, QueueFull
+from .cache import PredictionCache
+from .features import bounding_rect, landmark_array, normalize_landmarks
+from . import inference
+from .inference import InferenceContext, KeyPointClassifier
+from .testing import (
+    legacy_calc_bounding_rect,
+    legacy_calc_landmark_list,
+    legacy_pre_process_landmark,
+    random_hand_landmarks,
+    random_hand_points,
+)
+from .numpy_engine import NumpyKeyPointClassifier
+from .offload import OffloadPool, Overloaded
+from .pool import PoolTimeout, ResourcePool
+from .management.commands import score_landmarks
+from .registry import ModelRegistry, model_registry
+from .scoring import ChunkScorer, ConfusionMatrix, read_chunks
+from .streaming import StreamSession, websocket_application
+from . import runtime, scoring, streaming, tuning, uploads, views
+from .tuning import synthetic_features
+from .views import RETRY_AFTER
+
+
+class LandmarkFeatureGoldenTests(SimpleTestCase):
+    """The vectorized features must match the original per-landmark functions exactly."""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(42)
+
+    def test_matches_legacy_functions(self):
+        for width, height in ((640, 480), (480, 640), (1, 1), (1920, 1080)):
+            image = np.zeros((height, width, 3), dtype=np.uint8)
+            for _ in range(50):
+                hand_landmarks = random_hand_landmarks(self.rng)
+                landmark_list = legacy_calc_landmark_list(image, hand_landmarks)
+
+                points = landmark_array(hand_landmarks, width, height)
+                self.assertEqual(points.tolist(), landmark_list)
+                self.assertEqual(
+                    bounding_rect(points),
+                    legacy_calc_bounding_rect(image, hand_landmarks),
+                )
+                np.testing.assert_array_equal(
+                    normalize_landmarks(points),
+                    np.array(legacy_pre_process_landmark(landmark_list), dtype=np.float32),
+                )
+
+    def test_batch_matches_single_rows(self):
+        points = self.rng.integers(-50, 700, size=(8, 21, 2))
+        out = np.empty((8, 42), dtype=np.float32)
+
+        result = normalize_landmarks(points, out=out)
+
+        self.assertIs(result, out)
+        for row, hand in zip(result, points):
+            np.testing.assert_array_equal(row, normalize_landmarks(hand))
+
+    def test_collapsed_hand_normalizes_to_zero(self):
+        hand_landmarks = landmark_pb2.NormalizedLandmarkList()
+        for _ in range(21):
+            hand_landmarks.landmark.add(x=0.5, y=0.5, z=0.0)
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        points = landmark_array(hand_landmarks, 640, 480)
+
+        np.testing.assert_array_equal(
+            normalize_landmarks(points),
+            np.array(legacy_pre_process_landmark(legacy_calc_landmark_list(image, hand_landmarks)),
+                     dtype=np.float32),
+        )
+
+
+class NumpyEngineParityTests(SimpleTestCase):
+    """The NumPy engine must reproduce the TFLite interpreter's predictions."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        bundle = model_registry.get()
+        cls.interpreter = KeyPointClassifier(bundle, interpreter_options={})
+        cls.engine = NumpyKeyPointClassifier(bundle)
+        cls.features = synthetic_features(500)
+
+    def test_batch_matches_interpreter(self):
+        expected_ids, expected_confidences = self.interpreter.classify_batch(self.features)
+
+        result_ids, confidences = self.engine.classify_batch(self.features)
+
+        np.testing.assert_array_equal(result_ids, expected_ids)
+        np.testing.assert_allclose(confidences, expected_confidences, atol=1e-5)
+
+    def test_single_rows_match_interpreter(self):
+        for features in self.features[:50]:
+            expected_id, expected_confidence = self.interpreter(features)
+
+            result_id, confidence = self.engine(features)
+
+            self.assertEqual(result_id, expected_id)
+            self.assertAlmostEqual(float(confidence), float(expected_confidence), places=5)
+
+    def test_batch_size_does_not_change_results(self):
+        full_ids, full_confidences = self.engine.classify_batch(self.features)
+        for size in (1, 7, 64):
+            result_ids, confidences = self.engine.classify_batch(self.features[:size])
+            np.testing.assert_array_equal(result_ids, full_ids[:size])
+            np.testing.assert_allclose(confidences, full_confidences[:size], rtol=1e-6)
+
+
+class FakeClassifier:
+    """classify_batch stand-in: the id is the first feature, the confidence the second."""
+
+    def __init__(self, gate=None, error=None):
+        self.gate = gate
+        self.error = error
+        self.entered = threading.Event()
+        self.shapes = []
+
+    def classify_batch(self, input_data):
+        self.shapes.append(input_data.shape)
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return input_data[:, 0].astype(np.int64), input_data[:, 1].copy()
+
+
+def features(hand_sign_id, confidence=0.5):
+    row = np.zeros(42, dtype=np.float32)
+    row[:2] = hand_sign_id, confidence
+    return row
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def make_batcher(self, classifier, **kwargs):
+        batcher = MicroBatcher(classifier.classify_batch, **kwargs)
+        batcher.idle_timeout = 0.01
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_full_batch_flushes_before_the_wait(self):
+        classifier = FakeClassifier()
+        batcher = self.make_batcher(classifier, max_batch_size=4, max_wait=10)
+
+        futures = [batcher.submit(features(i)) for i in range(4)]
+
+        self.assertEqual([int(future.result(timeout=2)[0]) for future in futures], [0, 1, 2, 3])
+        self.assertEqual(batcher.stats()['batch_sizes'], {4: 1})
+
+    def test_partial_batch_flushes_after_the_wait(self):
+        classifier = FakeClassifier()
+        batcher = self.make_batcher(classifier, max_batch_size=16, max_wait=0.2)
+
+        futures = [batcher.submit(features(i, 0.25)) for i in (3, 5)]
+
+        self.assertEqual([future.result(timeout=2) for future in futures], [(3, 0.25), (5, 0.25)])
+        stats = batcher.stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(stats['batch_sizes'], {2: 1})
+        self.assertEqual(stats['mean_batch_size'], 2.0)
+        self.assertGreater(stats['max_queue_wait_ms'], 0)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_batches_are_padded_to_one_shape(self):
+        classifier = FakeClassifier()
+        batcher = self.make_batcher(classifier, max_batch_size=8, max_wait=0)
+
+        for i in range(3):
+            self.assertEqual(int(batcher(features(i))[0]), i)
+
+        self.assertEqual(set(classifier.shapes), {(8, 42)})
+
+    def test_full_queue_raises(self):
+        gate = threading.Event()
+        classifier = FakeClassifier(gate=gate)
+        batcher = self.make_batcher(classifier, max_batch_size=1, max_queue_size=1)
+
+        first = batcher.submit(features(1))
+        self.assertTrue(classifier.entered.wait(2))
+        second = batcher.submit(features(2))
+        with self.assertRaises(QueueFull):
+            batcher.submit(features(3))
+
+        gate.set()
+        self.assertEqual(int(first.result(timeout=2)[0]), 1)
+        self.assertEqual(int(second.result(timeout=2)[0]), 2)
+
+    def test_call_times_out_with_queue_full(self):
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        batcher = self.make_batcher(FakeClassifier(gate=gate), timeout=0.05)
+
+        with self.assertRaises(QueueFull):
+            batcher(features(1))
+
+    def test_errors_reach_every_request_of_the_batch(self):
+        batcher = self.make_batcher(FakeClassifier(error=ValueError('bad input')), max_batch_size=2, max_wait=10)
+
+        futures = [batcher.submit(features(i)) for i in range(2)]
+
+        for future in futures:
+            with self.assertRaisesMessage(ValueError, 'bad input'):
+                future.result(timeout=2)
+
+    def test_close_finishes_queued_requests_and_refuses_new_ones(self):
+        gate = threading.Event()
+        classifier = FakeClassifier(gate=gate)
+        batcher = self.make_batcher(classifier, max_batch_size=1)
+
+        futures = [batcher.submit(features(1))]
+        self.assertTrue(classifier.entered.wait(2))
+        futures.append(batcher.submit(features(2)))
+        batcher.close()
+        with self.assertRaises(QueueFull):
+            batcher.submit(features(3))
+
+        gate.set()
+        self.assertEqual([int(future.result(timeout=2)[0]) for future in futures], [1, 2])
+        batcher._thread.join(2)
+        self.assertFalse(batcher._thread.is_alive())
+
+
+class ResourcePoolTests(SimpleTestCase):
+    def make_pool(self, size=2, timeout=None):
+        created = []
+
+        def factory():
+            created.append(object())
+            return created[-1]
+
+        return ResourcePool(factory, size=size, timeout=timeout), created
+
+    def test_checkin_makes_the_instance_reusable(self):
+        pool, created = self.make_pool()
+
+        first = pool.checkout()
+        second = pool.checkout()
+        self.assertIsNot(first, second)
+        pool.checkin(first)
+
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(len(created), 2)
+        stats = pool.stats()
+        self.assertEqual((stats['created'], stats['in_use'], stats['checkouts']), (2, 2, 3))
+        self.assertEqual(stats['utilisation'], 1.0)
+
+    def test_exhausted_pool_times_out(self):
+        pool, _ = self.make_pool(size=1, timeout=0.05)
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(timeout=0)
+
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['checkouts'], stats['in_use']), (2, 1, 1))
+
+    def test_waiter_gets_the_instance_checked_in(self):
+        pool, _ = self.make_pool(size=1, timeout=2)
+        held = pool.checkout()
+        leased = []
+        waiter = threading.Thread(target=lambda: leased.append(pool.checkout()))
+        waiter.start()
+
+        pool.checkin(held)
+        waiter.join(2)
+
+        self.assertEqual(leased, [held])
+        self.assertGreater(pool.stats()['max_wait_ms'], 0)
+
+    def test_lease_returns_the_instance_when_the_body_raises(self):
+        pool, _ = self.make_pool(size=1, timeout=0.05)
+
+        with self.assertRaises(RuntimeError):
+            with pool.lease() as resource:
+                raise RuntimeError('classification failed')
+
+        self.assertEqual(pool.stats()['in_use'], 0)
+        with pool.lease() as again:
+            self.assertIs(again, resource)
+
+    def test_failed_factory_frees_its_slot(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError('model missing')
+            return object()
+
+        pool = ResourcePool(factory, size=1, timeout=0.05)
+        with self.assertRaises(OSError):
+            pool.checkout()
+
+        self.assertIsNotNone(pool.checkout())
+        self.assertEqual(pool.stats()['created'], 1)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = PredictionCache(LocalCacheBackend(), LocalCacheBackend(), quantization_step=0.01)
+        # On the quantization grid, so small offsets round back to it
+        self.features = ((np.arange(42) - 21) * 0.02).astype(np.float32)
+
+    def test_nearby_features_share_a_key(self):
+        key = self.cache.classification_key(self.features, 'v1')
+
+        self.assertEqual(self.cache.classification_key(self.features + 0.001, 'v1'), key)
+        self.assertNotEqual(self.cache.classification_key(self.features + 0.02, 'v1'), key)
+
+    def test_model_versions_never_share_entries(self):
+        self.assertNotEqual(
+            self.cache.classification_key(self.features, 'v1'),
+            self.cache.classification_key(self.features, 'v2'),
+        )
+        self.assertNotEqual(self.cache.response_key(b'frame', 'v1'), self.cache.response_key(b'frame', 'v2'))
+
+        self.cache.set_classification(self.cache.classification_key(self.features, 'v1'), 3, 0.9)
+        self.cache.set_response(self.cache.response_key(b'frame', 'v1'), 200, {'prediction': 3})
+
+        self.assertIsNone(self.cache.get_classification(self.cache.classification_key(self.features, 'v2')))
+        self.assertIsNone(self.cache.get_response(self.cache.response_key(b'frame', 'v2')))
+
+    def test_counts_hits_and_misses(self):
+        key = self.cache.classification_key(self.features, 'v1')
+        self.assertIsNone(self.cache.get_classification(key))
+        self.cache.set_classification(key, np.int64(3), np.float32(0.5))
+        self.assertEqual(self.cache.get_classification(key), (3, 0.5))
+
+        response_key = self.cache.response_key(b'frame', 'v1')
+        self.assertIsNone(self.cache.get_response(response_key))
+
+        self.assertEqual(self.cache.stats(), {
+            'response_hits': 0,
+            'response_misses': 1,
+            'classification_hits': 1,
+            'classification_misses': 1,
+            'response_evictions': 0,
+            'classification_evictions': 0,
+        })
+
+    def test_failed_classifications_are_not_cached(self):
+        key = self.cache.classification_key(self.features, 'v1')
+
+        self.cache.set_classification(key, None, 0.0)
+
+        self.assertIsNone(self.cache.get_classification(key))
+
+
+class PredictAsyncOverloadTests(SimpleTestCase):
+    async def test_full_pool_answers_503_with_retry_after(self):
+        pool = OffloadPool(workers=1, max_in_flight=1)
+        # Stands in for the process pool, the first frame stays in flight
+        pending = Future()
+        pool._executor = mock.Mock()
+        pool._executor.submit.return_value = pending
+        url = reverse('predict-async')
+
+        first = asyncio.ensure_future(pool.predict(b'frame-1'))
+        await asyncio.sleep(0)
+        self.assertEqual(pool.stats()['in_flight'], 1)
+
+        with mock.patch('handsign_recognition.views.get_offload_pool', return_value=pool):
+            response = await self.async_client.post(url, {'image': SimpleUploadedFile('2.jpg', b'frame-2')})
+
+        pending.set_result((400, {'error': 'No hand detected'}))
+        self.assertEqual(await first, (400, {'error': 'No hand detected'}))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(RETRY_AFTER))
+        self.assertEqual(response.json(), {'error': 'Prediction queue is full'})
+        self.assertEqual(pool.stats(), {'workers': 1, 'in_flight': 0, 'max_in_flight': 1, 'rejected': 1})
+
+    async def test_cancelled_requests_hold_their_slot_until_the_worker_finishes(self):
+        pool = OffloadPool(workers=1, max_in_flight=1)
+        running = Future()
+        running.set_running_or_notify_cancel()
+        pool._executor = mock.Mock()
+        pool._executor.submit.return_value = running
+
+        request = asyncio.ensure_future(pool.predict(b'frame-1'))
+        await asyncio.sleep(0)
+        request.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await request
+
+        # The worker is still busy with the frame
+        self.assertEqual(pool.stats()['in_flight'], 1)
+        with self.assertRaises(Overloaded):
+            await pool.predict(b'frame-2')
+
+        running.set_result((400, {'error': 'No hand detected'}))
+        self.assertEqual(pool.stats()['in_flight'], 0)
+
+    async def test_failed_submit_frees_its_slot(self):
+        pool = OffloadPool(workers=1, max_in_flight=1)
+        pool._executor = mock.Mock()
+        pool._executor.submit.side_effect = RuntimeError("cannot schedule new futures after shutdown")
+
+        with self.assertRaises(RuntimeError):
+            await pool.predict(b'frame')
+
+        self.assertEqual(pool.stats()['in_flight'], 0)
+
+
+class PredictUploadTests(SimpleTestCase):
+    def setUp(self):
+        # Garbage bytes would otherwise be answered from earlier tests
+        patcher = mock.patch.object(views, 'prediction_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_oversize_content_length_is_rejected_before_parsing(self):
+        with mock.patch.object(uploads, 'MAX_UPLOAD_SIZE', 100), \
+                mock.patch('django.http.request.MultiPartParser.parse') as parse:
+            response = self.client.post(reverse('predict'), {'image': SimpleUploadedFile('big.jpg', b'x' * 200)})
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json(), {'error': 'Upload exceeds 100 bytes'})
+        parse.assert_not_called()
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_uploads_stay_in_memory(self):
+        with mock.patch.object(views, 'read_upload', wraps=uploads.read_upload) as read_upload, \
+                mock.patch.object(default_storage, 'save') as save:
+            self.client.post(reverse('predict'), {'image': SimpleUploadedFile('frame.jpg', b'x' * 100)})
+
+        self.assertIsInstance(read_upload.call_args.args[0], InMemoryUploadedFile)
+        save.assert_not_called()
+
+    def test_undecodable_upload_is_a_client_error(self):
+        response = self.client.post(reverse('predict'), {'image': SimpleUploadedFile('frame.jpg', b'not an image')})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Failed to read image'})
+
+
+class PredictBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.points = random_hand_points(np.random.default_rng(7), 2)
+        hands = {b'hand': (self.points[0], 'Left', bounding_rect(self.points[0])), b'empty': None}
+
+        def decode_image(image_file):
+            data = image_file.read()
+            if data == b'bad':
+                raise uploads.InvalidImage("Failed to read image")
+            return data
+
+        self.classify_batch = mock.Mock(
+            side_effect=lambda input_data: (np.arange(len(input_data)), np.full(len(input_data), 0.75)))
+        classifier = mock.Mock(classify_batch=self.classify_batch)
+
+        for patcher in (
+            mock.patch.object(inference, 'create_hands'),
+            mock.patch.object(inference, 'inference_pool', ResourcePool(InferenceContext, size=1)),
+            mock.patch.object(inference.ClassifierSet, 'get', return_value=classifier),
+            mock.patch.object(inference, 'detect_hand', side_effect=lambda image, _: hands[image]),
+            mock.patch.object(views, 'decode_image', side_effect=decode_image),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, images=(), landmarks=()):
+        return self.client.post(reverse('predict-batch'), {
+            'images': [SimpleUploadedFile(f'{i}.jpg', data) for i, data in enumerate(images)],
+            'landmarks': list(landmarks),
+        })
+
+    def test_mixed_items_share_one_classify_call(self):
+        response = self.post(
+            images=[b'hand', b'empty', b'bad'],
+            landmarks=[json.dumps(self.points[1].tolist()), '{"x": 1}', '[[1, 2]]', 'null', 'not json'],
+        )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 8)
+        self.assertEqual((results[0]['prediction'], results[0]['handedness']), (0, 'Left'))
+        self.assertEqual(results[0]['bounding_box'], bounding_rect(self.points[0]))
+        self.assertEqual(results[1], {'error': 'No hand detected'})
+        self.assertEqual(results[2], {'error': 'Failed to read image'})
+        self.assertEqual((results[3]['prediction'], results[3]['handedness']), (1, None))
+        self.assertEqual(results[3]['bounding_box'], bounding_rect(self.points[1]))
+        for result in results[4:]:
+            self.assertIn('error', result)
+
+        self.classify_batch.assert_called_once()
+        np.testing.assert_array_equal(
+            self.classify_batch.call_args.args[0], normalize_landmarks(self.points))
+
+    def test_batch_size_is_capped(self):
+        landmarks = [json.dumps(self.points[0].tolist())] * 3
+
+        with mock.patch.object(views, 'MAX_BATCH_SIZE', 2):
+            response = self.post(images=[b'hand'], landmarks=landmarks[:2])
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Batch exceeds 2 items'})
+            self.assertEqual(self.post(landmarks=landmarks).status_code, 400)
+
+            self.classify_batch.assert_not_called()
+            self.assertEqual(self.post(landmarks=landmarks[:2]).status_code, 200)
+
+        self.classify_batch.assert_called_once()
+
+
+class PredictLandmarksTests(SimpleTestCase):
+    def setUp(self):
+        self.points = random_hand_points(np.random.default_rng(11), 1)[0]
+        self.classifier = mock.Mock(return_value=(3, 0.75))
+
+        for patcher in (
+            mock.patch.object(views, 'prediction_cache', None),
+            mock.patch.object(inference.ClassifierSet, 'get', return_value=self.classifier),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_json(self, payload):
+        return self.client.post(reverse('predict-landmarks'), payload, content_type='application/json')
+
+    def post_packed(self, body, query=''):
+        return self.client.post(
+            reverse('predict-landmarks') + query, body, content_type='application/octet-stream')
+
+    def assertClassified(self, response, handedness):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['prediction'], data['confidence']), (3, 0.75))
+        self.assertEqual(data['handedness'], handedness)
+        self.assertEqual(data['bounding_box'], bounding_rect(self.points))
+        np.testing.assert_array_equal(self.classifier.call_args.args[0], normalize_landmarks(self.points))
+
+    def test_json_body(self):
+        response = self.post_json({'landmarks': self.points.tolist(), 'handedness': 'Right'})
+
+        self.assertClassified(response, 'Right')
+
+    def test_packed_body(self):
+        body = self.points.astype('<f4').tobytes()
+        self.assertEqual(len(body), 168)
+
+        self.assertClassified(self.post_packed(body, '?handedness=Left'), 'Left')
+        self.assertClassified(self.post_packed(body), None)
+
+    def test_malformed_json_bodies(self):
+        landmarks = self.points.tolist()
+        for payload in (
+            {},
+            {'landmarks': landmarks[:20]},
+            {'landmarks': {'x': 1}},
+            {'landmarks': [[None, None]] * 21},
+            {'landmarks': [[float('nan'), 0]] * 21},
+            {'landmarks': [[1e12, 0]] + landmarks[1:]},
+            {'landmarks': [[0, -2 ** 40]] + landmarks[1:]},
+            {'landmarks': landmarks, 'handedness': 'Up'},
+            {'landmarks': landmarks, 'handedness': ['Left']},
+            [landmarks],
+        ):
+            response = self.post_json(payload)
+            self.assertEqual(response.status_code, 400, payload)
+
+        self.assertEqual(self.post_json('not json').status_code, 400)
+        self.classifier.assert_not_called()
+
+    def test_malformed_packed_bodies(self):
+        body = self.points.astype('<f4').tobytes()
+        overflow = self.points.astype('<f4')
+        overflow[0, 0] = 3e9
+
+        for body, query in (
+            (body[:-4], ''),
+            (body + b'\0' * 4, ''),
+            (np.full((21, 2), np.inf, dtype='<f4').tobytes(), ''),
+            (overflow.tobytes(), ''),
+            (body, '?handedness=both'),
+        ):
+            self.assertEqual(self.post_packed(body, query).status_code, 400, query)
+
+        self.classifier.assert_not_called()
+
+
+class WebSocketStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.sessions = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+        def load(session):
+            session.hands = mock.Mock()
+            self.sessions.append(session)
+
+        def process(session, data):
+            self.entered.set()
+            self.gate.wait(5)
+            return {'data': data.decode()}
+
+        for patcher in (
+            mock.patch.object(streaming, 'active_sessions', 0),
+            mock.patch.object(streaming, 'FRAME_QUEUE_SIZE', 2),
+            mock.patch.object(StreamSession, 'load', load),
+            mock.patch.object(StreamSession, 'process', process),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def connect(self, path=streaming.STREAM_PATH, query_string=b''):
+        # (task, inbound queue, outbound queue) of one connection
+        inbound, outbound = asyncio.Queue(), asyncio.Queue()
+        inbound.put_nowait({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path, 'query_string': query_string}
+        task = asyncio.ensure_future(websocket_application(scope, inbound.get, outbound.put))
+        return task, inbound, outbound
+
+    async def next_message(self, outbound):
+        return await asyncio.wait_for(outbound.get(), 5)
+
+    async def disconnect(self, task, inbound):
+        await inbound.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(task, 5)
+
+    async def test_unknown_path_closes_with_4404(self):
+        task, _, outbound = self.connect(path='/ws/other/')
+        await asyncio.wait_for(task, 5)
+
+        self.assertEqual(outbound.get_nowait(), {'type': 'websocket.close', 'code': 4404})
+        self.assertEqual(self.sessions, [])
+
+    async def test_unknown_variant_closes_with_4400(self):
+        task, _, outbound = self.connect(query_string=b'variant=missing')
+        await asyncio.wait_for(task, 5)
+
+        self.assertEqual(outbound.get_nowait(), {'type': 'websocket.close', 'code': 4400})
+        self.assertEqual(self.sessions, [])
+
+    async def test_sessions_over_the_cap_close_with_1013(self):
+        with mock.patch.object(streaming, 'MAX_SESSIONS', 1):
+            first, first_inbound, first_outbound = self.connect()
+            self.assertEqual(await self.next_message(first_outbound), {'type': 'websocket.accept'})
+
+            second, _, second_outbound = self.connect()
+            await asyncio.wait_for(second, 5)
+            self.assertEqual(second_outbound.get_nowait(), {'type': 'websocket.close', 'code': 1013})
+
+            await self.disconnect(first, first_inbound)
+            third, third_inbound, third_outbound = self.connect()
+            self.assertEqual(await self.next_message(third_outbound), {'type': 'websocket.accept'})
+            await self.disconnect(third, third_inbound)
+
+        self.assertEqual(len(self.sessions), 2)
+
+    async def test_slow_sessions_keep_the_newest_frames(self):
+        task, inbound, outbound = self.connect()
+        self.assertEqual(await self.next_message(outbound), {'type': 'websocket.accept'})
+
+        # Frame 1 is being processed while 2 to 5 arrive, 2 slots queue them
+        self.gate.clear()
+        await inbound.put({'type': 'websocket.receive', 'bytes': b'1'})
+        await asyncio.get_running_loop().run_in_executor(None, self.entered.wait, 5)
+        for frame in (b'2', b'3', b'4', b'5'):
+            await inbound.put({'type': 'websocket.receive', 'bytes': frame})
+        while not inbound.empty():
+            await asyncio.sleep(0)
+        self.gate.set()
+
+        results = [json.loads((await self.next_message(outbound))['text']) for _ in range(3)]
+        self.assertEqual(results, [
+            {'data': '1', 'frame': 1, 'dropped_frames': 2},
+            {'data': '4', 'frame': 4, 'dropped_frames': 2},
+            {'data': '5', 'frame': 5, 'dropped_frames': 2},
+        ])
+        await self.disconnect(task, inbound)
+
+    async def test_disconnect_releases_the_session(self):
+        task, inbound, outbound = self.connect()
+        self.assertEqual(await self.next_message(outbound), {'type': 'websocket.accept'})
+        self.assertEqual(streaming.active_sessions, 1)
+        (session,) = self.sessions
+        hands = session.hands
+
+        await self.disconnect(task, inbound)
+
+        self.assertEqual(streaming.active_sessions, 0)
+        hands.close.assert_called_once_with()
+        self.assertIsNone(session.hands)
+        self.assertTrue(outbound.empty())
+
+
+class PredictResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        points = random_hand_points(np.random.default_rng(5), 1)[0]
+        self.decode = mock.Mock(return_value=np.zeros((480, 640, 3), dtype=np.uint8))
+        self.detect = mock.Mock(return_value=(points, 'Left', bounding_rect(points)))
+        classifier = mock.Mock(return_value=(2, 0.9))
+
+        for patcher in (
+            mock.patch.object(views, 'prediction_cache', PredictionCache(
+                LocalCacheBackend(16, 30), LocalCacheBackend(16, 30), quantization_step=0.01)),
+            mock.patch.object(views, 'decode_image_bytes', self.decode),
+            mock.patch.object(inference, 'create_hands'),
+            mock.patch.object(inference, 'inference_pool', ResourcePool(InferenceContext, size=1)),
+            mock.patch.object(inference, 'detect_hand', self.detect),
+            mock.patch.object(inference.ClassifierSet, 'get', return_value=classifier),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, data):
+        return self.client.post(reverse('predict'), {'image': SimpleUploadedFile('frame.jpg', data)})
+
+    def stages(self, response):
+        return [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+
+    def test_repeated_upload_skips_decode_and_detect(self):
+        first = self.post(b'frame')
+        second = self.post(b'frame')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.stages(first), ['cache', 'decode', 'pool_wait', 'detect', 'normalize', 'classify', 'total'])
+        self.assertEqual(self.stages(second), ['cache', 'total'])
+        self.assertEqual(self.decode.call_count, 1)
+        self.assertEqual(self.detect.call_count, 1)
+
+        self.assertIn('decode', self.stages(self.post(b'another frame')))
+
+
+class StubHands:
+    """Hands stand-in whose process() finds the same hands in every frame."""
+
+    def __init__(self, hand_landmarks, labels):
+        self.results = SimpleNamespace(
+            multi_hand_landmarks=hand_landmarks,
+            multi_handedness=[SimpleNamespace(classification=[SimpleNamespace(label=label)]) for label in labels],
+        )
+
+    def process(self, image):
+        return self.results
+
+
+class MultiHandPredictTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.hand_landmarks = [random_hand_landmarks(rng) for _ in range(3)]
+        self.hands = StubHands(self.hand_landmarks, ['Left', 'Right', 'Left'])
+        self.decode = mock.Mock(return_value=np.zeros((480, 640, 3), dtype=np.uint8))
+        self.classify_batch = mock.Mock(
+            side_effect=lambda input_data: (np.arange(len(input_data)), np.full(len(input_data), 0.5)))
+
+        for patcher in (
+            mock.patch.object(views, 'prediction_cache', None),
+            mock.patch.object(views, 'decode_image_bytes', self.decode),
+            mock.patch.object(inference, 'create_hands', return_value=self.hands),
+            mock.patch.object(inference, 'inference_pool', ResourcePool(InferenceContext, size=1)),
+            mock.patch.object(inference.ClassifierSet, 'get', return_value=mock.Mock(classify_batch=self.classify_batch)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, hands):
+        return self.client.post(
+            reverse('predict') + f'?hands={hands}', {'image': SimpleUploadedFile('frame.jpg', b'frame')})
+
+    def test_invalid_hand_counts(self):
+        for hands in ('0', 'two', '-1', '1.5', '', str(inference.MAX_NUM_HANDS + 1)):
+            response = self.post(hands)
+            self.assertEqual(response.status_code, 400, hands)
+            self.assertEqual(response.json(), {'error': f'hands must be between 1 and {inference.MAX_NUM_HANDS}'})
+
+        self.decode.assert_not_called()
+
+    def test_every_hand_is_classified_in_one_call(self):
+        response = self.post(3)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'hands', 'model_version'})
+        self.assertEqual(data['model_version'], model_registry.get().version)
+        self.assertEqual([hand['prediction'] for hand in data['hands']], [0, 1, 2])
+        self.assertEqual([hand['handedness'] for hand in data['hands']], ['Left', 'Right', 'Left'])
+        self.classify_batch.assert_called_once()
+        self.assertEqual(self.classify_batch.call_args.args[0].shape, (3, 42))
+
+    def test_fewer_hands_than_found_are_returned(self):
+        response = self.post(2)
+
+        self.assertEqual([hand['handedness'] for hand in response.json()['hands']], ['Left', 'Right'])
+        self.assertEqual(self.classify_batch.call_args.args[0].shape, (2, 42))
+
+    def test_detect_hands_truncates_to_max_hands(self):
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+        detections = inference.detect_hands(image, self.hands, max_hands=2)
+
+        self.assertEqual(len(detections), 2)
+        for (points, handedness, brect), hand_landmarks, label in zip(
+                detections, self.hand_landmarks, ['Left', 'Right']):
+            np.testing.assert_array_equal(points, landmark_array(hand_landmarks, 640, 480))
+            self.assertEqual((handedness, brect), (label, bounding_rect(points)))
+        self.assertEqual(len(inference.detect_hands(image, self.hands)), 3)
+        self.assertEqual(inference.detect_hands(image, StubHands(None, [])), [])
+
+
+class ModelRegistryReloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.write('clf.tflite', b'model-1')
+        self.write('clf_label.csv', b'Open\nClose\n')
+        self.registry = ModelRegistry(self.directory, 'clf', reload_interval=0.001)
+
+    def write(self, filename, content):
+        # Replaced atomically, the way deploys are expected to
+        path = os.path.join(self.directory, filename)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+    def current(self):
+        # Past the reload interval, so get() re-stats the files
+        self.registry._checked = 0.0
+        return self.registry.get('float32')
+
+    def test_unchanged_files_keep_the_bundle(self):
+        bundle = self.current()
+
+        self.assertIs(self.current(), bundle)
+        self.assertEqual(self.registry.reloads, 0)
+
+    def test_changed_labels_swap_in_a_new_version(self):
+        held = self.current()
+
+        self.write('clf_label.csv', b'Open\nClose\nPoint\n')
+        bundle = self.current()
+
+        self.assertIsNot(bundle, held)
+        self.assertNotEqual(bundle.version, held.version)
+        self.assertEqual(bundle.labels, ['Open', 'Close', 'Point'])
+        self.assertEqual(self.registry.reloads, 1)
+        # Requests that started on the old bundle keep using it unchanged
+        self.assertEqual(held.labels, ['Open', 'Close'])
+        self.assertEqual(held.label(1), 'Close')
+
+    def test_changed_model_swaps_in_a_new_version(self):
+        held = self.current()
+
+        self.write('clf.tflite', b'model-2, retrained')
+        bundle = self.current()
+
+        self.assertNotEqual(bundle.checksum, held.checksum)
+        self.assertEqual(bundle.model_content, b'model-2, retrained')
+        self.assertEqual(held.model_content, b'model-1')
+        self.assertEqual(self.registry.variants(), ['float32'])
+
+    def test_new_variants_are_picked_up(self):
+        float32 = self.current()
+
+        self.write('clf.int8.tflite', b'quantized')
+        self.current()
+
+        self.assertEqual(self.registry.variants(), ['float32', 'int8'])
+        self.assertIs(self.registry.get('float32'), float32)
+
+    def test_describe_leaves_out_filesystem_paths(self):
+        bundle = self.current()
+
+        self.assertEqual(self.registry.describe()['variants'], {
+            'float32': {'version': bundle.version, 'checksum': bundle.checksum, 'labels': 2},
+        })
+        self.assertNotIn(self.directory, json.dumps(self.registry.describe()))
+
+
+class FakeCandidate:
+    """A classifier whose agreement with the labels and latency are fixed."""
+
+    def __init__(self, labels, agreement, latency):
+        self.predictions = labels.copy()
+        self.predictions[int(round(agreement * len(labels))):] = -1
+        self.latency = latency
+
+    def __call__(self, features):
+        return 0, 1.0
+
+    def classify_batch(self, features):
+        return self.predictions, np.ones(len(features))
+
+
+class TuneClassifierTests(SimpleTestCase):
+    labels = np.arange(200) % 5
+
+    # (variant, engine, xnnpack) -> (agreement, latency)
+    candidates = {
+        ('float32', 'numpy', None): (1.0, 0.5),
+        ('float32', 'tflite', True): (1.0, 1.0),
+        ('float32', 'tflite', False): (1.0, 2.0),
+        ('int8', 'numpy', None): (0.995, 0.3),
+        ('int8', 'tflite', True): (0.9, 0.1),
+        ('int8', 'tflite', False): (0.9, 0.2),
+    }
+
+    def tune(self, candidates=None, **kwargs):
+        candidates = candidates or self.candidates
+        bundles = {variant: mock.Mock(variant=variant) for variant in ('float32', 'int8')}
+
+        def create_classifier(bundle, config):
+            agreement, latency = candidates[bundle.variant, config['engine'], config['xnnpack']]
+            return FakeCandidate(self.labels, agreement, latency)
+
+        with mock.patch.object(model_registry, 'reload', return_value=bundles), \
+                mock.patch('handsign_recognition.inference.create_classifier', create_classifier), \
+                mock.patch.object(tuning, 'thread_counts', return_value=[1]), \
+                mock.patch.object(tuning, 'median_latency', lambda classifier, *args: classifier.latency):
+            return tuning.tune_classifier(np.zeros((200, 42), np.float32), self.labels, **kwargs)
+
+    def test_picks_the_fastest_candidate_within_the_tolerance(self):
+        config, results = self.tune(min_agreement=0.99)
+
+        self.assertEqual(config, {'engine': 'numpy', 'variant': 'int8', 'num_threads': None, 'xnnpack': None})
+        self.assertEqual(len(results), len(self.candidates))
+        self.assertEqual(
+            {(r['variant'], r['engine'], r['xnnpack']): r['agreement'] for r in results},
+            {key: agreement for key, (agreement, _) in self.candidates.items()},
+        )
+
+    def test_looser_tolerance_admits_faster_candidates(self):
+        config, _ = self.tune(min_agreement=0.85)
+
+        self.assertEqual(config, {'engine': 'tflite', 'variant': 'int8', 'num_threads': 1, 'xnnpack': True})
+
+    def test_tolerance_is_relative_to_the_float32_model(self):
+        candidates = {key: (agreement - 0.2, latency) for key, (agreement, latency) in self.candidates.items()}
+
+        config, _ = self.tune(candidates, min_agreement=0.99)
+
+        # float32 itself only gets 80% right, int8 numpy stays within 1% of it
+        self.assertEqual((config['variant'], config['engine']), ('int8', 'numpy'))
+
+
+class TuningProfileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'profile.json')
+
+        patcher = mock.patch.object(tuning, 'PROFILE_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # get_profile caches the profile it read
+        tuning._profile = None
+        self.addCleanup(setattr, tuning, '_profile', None)
+
+    def profile(self, **host):
+        return {'host': dict(tuning.host_info(), **host), 'config': {'engine': 'numpy', 'num_threads': 2}}
+
+    def test_matches_host(self):
+        self.assertTrue(tuning.matches_host(self.profile()))
+        self.assertTrue(tuning.matches_host(self.profile(python='2.7')))
+        self.assertFalse(tuning.matches_host(self.profile(cpu_count=(os.cpu_count() or 1) + 1)))
+        self.assertFalse(tuning.matches_host(self.profile(machine='sparc')))
+        self.assertFalse(tuning.matches_host({}))
+
+    def test_defaults_without_a_profile(self):
+        self.assertEqual(tuning.get_profile(), tuning.DEFAULTS)
+
+    def test_saved_profile_overrides_the_defaults(self):
+        tuning.save_profile(self.profile())
+
+        self.assertEqual(tuning.get_profile(), dict(tuning.DEFAULTS, engine='numpy', num_threads=2))
+
+    def test_profile_of_another_host_is_ignored(self):
+        tuning.save_profile(self.profile(machine='sparc'))
+
+        self.assertEqual(tuning.get_profile(), tuning.DEFAULTS)
+
+    def test_ensure_profile_tunes_once(self):
+        with mock.patch.object(tuning, 'tune', return_value=self.profile()) as tune:
+            first = tuning.ensure_profile(iterations=1)
+            second = tuning.ensure_profile(iterations=1)
+
+        self.assertEqual(tune.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(first['engine'], 'numpy')
+        self.assertEqual(tuning.read_profile(), self.profile())
+
+    def test_ensure_profile_retunes_for_another_host(self):
+        tuning.save_profile(self.profile(machine='sparc'))
+
+        with mock.patch.object(tuning, 'tune', return_value=self.profile()) as tune:
+            tuning.ensure_profile(iterations=1)
+
+        self.assertEqual(tune.call_count, 1)
+        self.assertTrue(tuning.matches_host(tuning.read_profile()))
+
+    def test_concurrent_workers_wait_for_the_first_one(self):
+        def slow_tune(*args, **kwargs):
+            time.sleep(0.05)
+            return self.profile()
+
+        with mock.patch.object(tuning, 'tune', side_effect=slow_tune) as tune:
+            workers = [threading.Thread(target=tuning.ensure_profile, kwargs={'iterations': 1}) for _ in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(5)
+
+        self.assertEqual(tune.call_count, 1 if tuning.fcntl else len(workers))
+
+    def test_without_a_profile_path_nothing_is_tuned(self):
+        with mock.patch.object(tuning, 'PROFILE_PATH', None), mock.patch.object(tuning, 'tune') as tune:
+            self.assertEqual(tuning.ensure_profile(), tuning.DEFAULTS)
+
+        tune.assert_not_called()
+
+
+class BootTests(SimpleTestCase):
+    def boot(self, **settings):
+        with override_settings(**settings), \
+                mock.patch.object(tuning, 'ensure_profile') as ensure_profile, \
+                mock.patch.object(runtime, 'warm_up') as warm_up:
+            runtime.boot()
+        return ensure_profile.call_count, warm_up.call_count
+
+    def test_off_by_default(self):
+        self.assertEqual(self.boot(HANDSIGN_AUTO_TUNE=False, HANDSIGN_WARM_UP=False), (0, 0))
+
+    def test_tunes_and_warms_up_when_enabled(self):
+        self.assertEqual(self.boot(HANDSIGN_AUTO_TUNE=True, HANDSIGN_WARM_UP=True), (1, 1))
+        self.assertEqual(self.boot(HANDSIGN_WARM_UP=True), (0, 1))
+
+
+class TuneInferenceCommandTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'profile.json')
+        self.addCleanup(setattr, tuning, '_profile', None)
+
+    def test_writes_the_profile(self):
+        out = StringIO()
+
+        call_command('tune_inference', synthetic=20, iterations=3, output=self.path, stdout=out)
+
+        with open(self.path) as f:
+            profile = json.load(f)
+        self.assertTrue(tuning.matches_host(profile))
+        self.assertEqual(set(profile['config']), {'engine', 'variant', 'num_threads', 'xnnpack', 'model_complexity'})
+        self.assertIn(profile['config']['variant'], model_registry.variants())
+        self.assertEqual(profile['reference'], 'float32')
+        self.assertTrue(profile['candidates']['classifier'])
+        self.assertIn(f'Wrote {self.path}', out.getvalue())
+
+    def test_dry_run_saves_nothing(self):
+        out = StringIO()
+
+        call_command('tune_inference', synthetic=20, iterations=3, output=self.path, dry_run=True, stdout=out)
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIn('Selected: ', out.getvalue())
+
+
+class ScoringTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.values = random_hand_points(np.random.default_rng(9), 10).reshape(10, 42).astype(np.float32)
+
+    def write_csv(self, filename, rows, header=None):
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            if header:
+                f.write(header + '\n')
+            np.savetxt(f, rows, delimiter=',', fmt='%g')
+        return path
+
+    def test_read_csv_chunks(self):
+        plain = self.write_csv('plain.csv', self.values)
+        with_header = self.write_csv('header.csv', self.values, header='x0,y0,...')
+
+        for path, skip_header in ((plain, False), (with_header, True)):
+            chunks = list(read_chunks(path, 4, skip_header))
+            self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+            np.testing.assert_array_equal(np.concatenate(chunks), self.values)
+
+        with self.assertRaises(ValueError):
+            list(read_chunks(with_header, 4))
+
+    def test_read_memory_mapped_npy_chunks(self):
+        path = os.path.join(self.directory, 'points.npy')
+        np.save(path, self.values.reshape(10, 21, 2))
+
+        with mock.patch.object(scoring.np, 'load', wraps=np.load) as load:
+            chunks = list(read_chunks(path, 3))
+
+        self.assertEqual(load.call_args.kwargs, {'mmap_mode': 'r'})
+        self.assertEqual([chunk.shape for chunk in chunks], [(3, 42), (3, 42), (3, 42), (1, 42)])
+        self.assertEqual({chunk.dtype for chunk in chunks}, {np.dtype(np.float32)})
+        np.testing.assert_array_equal(np.concatenate(chunks), self.values)
+
+    def test_confusion_matrix(self):
+        confusion = ConfusionMatrix(3)
+        confusion.update(np.array([0, 1, 1, 2]), np.array([0, 1, 2, 2]))
+        confusion.update(np.array([2]), np.array([2]))
+
+        report = confusion.report(['Open', 'Close', 'Point'])
+
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(report['accuracy'], 0.8)
+        self.assertEqual(report['confusion_matrix'], [[1, 0, 0], [0, 1, 1], [0, 0, 2]])
+        self.assertEqual(report['classes']['Close'], {'support': 2, 'precision': 1.0, 'recall': 0.5})
+        self.assertEqual(report['classes']['Point'], {'support': 2, 'precision': 0.6667, 'recall': 1.0})
+
+    def test_confusion_matrix_rejects_out_of_range_labels(self):
+        confusion = ConfusionMatrix(3)
+
+        for labels, predictions in (([3], [0]), ([-1], [0]), ([0], [3])):
+            with self.assertRaises(ValueError):
+                confusion.update(np.array(labels), np.array(predictions))
+        self.assertEqual(confusion.report(['Open', 'Close', 'Point'])['rows'], 0)
+
+    def score(self, path, **options):
+        out = StringIO()
+        output = os.path.join(self.directory, 'predictions.csv')
+        call_command('score_landmarks', path, output=output, stdout=out, **options)
+        return np.loadtxt(output, delimiter=',', ndmin=2), out.getvalue()
+
+    def test_label_column_is_detected(self):
+        result_ids, _ = ChunkScorer()(self.values)
+        labelled = self.write_csv('labelled.csv', np.column_stack([result_ids, self.values]))
+        unlabelled = self.write_csv('unlabelled.csv', self.values)
+        report = os.path.join(self.directory, 'report.json')
+
+        rows, out = self.score(labelled, chunk_size=4, report=report)
+        self.assertEqual(rows[:, 1].tolist(), result_ids.tolist())
+        self.assertIn('Accuracy: 1.0000', out)
+        with open(report) as f:
+            self.assertEqual(json.load(f)['rows'], 10)
+
+        rows, out = self.score(unlabelled, chunk_size=4)
+        self.assertEqual(rows[:, 1].tolist(), [-1] * 10)
+        self.assertEqual(rows[:, 2].tolist(), result_ids.tolist())
+        self.assertNotIn('Accuracy', out)
+
+        with self.assertRaises(CommandError):
+            self.score(self.write_csv('short.csv', self.values[:, :40]))
+
+    def test_workers_keep_file_order(self):
+        path = self.write_csv('unlabelled.csv', self.values)
+        calls = iter(range(len(self.values)))
+
+        def score_chunk(values):
+            # Even chunks finish after the odd ones submitted behind them
+            if next(calls) % 2 == 0:
+                time.sleep(0.02)
+            return values[:, 0].astype(np.int64), values[:, 1].copy()
+
+        def executor(max_workers, **kwargs):
+            # Threads instead of spawned processes, which each load the model
+            return ThreadPoolExecutor(max_workers)
+
+        with mock.patch.object(score_landmarks, 'ProcessPoolExecutor', executor), \
+                mock.patch.object(score_landmarks, '_score_chunk', score_chunk):
+            rows, _ = self.score(path, chunk_size=1, workers=2)
+
+        self.assertEqual(rows[:, 0].tolist(), list(range(10)))
+        self.assertEqual(rows[:, 2].tolist(), self.values[:, 0].tolist())
+        np.testing.assert_allclose(rows[:, 3], self.values[:, 1])
@@ -0,0 +1,257 @@
+"""
+Host specific tuning of the inference stack.
+
+tune() benchmarks the candidate configurations on this host: the NumPy
+engine and the interpreter with every num_threads and XNNPACK on or off,
+for every model variant, plus the MediaPipe model_complexity levels.
+Candidates that fail the accuracy check against the reference set are
+dropped and the fastest remaining one is saved as a JSON profile
+(HANDSIGN_TUNING_PROFILE). Workers read that profile when they build
+their interpreters and Hands graphs; without one they use the library
+defaults.
+"""
+import json
+import os
+import platform
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows, auto-tuning workers aren't serialized
+    fcntl = None
+
+PROFILE_PATH = getattr(settings, 'HANDSIGN_TUNING_PROFILE', None)
+
+# Share of reference predictions a candidate has to reproduce
+MIN_AGREEMENT = getattr(settings, 'HANDSIGN_TUNING_MIN_AGREEMENT', 0.99)
+
+DEFAULTS = {'engine': 'tflite', 'num_threads': None, 'xnnpack': True, 'variant': None, 'model_complexity': 1}
+
+_profile = None
+_lock = threading.Lock()
+
+
+def host_info():
+    return {
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+    }
+
+
+def read_profile(path=None):
+    path = path or PROFILE_PATH
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(profile, path=None):
+    global _profile
+    path = path or PROFILE_PATH
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+    _profile = None
+
+
+def matches_host(profile):
+    # A profile tuned on a different machine shape says nothing about this one
+    host = host_info()
+    saved = profile.get('host', {})
+    return saved.get('cpu_count') == host['cpu_count'] and saved.get('machine') == host['machine']
+
+
+def get_profile():
+    """The configuration workers use: the saved profile when it matches this host, else defaults."""
+    global _profile
+    if _profile is None:
+        with _lock:
+            if _profile is None:
+                profile = dict(DEFAULTS)
+                saved = read_profile()
+                if saved and matches_host(saved):
+                    profile.update(saved.get('config', {}))
+                _profile = profile
+    return _profile
+
+
+def interpreter_options(config=None):
+    """Keyword arguments for runtime.create_interpreter."""
+    config = get_profile() if config is None else config
+    options = {}
+    if config.get('num_threads'):
+        options['num_threads'] = config['num_threads']
+    if not config.get('xnnpack', True):
+        from .runtime import op_resolver_type
+        options['experimental_op_resolver_type'] = op_resolver_type().BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    return options
+
+
+def thread_counts():
+    cpu_count = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpu_count:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+
+def median_latency(run, inputs, iterations):
+    import numpy as np
+
+    run(inputs[0])  # warm up
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(inputs[i % len(inputs)])
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies))
+
+
+def classifier_candidates():
+    yield {'engine': 'numpy', 'num_threads': None, 'xnnpack': None}
+    for num_threads in thread_counts():
+        for xnnpack in (True, False):
+            yield {'engine': 'tflite', 'num_threads': num_threads, 'xnnpack': xnnpack}
+
+
+def tune_classifier(features, labels=None, iterations=200, min_agreement=MIN_AGREEMENT):
+    """
+    Time single-row classification for every engine and interpreter candidate.
+    Without labels the reference is the float32 model with default options.
+    Returns (best config, candidate results).
+    """
+    import numpy as np
+    from .inference import KeyPointClassifier, create_classifier
+    from .registry import model_registry
+
+    bundles = model_registry.reload()
+    base = bundles.get('float32') or bundles[model_registry.default_variant]
+    reference = labels
+    if reference is None:
+        reference, _ = KeyPointClassifier(base, interpreter_options={}).classify_batch(features)
+
+    results = []
+    for variant, bundle in sorted(bundles.items()):
+        for candidate in classifier_candidates():
+            config = dict(candidate, variant=variant)
+            classifier = create_classifier(bundle, config)
+            if config['engine'] != 'tflite' and isinstance(classifier, KeyPointClassifier):
+                continue  # model not supported by the engine
+            predictions, _ = classifier.classify_batch(features)
+            agreement = float(np.mean(predictions == reference))
+            latency = median_latency(classifier, features, iterations)
+            results.append(dict(config, agreement=round(agreement, 4), latency_ms=round(latency * 1000, 4)))
+
+    if labels is not None:
+        # Measured against labels: keep candidates as accurate as float32 within the tolerance
+        floor = max(r['agreement'] for r in results if r['variant'] == base.variant) - (1 - min_agreement)
+    else:
+        floor = min_agreement
+
+    eligible = [r for r in results if r['agreement'] >= floor] or results
+    best = min(eligible, key=lambda r: r['latency_ms'])
+    return {key: best[key] for key in ('engine', 'variant', 'num_threads', 'xnnpack')}, results
+
+
+def tune_hands(images, classifier_config, iterations=50, min_agreement=MIN_AGREEMENT):
+    """
+    Time hands.process for each model_complexity on decoded BGR images,
+    checked against the labels complexity 1 produces. Returns (complexity, results).
+    """
+    import numpy as np
+    from . import inference
+    from .features import normalize_landmarks
+    from .registry import model_registry
+
+    classifier = inference.create_classifier(
+        model_registry.get(classifier_config['variant']), classifier_config)
+
+    def labels(hands):
+        found = []
+        for image in images:
+            hand = inference.detect_hand(image, hands)
+            found.append(-1 if hand is None else int(classifier(normalize_landmarks(hand[0]))[0]))
+        return np.array(found)
+
+    results = []
+    reference = None
+    for complexity in (1, 0):
+        hands = inference.create_hands(model_complexity=complexity)
+        try:
+            predicted = labels(hands)
+            if reference is None:
+                reference = predicted
+            latency = median_latency(lambda image: inference.detect_hand(image, hands), images, iterations)
+        finally:
+            hands.close()
+        results.append({
+            'model_complexity': complexity,
+            'agreement': round(float(np.mean(predicted == reference)), 4),
+            'latency_ms': round(latency * 1000, 4),
+        })
+
+    if not (reference >= 0).any():
+        # No hand found in any image, nothing to validate the lighter detector on
+        return DEFAULTS['model_complexity'], results
+
+    eligible = [r for r in results if r['agreement'] >= min_agreement]
+    best = min(eligible, key=lambda r: r['latency_ms'])
+    return best['model_complexity'], results
+
+
+def tune(features, labels=None, images=(), iterations=200, min_agreement=MIN_AGREEMENT):
+    """Benchmark every candidate and return a profile ready for save_profile."""
+    config, classifier_results = tune_classifier(features, labels, iterations, min_agreement)
+
+    hands_results = []
+    if len(images):
+        config['model_complexity'], hands_results = tune_hands(
+            images, config, max(iterations // 4, 1), min_agreement)
+    else:
+        # Without hand images the lighter detector can't be validated
+        config['model_complexity'] = DEFAULTS['model_complexity']
+
+    return {
+        'host': host_info(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'reference': 'labels' if labels is not None else 'float32',
+        'min_agreement': min_agreement,
+        'config': config,
+        'candidates': {'classifier': classifier_results, 'hands': hands_results},
+    }
+
+
+def ensure_profile(iterations=100):
+    """
+    Worker start hook: tune with the synthetic reference set unless a profile
+    for this host already exists. Concurrently starting workers wait for the
+    first one instead of benchmarking against each other.
+    """
+    if not PROFILE_PATH:
+        return get_profile()
+
+    with open(f'{PROFILE_PATH}.lock', 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        saved = read_profile()
+        if not saved or not matches_host(saved):
+            save_profile(tune(synthetic_features(), iterations=iterations))
+    return get_profile()
+
+
+def synthetic_features(count=500, seed=0):
+    import numpy as np
+    from .features import normalize_landmarks
+    from .testing import random_hand_points
+
+    return normalize_landmarks(random_hand_points(np.random.default_rng(seed), count))
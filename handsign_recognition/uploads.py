@@ -0,0 +1,69 @@
+import numpy as np
+
+from django.conf import settings
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+
+# Largest request body accepted by the prediction endpoints (bytes)
+MAX_UPLOAD_SIZE = getattr(settings, 'HANDSIGN_MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidImage(ValueError):
+    # The upload is not an image OpenCV can decode, a client error
+    pass
+
+
+class InMemoryUploadHandler(MemoryFileUploadHandler):
+    """
+    Keep uploads in memory regardless of FILE_UPLOAD_MAX_MEMORY_SIZE so the
+    prediction views never spill frames to a temporary file. Oversize bodies
+    are rejected by check_upload_size before this handler ever runs.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.activated = True
+
+
+def check_upload_size(request):
+    # Reject on the declared body size before the multipart body is parsed
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+
+    if content_length > MAX_UPLOAD_SIZE:
+        raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_SIZE} bytes")
+
+    # Must be installed before request.FILES is first accessed
+    request.upload_handlers = [InMemoryUploadHandler(request)]
+
+
+def read_upload(image_file):
+    if image_file.size is not None and image_file.size > MAX_UPLOAD_SIZE:
+        raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_SIZE} bytes")
+    return image_file.read()
+
+
+def decode_image(image_file):
+    # Read the upload once and decode straight from the buffer
+    return decode_image_bytes(read_upload(image_file))
+
+
+def decode_image_bytes(data):
+    if len(data) > MAX_UPLOAD_SIZE:
+        raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_SIZE} bytes")
+
+    # OpenCV is only loaded once a frame actually has to be decoded
+    import cv2 as cv
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        raise InvalidImage("Failed to read image")
+
+    image = cv.imdecode(buffer, cv.IMREAD_COLOR)
+    if image is None:
+        raise InvalidImage("Failed to read image")
+    return image
@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('predict/', views.predict, name='predict'),
+    path('predict/async/', views.predict_async, name='predict-async'),
+    path('predict/batch/', views.predict_batch, name='predict-batch'),
+    path('predict/landmarks/', views.predict_landmarks, name='predict-landmarks'),
+    path('predict/stats/', views.predict_stats, name='predict-stats'),
 ]
@@ -1,193 +1,458 @@
-import os
-import csv
-import copy
-import itertools
+import json
+import logging
+import random
 import numpy as np
-import tensorflow as tf
-import cv2 as cv
-import mediapipe as mp
 
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import default_storage
 
-class KeyPointClassifier:
-    def __init__(self):
-        # Adjust the path to match your Django project structure
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, 'models', 'keypoint_classifier.tflite')
-        
-        try:
-            self.interpreter = tf.lite.Interpreter(model_path=model_path)
-            self.interpreter.allocate_tensors()
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            raise
+from django_backend.metrics import CONFIDENCE_BUCKETS, Counter, Histogram, stage
 
-    def __call__(self, landmark_list):
-        try:
-            # Ensure the input is a numpy array with correct shape and type
-            input_data = np.array([landmark_list], dtype=np.float32)
-            
-            # Set the tensor to the input data
-            input_details_tensor_index = self.input_details[0]['index']
-            self.interpreter.set_tensor(input_details_tensor_index, input_data)
-            
-            # Run inference
-            self.interpreter.invoke()
-            
-            # Get the output tensor
-            output_details_tensor_index = self.output_details[0]['index']
-            result = self.interpreter.get_tensor(output_details_tensor_index)
-            
-            # Get the index of the highest probability
-            result_index = np.argmax(np.squeeze(result))
-            confidence = np.max(np.squeeze(result))
-            
-            return result_index, confidence
-        
-        except Exception as e:
-            print(f"Error during prediction: {e}")
-            return None, 0.0
-
-# MediaPipe Hands setup
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=True,
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5
+from .batching import QueueFull
+from .cache import PredictionCache
+from .offload import Overloaded, get_offload_pool
+from .pool import PoolTimeout
+from .registry import UnknownVariant, model_registry
+from .uploads import (
+    InvalidImage, UploadTooLarge, check_upload_size, decode_image, decode_image_bytes, read_upload,
 )
 
-# Initialize classifier
-keypoint_classifier = KeyPointClassifier()
+logger = logging.getLogger(__name__)
+
+# Fraction of predictions logged at DEBUG level
+LOG_SAMPLE_RATE = getattr(settings, 'HANDSIGN_DEBUG_LOG_SAMPLE_RATE', 0.01)
+
+predictions_total = Counter(
+    'handsign_predictions_total', 'Prediction outcomes by view', ('view', 'outcome'))
+prediction_confidence = Histogram(
+    'handsign_prediction_confidence', 'Confidence of returned predictions', ('view',),
+    buckets=CONFIDENCE_BUCKETS)
 
-# Load labels
-def load_labels():
+# Most images or landmark sets accepted by one batch request
+MAX_BATCH_SIZE = getattr(settings, 'HANDSIGN_MAX_BATCH_SIZE', 32)
+
+# Largest absolute pixel coordinate accepted in client supplied landmarks,
+# far beyond any camera frame and well inside int32
+MAX_LANDMARK_COORDINATE = getattr(settings, 'HANDSIGN_MAX_LANDMARK_COORDINATE', 1 << 16)
+
+# Seconds clients are told to wait when predict-async sheds load
+RETRY_AFTER = getattr(settings, 'HANDSIGN_OFFLOAD_RETRY_AFTER', 1)
+
+# Repeated frames skip the pipeline. On by default (the 'local' backend),
+# None only when HANDSIGN_CACHE_BACKEND is set to a falsy value
+prediction_cache = PredictionCache.from_settings()
+
+# The inference stack (TensorFlow, MediaPipe, OpenCV) is imported inside the
+# views on first use, so resolving URLs stays cheap
+
+def parse_landmark_set(raw):
+    # Client supplied landmarks: 21 [x, y] pixel coordinates
+    landmark_list = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        label_path = os.path.join(base_dir, 'models', 'keypoint_classifier_label.csv')
-        with open(label_path, encoding='utf-8-sig') as f:
-            keypoint_classifier_labels = csv.reader(f)
-            return [row[0] for row in keypoint_classifier_labels]
-    except FileNotFoundError:
-        print("Label file not found!")
-        return ['Zero', 'One', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight', 'Nine']
-
-keypoint_classifier_labels = load_labels()
-
-def calc_bounding_rect(image, landmarks):
-    image_width, image_height = image.shape[1], image.shape[0]
-    landmark_array = np.empty((0, 2), int)
-
-    for _, landmark in enumerate(landmarks.landmark):
-        landmark_x = min(int(landmark.x * image_width), image_width - 1)
-        landmark_y = min(int(landmark.y * image_height), image_height - 1)
-        landmark_point = [np.array((landmark_x, landmark_y))]
-        landmark_array = np.append(landmark_array, landmark_point, axis=0)
-
-    x, y, w, h = cv.boundingRect(landmark_array)
-    return [x, y, x + w, y + h]
-
-def calc_landmark_list(image, landmarks):
-    image_width, image_height = image.shape[1], image.shape[0]
-    landmark_point = []
-
-    for _, landmark in enumerate(landmarks.landmark):
-        landmark_x = min(int(landmark.x * image_width), image_width - 1)
-        landmark_y = min(int(landmark.y * image_height), image_height - 1)
-        landmark_point.append([landmark_x, landmark_y])
-
-    return landmark_point
-
-def pre_process_landmark(landmark_list):
-    temp_landmark_list = copy.deepcopy(landmark_list)
-
-    # Convert to relative coordinates
-    base_x, base_y = temp_landmark_list[0][0], temp_landmark_list[0][1]
-    for index, point in enumerate(temp_landmark_list):
-        temp_landmark_list[index][0] = temp_landmark_list[index][0] - base_x
-        temp_landmark_list[index][1] = temp_landmark_list[index][1] - base_y
-
-    # Convert to a one-dimensional list
-    temp_landmark_list = list(itertools.chain.from_iterable(temp_landmark_list))
-
-    # Normalization
-    max_value = max(list(map(abs, temp_landmark_list)))
-    def normalize_(n):
-        return n / max_value if max_value != 0 else 0
-        
-    temp_landmark_list = list(map(normalize_, temp_landmark_list))
-    return temp_landmark_list
+        points = np.asarray(landmark_list, dtype=np.float64)
+    except TypeError:
+        # Objects, null coordinates and the like
+        raise ValueError("Expected 21 [x, y] landmark points")
+    if points.shape != (21, 2) or not np.isfinite(points).all():
+        raise ValueError("Expected 21 [x, y] landmark points")
+    if (np.abs(points) > MAX_LANDMARK_COORDINATE).any():
+        raise ValueError(f"Landmark coordinates exceed {MAX_LANDMARK_COORDINATE} pixels")
+    return points.astype(np.int32)
+
+def parse_handedness(handedness):
+    if handedness not in ('Left', 'Right', None):
+        raise ValueError("Handedness must be Left, Right or null")
+    return handedness
+
+def parse_packed_landmarks(body):
+    # 21 (x, y) pairs packed as little-endian float32, 168 bytes
+    if len(body) != 21 * 2 * 4:
+        raise ValueError("Expected 168 bytes of packed float32 landmarks")
+    return parse_landmark_set(np.frombuffer(body, dtype='<f4').reshape(21, 2))
+
+def record_prediction(view, features, hand_sign_id, confidence):
+    predictions_total.inc(view=view, outcome='hand')
+    prediction_confidence.observe(float(confidence), view=view)
+
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_SAMPLE_RATE:
+        logger.debug(
+            "Processed landmarks: %s, hand sign id: %s, confidence: %s",
+            features, hand_sign_id, confidence)
+
+def requested_bundle(request):
+    # ?variant=int8 picks a model variant, the default one otherwise
+    return model_registry.get(request.GET.get('variant'))
+
+def requested_hands(request):
+    # ?hands=N detects up to N hands per frame, one by default
+    raw = request.GET.get('hands')
+    if raw is None:
+        return 1
+
+    from . import inference
+
+    if not raw.isdigit() or not 1 <= int(raw) <= inference.MAX_NUM_HANDS:
+        raise ValueError(f"hands must be between 1 and {inference.MAX_NUM_HANDS}")
+    return int(raw)
+
+def classify_with_cache(features, classify, bundle):
+    if prediction_cache is None:
+        return classify(features)
+
+    key = prediction_cache.classification_key(features, bundle.version)
+    cached = prediction_cache.get_classification(key)
+    if cached is not None:
+        return cached
+
+    hand_sign_id, confidence = classify(features)
+    prediction_cache.set_classification(key, hand_sign_id, confidence)
+    return hand_sign_id, confidence
 
 @csrf_exempt
 def predict(request):
-    if request.method != 'POST' or not request.FILES.get('image'):
+    if request.method != 'POST':
         return JsonResponse({'error': 'Invalid request'}, status=400)
 
     try:
-        # Get and save the image temporarily
-        image_file = request.FILES['image']
-        image_path = default_storage.save('temp_hand.jpg', image_file)
-        
-        # Read and process image
-        image = cv.imread(default_storage.path(image_path))
-        if image is None:
-            raise ValueError("Failed to read image")
-            
-        image = cv.flip(image, 1)  # Mirror display
-        image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        image.flags.writeable = False
-        results = hands.process(image)
-        image.flags.writeable = True
-        
-        if not results.multi_hand_landmarks:
-            return JsonResponse({'error': 'No hand detected'}, status=400)
-            
-        # Process landmarks
-        hand_landmarks = results.multi_hand_landmarks[0]
-        handedness = results.multi_handedness[0].classification[0].label
-        
-        # Calculate landmark coordinates
-        landmark_list = calc_landmark_list(image, hand_landmarks)
-        
-        # Process landmarks for classification
-        processed_landmark_list = pre_process_landmark(landmark_list)
-        
-        # Get prediction and confidence
-        hand_sign_id, confidence = keypoint_classifier(processed_landmark_list)
-        
-        # Calculate bounding box
-        brect = calc_bounding_rect(image, hand_landmarks)
-        
-        # Debugging prints
-        print(f"Processed Landmarks: {processed_landmark_list}")
-        print(f"Hand Sign ID: {hand_sign_id}")
-        print(f"Confidence: {confidence}")
-        
-        response_data = {
-            'prediction': int(hand_sign_id) if hand_sign_id is not None else -1,
-            'label': keypoint_classifier_labels[hand_sign_id] 
-                    if hand_sign_id is not None and 0 <= hand_sign_id < len(keypoint_classifier_labels) 
-                    else 'Unknown',
-            'handedness': handedness,
-            'bounding_box': brect,
-            'confidence': float(confidence)
-        }
+        check_upload_size(request)
+    except UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    if not request.FILES.get('image'):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    try:
+        bundle = requested_bundle(request)
+        max_hands = requested_hands(request)
+    except (UnknownVariant, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    from . import inference
+    from .features import normalize_landmarks
+
+    try:
+        # Read the upload once, it is hashed for the cache and decoded in memory
+        data = read_upload(request.FILES['image'])
+
+        response_key = None
+        if prediction_cache is not None:
+            with stage(request, 'cache'):
+                key_version = bundle.version if max_hands == 1 else f'{bundle.version}:{max_hands}'
+                response_key = prediction_cache.response_key(data, key_version)
+                cached = prediction_cache.get_response(response_key)
+            if cached is not None:
+                status, response_data = cached
+                predictions_total.inc(view='predict', outcome='cached')
+                return JsonResponse(response_data, status=status)
+
+        with stage(request, 'decode'):
+            image = decode_image_bytes(data)
+
+        with stage(request, 'pool_wait'):
+            context = inference.inference_pool.checkout()
+        try:
+            if max_hands > 1:
+                status, response_data = predict_hands(request, context, image, bundle, max_hands)
+                if response_key:
+                    prediction_cache.set_response(response_key, status, response_data)
+                return JsonResponse(response_data, status=status)
+
+            with stage(request, 'detect'):
+                hand = inference.detect_hand(image, context.hands)
+            if hand is None:
+                predictions_total.inc(view='predict', outcome='no_hand')
+                response_data = {'error': 'No hand detected'}
+                if response_key:
+                    prediction_cache.set_response(response_key, 400, response_data)
+                return JsonResponse(response_data, status=400)
+            points, handedness, brect = hand
+
+            # Process landmarks for classification
+            with stage(request, 'normalize'):
+                processed_landmark_list = normalize_landmarks(points)
+
+            # Get prediction and confidence
+            with stage(request, 'classify'):
+                classifier = inference.get_micro_batcher(bundle) or context.classifiers.get(bundle)
+                hand_sign_id, confidence = classify_with_cache(processed_landmark_list, classifier, bundle)
+        finally:
+            inference.inference_pool.checkin(context)
+
+        record_prediction('predict', processed_landmark_list, hand_sign_id, confidence)
+
+        response_data = inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle)
+        if response_key and hand_sign_id is not None:
+            prediction_cache.set_response(response_key, 200, response_data)
         
+    except UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    except InvalidImage as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    except (QueueFull, PoolTimeout) as e:
+        return JsonResponse({'error': str(e)}, status=503)
+
     except Exception as e:
-        print(f"Prediction Error: {e}")
+        predictions_total.inc(view='predict', outcome='error')
+        logger.error("Prediction error: %s", e)
         return JsonResponse({'error': str(e)}, status=500)
-        
-    finally:
-        # Clean up
-        try:
-            default_storage.delete(image_path)
-        except:
-            pass
-            
+
     return JsonResponse(response_data)
+
+def predict_hands(request, context, image, bundle, max_hands):
+    """
+    Every hand in the frame from one detection pass, classified together in
+    a single [N, 42] invoke. Returns (status, response data).
+    """
+    from . import inference
+    from .features import normalize_landmarks
+
+    with stage(request, 'detect'):
+        detections = inference.detect_hands(image, context.multi_hands, max_hands)
+    if not detections:
+        predictions_total.inc(view='predict', outcome='no_hand')
+        return 400, {'error': 'No hand detected'}
+
+    with stage(request, 'normalize'):
+        input_data = normalize_landmarks(
+            np.stack([points for points, _, _ in detections]), out=context.features(len(detections)))
+    with stage(request, 'classify'):
+        hand_sign_ids, confidences = context.classifiers.get(bundle).classify_batch(input_data)
+
+    hands = []
+    for (_, handedness, brect), features, hand_sign_id, confidence in zip(
+            detections, input_data, hand_sign_ids, confidences):
+        record_prediction('predict', features, hand_sign_id, confidence)
+        hands.append(inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle))
+    return 200, {'hands': hands, 'model_version': bundle.version}
+
+@csrf_exempt
+async def predict_async(request):
+    """
+    Same contract as predict, but the frame is decoded and classified in the
+    offload process pool while the request only awaits the result. Answers
+    503 with Retry-After instead of queueing once the pool is saturated.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    try:
+        check_upload_size(request)
+    except UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    try:
+        if not request.FILES.get('image'):
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+        data = read_upload(request.FILES['image'])
+    except UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    try:
+        bundle = requested_bundle(request)
+    except UnknownVariant as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response_key = None
+    if prediction_cache is not None:
+        with stage(request, 'cache'):
+            response_key = prediction_cache.response_key(data, bundle.version)
+            cached = prediction_cache.get_response(response_key)
+        if cached is not None:
+            status, response_data = cached
+            predictions_total.inc(view='predict-async', outcome='cached')
+            return JsonResponse(response_data, status=status)
+
+    try:
+        with stage(request, 'offload'):
+            status, response_data = await get_offload_pool().predict(data, bundle.variant)
+    except Overloaded as e:
+        predictions_total.inc(view='predict-async', outcome='rejected')
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = str(RETRY_AFTER)
+        return response
+    except InvalidImage as e:
+        # Raised in the worker, pickled back through the future
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        predictions_total.inc(view='predict-async', outcome='error')
+        logger.error("Prediction error: %s", e)
+        return JsonResponse({'error': str(e)}, status=500)
+
+    if status == 200:
+        predictions_total.inc(view='predict-async', outcome='hand')
+        prediction_confidence.observe(response_data['confidence'], view='predict-async')
+    else:
+        predictions_total.inc(view='predict-async', outcome='no_hand')
+
+    # The workers reload models on their own, only cache answers of this version
+    if response_key and (status != 200 or (
+            response_data['prediction'] != -1 and response_data['model_version'] == bundle.version)):
+        prediction_cache.set_response(response_key, status, response_data)
+    return JsonResponse(response_data, status=status)
+
+@csrf_exempt
+def predict_landmarks(request):
+    """
+    Classify landmarks detected on the client, skipping image decode and MediaPipe.
+    Accepts JSON {"landmarks": [[x, y] * 21], "handedness": "Left"} or a packed
+    little-endian float32 body (application/octet-stream).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    try:
+        bundle = requested_bundle(request)
+    except UnknownVariant as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        if request.content_type == 'application/octet-stream':
+            points = parse_packed_landmarks(request.body)
+            handedness = parse_handedness(request.GET.get('handedness'))
+        else:
+            payload = json.loads(request.body)
+            points = parse_landmark_set(payload.get('landmarks'))
+            handedness = parse_handedness(payload.get('handedness'))
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Invalid landmarks'}, status=400)
+
+    from . import inference
+    from .features import bounding_rect, normalize_landmarks
+
+    def classify(features):
+        micro_batcher = inference.get_micro_batcher(bundle)
+        if micro_batcher:
+            return micro_batcher(features)
+        with inference.classifier_pool.lease() as classifiers:
+            return classifiers.get(bundle)(features)
+
+    try:
+        with stage(request, 'normalize'):
+            processed_landmark_list = normalize_landmarks(points)
+        with stage(request, 'classify'):
+            hand_sign_id, confidence = classify_with_cache(processed_landmark_list, classify, bundle)
+
+        record_prediction('predict-landmarks', processed_landmark_list, hand_sign_id, confidence)
+
+        brect = bounding_rect(points)
+        response_data = inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle)
+
+    except (QueueFull, PoolTimeout) as e:
+        return JsonResponse({'error': str(e)}, status=503)
+
+    except Exception as e:
+        predictions_total.inc(view='predict-landmarks', outcome='error')
+        logger.error("Prediction error: %s", e)
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse(response_data)
+
+def classify_items(request, context, images, landmark_sets, bundle):
+    from . import inference
+    from .features import bounding_rect, normalize_landmarks
+
+    # Items are answered in request order: images first, then landmark sets
+    results = []
+    pending = []  # (result index, points, handedness, bounding box)
+
+    for image_file in images:
+        try:
+            with stage(request, 'detect'):
+                hand = inference.detect_hand(decode_image(image_file), context.hands)
+        except (UploadTooLarge, InvalidImage) as e:
+            results.append({'error': str(e)})
+            continue
+        except Exception as e:
+            predictions_total.inc(view='predict-batch', outcome='error')
+            logger.error("Prediction error: %s", e)
+            results.append({'error': str(e)})
+            continue
+
+        if hand is None:
+            predictions_total.inc(view='predict-batch', outcome='no_hand')
+            results.append({'error': 'No hand detected'})
+            continue
+
+        points, handedness, brect = hand
+        pending.append((len(results), points, handedness, brect))
+        results.append(None)
+
+    for raw in landmark_sets:
+        try:
+            points = parse_landmark_set(raw)
+        except ValueError as e:
+            results.append({'error': str(e)})
+            continue
+
+        pending.append((len(results), points, None, bounding_rect(points)))
+        results.append(None)
+
+    if pending:
+        # Normalize every hand at once, then one interpreter invoke for the batch
+        with stage(request, 'normalize'):
+            input_data = normalize_landmarks(
+                np.stack([item[1] for item in pending]), out=context.features(len(pending)))
+        with stage(request, 'classify'):
+            hand_sign_ids, confidences = context.classifiers.get(bundle).classify_batch(input_data)
+
+        for (index, _, handedness, brect), features, hand_sign_id, confidence in zip(
+                pending, input_data, hand_sign_ids, confidences):
+            record_prediction('predict-batch', features, hand_sign_id, confidence)
+            results[index] = inference.format_prediction(hand_sign_id, confidence, handedness, brect, bundle)
+
+    return results
+
+@csrf_exempt
+def predict_batch(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    try:
+        check_upload_size(request)
+    except UploadTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    images = request.FILES.getlist('images')
+    landmark_sets = request.POST.getlist('landmarks')
+    if not images and not landmark_sets:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+
+    if len(images) + len(landmark_sets) > MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'Batch exceeds {MAX_BATCH_SIZE} items'}, status=400)
+
+    try:
+        bundle = requested_bundle(request)
+    except UnknownVariant as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    from . import inference
+
+    try:
+        with stage(request, 'pool_wait'):
+            context = inference.inference_pool.checkout()
+        try:
+            results = classify_items(request, context, images, landmark_sets, bundle)
+        finally:
+            inference.inference_pool.checkin(context)
+    except PoolTimeout as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    except Exception as e:
+        logger.error("Prediction error: %s", e)
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'results': results, 'model_version': bundle.version})
+
+def predict_stats(request):
+    from . import inference
+
+    return JsonResponse({
+        'models': model_registry.describe(),
+        'pool': inference.inference_pool.stats(),
+        'classifier_pool': inference.classifier_pool.stats(),
+        'micro_batching': inference.micro_batcher_stats() or None,
+        'cache': prediction_cache.stats() if prediction_cache else None,
+        'offload': get_offload_pool().stats(),
+    })